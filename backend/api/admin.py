@@ -9,7 +9,10 @@ from api.models import (
     TutorLike, 
     TutorSave, 
     TutorView,
+    TutorViewDaily,
+    TrendingFeed,
     ChatRoom, 
+    ChatAttachment,
     Message,
     Review
 )
@@ -43,6 +46,16 @@ class TutorProfileAdmin(admin.ModelAdmin):
     ordering = ('-price_min',)
     search_fields = ('user__email', 'education', 'location',)
 
+@admin.register(TutorViewDaily)
+class TutorViewDailyAdmin(admin.ModelAdmin):
+    list_display = ('tutor', 'date', 'views')
+    list_filter = ('date',)
+
+@admin.register(TrendingFeed)
+class TrendingFeedAdmin(admin.ModelAdmin):
+    list_display = ('location', 'subject', 'computed_at')
+    list_filter = ('location',)
+
 @admin.register(ChatRoom)
 class ChatRoomAdmin(admin.ModelAdmin):
     list_display = ('student', 'tutor', 'created_at', 'last_message_at', 'is_active')
@@ -53,6 +66,11 @@ class MessageAdmin(admin.ModelAdmin):
     list_display = ('chat_room', 'sender', 'content', 'message_type', 'created_at')
     list_filter = ('message_type', 'created_at')
 
+@admin.register(ChatAttachment)
+class ChatAttachmentAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'content_type', 'size', 'created_at')
+    list_filter = ('content_type', 'created_at')
+
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ('student', 'tutor', 'rating', 'created_at')
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    name = 'api'
+
+    def ready(self):
+        # Register signal handlers (search document sync, etc.)
+        from api import checks, signals  # noqa: F401
@@ -0,0 +1,194 @@
+# api/attachments.py
+"""
+Streaming chat attachment uploads.
+
+HashingUploadHandler takes over the multipart parsing for the upload view.
+It writes each chunk straight to a temporary file while computing the
+SHA-256 and size, so nothing is buffered in memory whatever the file size.
+Files over CHAT_ATTACHMENT_MAX_SIZE are dropped while streaming.
+
+store_attachment() then looks the hash up. Identical content, in any room,
+is stored once as a ChatAttachment under chat/attachments/ (see
+chat_attachment_path). A new file is moved into storage; FileSystemStorage
+renames the temporary file instead of copying it.
+
+The stored content type is sniffed from the file itself, never taken from the
+client: images must open in Pillow, PDFs must start with %PDF-, and other
+types come from an allow-list of extensions. Anything else is stored as
+application/octet-stream.
+
+Image previews are generated after the transaction commits, on a small
+background thread pool, so Pillow never runs on the request path. The
+generate_attachment_previews command fills in any previews that were lost
+to a restart.
+"""
+import hashlib
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopFutureHandlers
+from django.db import IntegrityError, close_old_connections, transaction
+from PIL import Image
+
+from api.models import ChatAttachment
+
+logger = logging.getLogger(__name__)
+
+CHAT_ATTACHMENT_MAX_SIZE = getattr(settings, 'CHAT_ATTACHMENT_MAX_SIZE', 25 * 1024 * 1024)  # bytes
+PREVIEW_SIZE = (320, 320)
+UPLOAD_CHUNK_SIZE = 256 * 1024  # bytes per write
+
+IMAGE_CONTENT_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
+# Types that cannot be sniffed cheaply; only accepted by file extension and never shown as images
+DOCUMENT_CONTENT_TYPES = {
+    'text/plain',
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/vnd.ms-powerpoint',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    'application/zip',
+}
+FALLBACK_CONTENT_TYPE = 'application/octet-stream'
+
+_preview_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'CHAT_ATTACHMENT_PREVIEW_WORKERS', 2), thread_name_prefix='attachment-preview'
+)
+
+
+class HashedUploadedFile(TemporaryUploadedFile):
+    """A TemporaryUploadedFile that also carries the SHA-256 of its content."""
+    sha256 = None
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Streams every uploaded file to a temporary file and hashes it on the way.
+    Set `too_large` when a file went over `max_size` and was skipped.
+    """
+    chunk_size = UPLOAD_CHUNK_SIZE
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = CHAT_ATTACHMENT_MAX_SIZE if max_size is None else max_size
+        self.too_large = False
+        self.hasher = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.content_length is not None and self.content_length > self.max_size:
+            self.too_large = True
+            raise SkipFile()
+        self.file = HashedUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.hasher = hashlib.sha256()
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.too_large = True
+            self.file.close()  # deletes the temporary file
+            raise SkipFile()
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.too_large:
+            return None
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.hasher.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+def detect_content_type(uploaded_file):
+    """The content type of an uploaded file, from its content (and, for documents, its extension)."""
+    try:
+        with Image.open(uploaded_file) as image:
+            content_type = Image.MIME.get(image.format)
+    except (OSError, Image.DecompressionBombError):
+        content_type = None
+    uploaded_file.seek(0)
+    if content_type in IMAGE_CONTENT_TYPES:
+        return content_type
+
+    is_pdf = uploaded_file.read(5) == b'%PDF-'
+    uploaded_file.seek(0)
+    if is_pdf:
+        return 'application/pdf'
+
+    guessed, _ = mimetypes.guess_type(uploaded_file.name or '')
+    return guessed if guessed in DOCUMENT_CONTENT_TYPES else FALLBACK_CONTENT_TYPE
+
+
+def store_attachment(uploaded_file):
+    """
+    Returns (ChatAttachment, created) for a HashedUploadedFile, storing the
+    file only if its content is new. New image attachments get a preview
+    scheduled for after the surrounding transaction commits.
+    """
+    attachment = ChatAttachment.objects.filter(sha256=uploaded_file.sha256).first()
+    if attachment is not None:
+        return attachment, False
+
+    attachment = ChatAttachment(
+        sha256=uploaded_file.sha256,
+        size=uploaded_file.size,
+        content_type=detect_content_type(uploaded_file),
+    )
+    attachment.file.save(uploaded_file.name, uploaded_file, save=False)
+    try:
+        with transaction.atomic():
+            attachment.save(force_insert=True)
+    except IntegrityError:
+        # The same content was uploaded concurrently; keep the first copy
+        attachment.file.delete(save=False)
+        return ChatAttachment.objects.get(sha256=uploaded_file.sha256), False
+
+    if attachment.is_image:
+        transaction.on_commit(lambda: schedule_preview(attachment.sha256))
+    return attachment, True
+
+
+def schedule_preview(sha256):
+    _preview_executor.submit(_generate_preview_in_background, sha256)
+
+
+def _generate_preview_in_background(sha256):
+    close_old_connections()
+    try:
+        generate_preview(sha256)
+    except Exception:
+        logger.exception('Could not generate a preview for attachment %s', sha256)
+    finally:
+        close_old_connections()
+
+
+def generate_preview(sha256):
+    """
+    Writes a JPEG thumbnail of an image attachment. Returns True if one was
+    written, or False when it already exists or the file is not a readable image.
+    """
+    attachment = ChatAttachment.objects.filter(sha256=sha256).first()
+    if attachment is None or attachment.preview or not attachment.is_image:
+        return False
+    try:
+        with attachment.file.open('rb') as source, Image.open(source) as image:
+            image.thumbnail(PREVIEW_SIZE)
+            output = BytesIO()
+            image.convert('RGB').save(output, format='JPEG', quality=80)
+    except (OSError, Image.DecompressionBombError):
+        return False
+    attachment.preview.save(f'{sha256}.jpg', ContentFile(output.getvalue()), save=False)
+    ChatAttachment.objects.filter(sha256=sha256).update(preview=attachment.preview.name)
+    return True
@@ -0,0 +1,95 @@
+# api/availability.py
+"""
+Parsing of TutorProfile.availability into searchable slots.
+
+availability is free-form JSON such as {"monday": ["18:00-20:00"], "tuesday": []}.
+Each "HH:MM-HH:MM" range becomes a (weekday, start_minute, end_minute) slot,
+with weekday 0 = Monday and minutes counted from midnight. A range that wraps
+past midnight ("22:00-01:00") is split across the two days. Anything that
+cannot be parsed is skipped, so bad input never blocks a profile save.
+
+The slots are stored in TutorAvailabilitySlot (see api/models/search.py).
+"""
+import re
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+MINUTES_PER_DAY = 24 * 60
+
+_TIME_RE = re.compile(r'^(\d{1,2}):(\d{2})$')
+
+
+def parse_weekday(value):
+    """Returns 0-6 for a weekday name or its 3-letter abbreviation ('mon'), or None."""
+    value = str(value).strip().lower()
+    for index, name in enumerate(WEEKDAYS):
+        if value == name or (len(value) == 3 and name.startswith(value)):
+            return index
+    return None
+
+
+def parse_time(value):
+    """Returns minutes since midnight for 'HH:MM' ('24:00' allowed as end of day), or None."""
+    match = _TIME_RE.match(str(value).strip())
+    if not match:
+        return None
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if minutes > 59 or hours * 60 + minutes > MINUTES_PER_DAY:
+        return None
+    return hours * 60 + minutes
+
+
+def parse_range(value):
+    """Returns (start_minute, end_minute) for 'HH:MM-HH:MM', or None. end < start means it wraps past midnight."""
+    parts = str(value).split('-')
+    if len(parts) != 2:
+        return None
+    start, end = parse_time(parts[0]), parse_time(parts[1])
+    if start is None or end is None or start == end:
+        return None
+    return start, end
+
+
+def parse_availability(availability):
+    """Returns the sorted, de-duplicated (weekday, start_minute, end_minute) slots of an availability dict."""
+    if not isinstance(availability, dict):
+        return []
+    slots = set()
+    for day, ranges in availability.items():
+        weekday = parse_weekday(day)
+        if weekday is None or not isinstance(ranges, (list, tuple)):
+            continue
+        for value in ranges:
+            parsed = parse_range(value)
+            if parsed is None:
+                continue
+            start, end = parsed
+            if start < end:
+                slots.add((weekday, start, end))
+                continue
+            if start < MINUTES_PER_DAY:
+                slots.add((weekday, start, MINUTES_PER_DAY))
+            if end > 0:
+                slots.add(((weekday + 1) % 7, 0, end))
+    return sorted(slots)
+
+
+def parse_available_at(value):
+    """Parses a search value like 'monday 18:30' into (weekday, minute), or None."""
+    parts = str(value).split()
+    if len(parts) != 2:
+        return None
+    weekday, minute = parse_weekday(parts[0]), parse_time(parts[1])
+    if weekday is None or minute is None or minute >= MINUTES_PER_DAY:
+        return None
+    return weekday, minute
+
+
+def parse_available_between(value):
+    """Parses a search value like 'monday 18:00-20:00' into (weekday, start_minute, end_minute), or None."""
+    parts = str(value).split()
+    if len(parts) != 2:
+        return None
+    weekday, parsed = parse_weekday(parts[0]), parse_range(parts[1])
+    if weekday is None or parsed is None or parsed[0] > parsed[1]:
+        return None
+    return (weekday,) + parsed
@@ -0,0 +1,286 @@
+# api/chat_pipeline.py
+"""
+Optional write-behind persistence for WebSocket chat messages (CHAT_WRITE_BEHIND=1).
+
+In this mode ChatConsumer gives each message its ID and timestamp in-process,
+broadcasts it straight away and hands it to the process-wide MessageWriter.
+The writer flushes pending messages with bulk_create every
+CHAT_WRITE_BEHIND_INTERVAL seconds, or as soon as CHAT_WRITE_BEHIND_BATCH_SIZE
+are waiting. It applies one coalesced snapshot/unread UPDATE per room per batch
+(ChatRoom.record_messages).
+
+Durability:
+- The sender receives {"type": "ack", "message_ids": [...]} once its messages
+  are committed. Clients keep unacknowledged messages and resend them with the
+  same "id" after reconnecting. An ID that already exists for the same room and
+  sender is acknowledged without writing it again, so a resend never duplicates
+  a message or its unread count. An ID taken by another room or sender is not
+  stored; the sender gets {"type": "rejected", "message_ids": [...]}.
+- Each room is written in its own transaction. As on the synchronous path, a
+  room that is no longer active (or was deleted) rolls its messages back, and
+  the sender gets the room_deactivated event instead of an ack.
+- A connection-level database error puts the whole batch back at the head of
+  the queue and is retried with backoff; nothing is dropped.
+- Any other error only affects its room's messages. They go to the back of
+  the queue, so later messages keep flowing. After
+  CHAT_WRITE_BEHIND_MAX_ATTEMPTS tries they are logged and dropped.
+- Pending messages are flushed at interpreter exit (atexit), and
+  `await message_writer.stop()` can be called from a shutdown hook.
+- Once CHAT_WRITE_BEHIND_MAX_PENDING messages are waiting, consumers fall back
+  to the synchronous path, so the queue is bounded.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+from collections import defaultdict, deque, namedtuple
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+
+from api.models import Message
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 5.0  # seconds
+
+PendingMessage = namedtuple('PendingMessage', ['message', 'chat_room', 'reply_channel', 'attempts'], defaults=[0])
+
+
+class ChatRoomInactive(Exception):
+    """The room was deactivated (or deleted) while the connection was open; its messages are rolled back."""
+
+
+class MessageWriteFailed(Exception):
+    """Some messages could not be written and were queued again."""
+
+
+def write_batch(batch):
+    """
+    Inserts a batch of PendingMessages and updates their rooms, one transaction per room.
+    Messages whose ID is already stored, or repeated in the batch, for the same room and
+    sender (client resends) are skipped but count as stored.
+
+    Returns (stored, rejected, failed, conflicts) lists of PendingMessages: rejected ones
+    belong to inactive rooms, failed ones to rooms whose write raised, and conflicts reuse
+    the ID of another room's or sender's message. Connection errors (OperationalError,
+    InterfaceError) are raised instead, as every room would fail.
+    """
+    owners = {
+        pk: (room_id, sender_id) for pk, room_id, sender_id in Message.objects.filter(
+            pk__in={item.message.pk for item in batch}
+        ).values_list('pk', 'chat_room_id', 'sender_id')
+    }
+    existing = set(owners)
+    by_room, conflicts = {}, []
+    for item in batch:
+        owner = (item.message.chat_room_id, item.message.sender_id)
+        if owners.setdefault(item.message.pk, owner) != owner:
+            conflicts.append(item)
+        else:
+            by_room.setdefault(item.chat_room.pk, []).append(item)
+
+    stored, rejected, failed = [], [], []
+    for items in by_room.values():
+        new = []
+        for item in items:
+            if item.message.pk not in existing:
+                existing.add(item.message.pk)
+                new.append(item.message)
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create(new, ignore_conflicts=True)
+                if new and not items[0].chat_room.record_messages(new):
+                    raise ChatRoomInactive()
+        except ChatRoomInactive:
+            rejected.extend(items)
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception:
+            logger.exception('Could not write %d chat messages for room %s', len(items), items[0].chat_room.pk)
+            failed.extend(items)
+        else:
+            stored.extend(items)
+    return stored, rejected, failed, conflicts
+
+
+class MessageWriter:
+    """
+    Per-process queue of chat messages waiting to be written.
+
+    submit() must be called from the event loop; the background flush task is
+    started lazily on that loop.
+    """
+
+    def __init__(self, batch_size=100, interval=0.05, max_pending=10000, max_attempts=5):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.stats = {
+            'submitted': 0, 'written': 0, 'batches': 0, 'failures': 0, 'rejected': 0, 'dropped': 0, 'conflicts': 0,
+        }
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self._exit_hook = False
+
+    def accepting(self):
+        """False when the queue is full and callers should write synchronously instead."""
+        return len(self._pending) < self.max_pending
+
+    def submit(self, message, chat_room, reply_channel=None):
+        with self._lock:
+            self._pending.append(PendingMessage(message, chat_room, reply_channel))
+            self.stats['submitted'] += 1
+        self._ensure_running()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        """
+        Writes everything pending now, acknowledging each batch to its senders.
+        Raises MessageWriteFailed after the pass if some messages were queued again.
+        """
+        retry = []
+        try:
+            while self._pending:
+                batch = self._take()
+                try:
+                    stored, rejected, failed, conflicts = await database_sync_to_async(write_batch)(batch)
+                except Exception:
+                    self.stats['failures'] += 1
+                    self._requeue(batch)
+                    raise
+                self._written(stored)
+                retry.extend(self._retry_or_drop(failed))
+                await self._acknowledge(stored)
+                await self._reject(rejected)
+                await self._conflict(conflicts)
+        finally:
+            self._append(retry)
+        if retry:
+            raise MessageWriteFailed(f'{len(retry)} chat messages queued for another attempt')
+
+    def flush_sync(self):
+        """Blocking flush for shutdown, when there may be no event loop. Senders are not acknowledged."""
+        retry = []
+        while self._pending:
+            batch = self._take()
+            try:
+                stored, rejected, failed, conflicts = write_batch(batch)
+            except Exception:
+                self.stats['failures'] += 1
+                self._requeue(batch)
+                logger.exception('Could not flush %d pending chat messages', len(self._pending))
+                break
+            self._written(stored)
+            self.stats['rejected'] += len(rejected)
+            self.stats['conflicts'] += len(conflicts)
+            retry.extend(self._retry_or_drop(failed))
+        self._append(retry)
+
+    async def stop(self):
+        """Flushes and stops the background task (for shutdown hooks)."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        if not self._exit_hook:
+            atexit.register(self.flush_sync)
+            self._exit_hook = True
+
+    async def _run(self):
+        delay = self.interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                delay = self.interval
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Chat message flush failed; retrying in %.2fs', delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def _take(self):
+        with self._lock:
+            return [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+
+    def _requeue(self, batch):
+        with self._lock:
+            self._pending.extendleft(reversed(batch))
+
+    def _append(self, items):
+        with self._lock:
+            self._pending.extend(items)
+
+    def _written(self, batch):
+        self.stats['written'] += len(batch)
+        self.stats['batches'] += 1
+
+    def _retry_or_drop(self, failed):
+        """Counts an attempt for each failed message; returns the ones to try again."""
+        retry = []
+        for item in failed:
+            item = item._replace(attempts=item.attempts + 1)
+            if item.attempts < self.max_attempts:
+                retry.append(item)
+            else:
+                self.stats['dropped'] += 1
+                logger.error(
+                    'Dropping chat message %s for room %s after %d attempts',
+                    item.message.pk, item.chat_room.pk, item.attempts
+                )
+        return retry
+
+    async def _acknowledge(self, batch):
+        channel_layer = get_channel_layer()
+        by_channel = defaultdict(list)
+        for item in batch:
+            if item.reply_channel:
+                by_channel[item.reply_channel].append(str(item.message.pk))
+        for channel, message_ids in by_channel.items():
+            await channel_layer.send(channel, {'type': 'messages_persisted', 'message_ids': message_ids})
+
+    async def _reject(self, rejected):
+        """Tells senders that their room closed before the messages were stored."""
+        self.stats['rejected'] += len(rejected)
+        channel_layer = get_channel_layer()
+        for channel, room_id in {(item.reply_channel, str(item.chat_room.pk)) for item in rejected if item.reply_channel}:
+            await channel_layer.send(channel, {'type': 'room_deactivated', 'room_id': room_id})
+
+    async def _conflict(self, conflicts):
+        """Tells senders that their message IDs belong to other messages, so nothing was stored."""
+        self.stats['conflicts'] += len(conflicts)
+        channel_layer = get_channel_layer()
+        by_channel = defaultdict(list)
+        for item in conflicts:
+            logger.warning('Chat message ID %s is already used by another message', item.message.pk)
+            if item.reply_channel:
+                by_channel[item.reply_channel].append(str(item.message.pk))
+        for channel, message_ids in by_channel.items():
+            await channel_layer.send(channel, {'type': 'messages_rejected', 'message_ids': message_ids})
+
+
+message_writer = MessageWriter(
+    batch_size=getattr(settings, 'CHAT_WRITE_BEHIND_BATCH_SIZE', 100),
+    interval=getattr(settings, 'CHAT_WRITE_BEHIND_INTERVAL', 0.05),
+    max_pending=getattr(settings, 'CHAT_WRITE_BEHIND_MAX_PENDING', 10000),
+    max_attempts=getattr(settings, 'CHAT_WRITE_BEHIND_MAX_ATTEMPTS', 5),
+)
@@ -0,0 +1,28 @@
+# api/checks.py
+from django.core.checks import Error, Tags, register
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+
+from api import fulltext
+
+TEXT_TRIGGERS_MIGRATION = ('api', '0017_tutor_search_text_triggers')
+
+
+@register(Tags.database)
+def check_text_index_triggers(app_configs, databases=None, **kwargs):
+    """
+    The full-text index is maintained by triggers (api/fulltext.py), which a SQLite
+    table rebuild drops without an error. Runs with migrate and `check --database`.
+    """
+    errors = []
+    for alias in databases or []:
+        if TEXT_TRIGGERS_MIGRATION not in MigrationRecorder(connections[alias]).applied_migrations():
+            continue
+        missing = fulltext.missing_text_triggers(alias)
+        if missing:
+            errors.append(Error(
+                f"Full-text index triggers are missing on '{alias}': {', '.join(missing)}",
+                hint='A migration rebuilt a search table; call api.fulltext.create_text_triggers() after it.',
+                id='api.E001',
+            ))
+    return errors
@@ -0,0 +1,74 @@
+# api/class_levels.py
+"""
+In-process lookup of ClassLevel grade ranges.
+
+ClassLevel rows carry numeric grade ranges (min_grade/max_grade), so mapping a
+grade to class levels is data, not code. The rows are loaded once per process
+on first use and reloaded when a ClassLevel changes (see api/signals.py) or
+after CLASS_LEVEL_MAP_TTL seconds, so other worker processes pick up edits.
+
+Grades are numbered 1-12, with university as 13, and are also encoded as bits
+(bit g set for grade g) for TutorSearchDocument.grade_mask.
+"""
+import time
+
+from api.models import ClassLevel
+
+UNIVERSITY_GRADE = 13
+MAX_GRADE = UNIVERSITY_GRADE
+CLASS_LEVEL_MAP_TTL = 300  # seconds
+
+_state = {'loaded_at': None, 'ranges': {}}
+
+
+def parse_grade(value):
+    """Returns the grade number for a StudentProfile.grade-style value ('10', 'university'), or None."""
+    value = str(value).strip().lower()
+    if value == 'university':
+        return UNIVERSITY_GRADE
+    if value.isdigit() and 1 <= int(value) <= MAX_GRADE:
+        return int(value)
+    return None
+
+
+def grades_mask(grades):
+    """Bitmask with one bit per grade number."""
+    mask = 0
+    for grade in grades:
+        if grade is not None and 1 <= grade <= MAX_GRADE:
+            mask |= 1 << grade
+    return mask
+
+
+def range_mask(min_grade, max_grade):
+    if min_grade is None or max_grade is None:
+        return 0
+    return grades_mask(range(min_grade, max_grade + 1))
+
+
+def _load():
+    ranges = {
+        level_id: (min_grade, max_grade)
+        for level_id, min_grade, max_grade in ClassLevel.objects.values_list('id', 'min_grade', 'max_grade')
+    }
+    _state.update(loaded_at=time.monotonic(), ranges=ranges)
+
+
+def _ensure_loaded():
+    loaded_at = _state['loaded_at']
+    if loaded_at is None or time.monotonic() - loaded_at > CLASS_LEVEL_MAP_TTL:
+        _load()
+
+
+def invalidate():
+    """Forces a reload on next use (called when ClassLevel rows change)."""
+    _state['loaded_at'] = None
+
+
+def mask_for_class_levels(level_ids):
+    """Returns the grade bitmask covered by the given class level IDs."""
+    _ensure_loaded()
+    mask = 0
+    for level_id in level_ids:
+        mask |= range_mask(*_state['ranges'].get(level_id, (None, None)))
+    return mask
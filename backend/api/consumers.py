@@ -1,133 +1,474 @@
+import abc
+import asyncio
 import json
+import logging
+import uuid
+from functools import partial
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from api import presence
+from api.chat_pipeline import ChatRoomInactive, message_writer
 from api.models import ChatRoom, Message
+from api.typing_indicator import TypingThrottle
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
-class ChatConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        self.room_id = self.scope['url_route']['kwargs']['room_id']
-        self.room_group_name = f'chat_{self.room_id}'
-        
-        # Verify user has access to this chat room
-        has_access = await self.verify_chat_access()
-        if not has_access:
-            await self.close()
+
+def room_group(room_id):
+    return f'chat_{room_id}'
+
+
+def user_group(user_id):
+    """Personal group of one user's UserConsumer connections (e.g. for new rooms)."""
+    return f'user_{user_id}'
+
+
+class BaseChatConsumer(AsyncWebsocketConsumer, metaclass=abc.ABCMeta):
+    """
+    Chat handling shared by ChatConsumer (one room per socket) and
+    UserConsumer (all of a user's rooms on one socket).
+
+    Rooms (with both participant user IDs) and the sender's display info are
+    loaded once per connection and reused for every frame, so a chat message
+    costs one INSERT plus the room's conditional snapshot UPDATE.
+
+    With CHAT_WRITE_BEHIND on, messages are broadcast before they are written
+    and persisted in batches by api/chat_pipeline.py. Either way the sender gets
+    an {"type": "ack"} frame once the message is stored.
+
+    Online status is tracked per connection by api/presence.py and kept alive
+    by a heartbeat task; nothing is written to CustomUser per connect/disconnect.
+    Typing frames are coalesced into start/stop transitions by api/typing_indicator.py.
+
+    Room group events carry "room_id"; subclasses decide with tag() whether
+    outgoing frames do too.
+    """
+
+    @abc.abstractmethod
+    def room_for(self, data):
+        """The open ChatRoom an incoming frame is about, or None."""
+
+    def tag(self, event, frame):
+        return frame
+
+    @abc.abstractmethod
+    async def room_closed(self, room_id):
+        """Called when a room is deactivated."""
+
+    # ===========================
+    # Connection lifecycle
+    # ===========================
+
+    async def start_session(self):
+        user = self.scope['user']
+        self.sender_info = {
+            'id': str(user.id),
+            'name': user.get_full_name(),
+            'user_type': user.user_type,
+        }
+        self.typing = {}
+
+        # Register the connection as online, and keep it alive while the socket is open
+        await self.presence_connect()
+        self.heartbeat_task = asyncio.ensure_future(self.heartbeat())
+
+    async def end_session(self):
+        # Rejected connections never started a session
+        if getattr(self, 'heartbeat_task', None) is None:
             return
-        
-        # Join room group
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
-        await self.accept()
-        
-        # Update user online status
-        await self.update_user_status(True)
-        
-    async def disconnect(self, close_code):
-        # Leave room group
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
-        
-        # Update user online status
-        await self.update_user_status(False)
+        for throttle in self.typing.values():
+            await throttle.close()
+        self.heartbeat_task.cancel()
+        await self.presence_disconnect()
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(presence.PRESENCE_HEARTBEAT_INTERVAL)
+            try:
+                await self.presence_heartbeat()
+            except Exception:
+                logger.exception('Presence heartbeat failed for %s', self.channel_name)
+
+    # ===========================
+    # Frames from the client
+    # ===========================
 
     async def receive(self, text_data):
         try:
             data = json.loads(text_data)
             message_type = data.get('type', 'message')
-            
+
+            chat_room = self.room_for(data)
+            if chat_room is None:
+                await self.send(text_data=json.dumps({
+                    'error': 'Unknown chat room'
+                }))
+                return
+
             if message_type == 'message':
-                content = data['content']
-                
-                # Save message to database
-                message = await self.save_message(content)
-                
-                # Send message to room group
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'chat_message',
-                        'message': {
-                            'id': str(message.id),
-                            'content': message.content,
-                            'sender_id': str(message.sender.id),
-                            'sender_name': message.sender.get_full_name(),
-                            'created_at': message.created_at.isoformat(),
-                            'message_type': message.message_type,
+                await self.send_chat_message(chat_room, data['content'], data.get('id'))
+
+            elif message_type == 'read':
+                # Advance this user's read watermark; the other side gets a read receipt
+                message = await self.mark_read(chat_room, data.get('message_id'))
+                if message is not None:
+                    await self.channel_layer.group_send(
+                        room_group(chat_room.id),
+                        {
+                            'type': 'read_receipt',
+                            'room_id': str(chat_room.id),
+                            'user_id': self.sender_info['id'],
+                            'message_id': str(message.pk),
+                            'read_at': message.created_at.isoformat(),
+                            'unread_count': getattr(chat_room, chat_room.unread_field_for(self.scope['user'])),
                         }
-                    }
-                )
-            
+                    )
+
             elif message_type == 'typing':
-                # Handle typing indicators
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'typing_status',
-                        'user_id': str(self.scope['user'].id),
-                        'is_typing': data.get('is_typing', False)
-                    }
-                )
-                
+                # Only start/stop transitions reach the room (see api/typing_indicator.py)
+                await self.typing_for(chat_room).update(bool(data.get('is_typing', False)))
+
         except Exception as e:
             await self.send(text_data=json.dumps({
                 'error': 'Invalid message format'
             }))
 
+    async def send_chat_message(self, chat_room, content, message_id=None):
+        if settings.CHAT_WRITE_BEHIND and message_writer.accepting():
+            # Write-behind: broadcast now, persist in the next batch (acked when committed)
+            message = self.build_message(chat_room, content, message_id)
+            message_writer.submit(message, chat_room, self.channel_name)
+        else:
+            # Save message to database
+            try:
+                message = await self.save_message(chat_room, content)
+            except ChatRoomInactive:
+                await self.room_closed(str(chat_room.id))
+                return
+            await self.send(text_data=json.dumps({
+                'type': 'ack',
+                'message_ids': [str(message.id)]
+            }))
+
+        # Send message to room group
+        await self.channel_layer.group_send(
+            room_group(chat_room.id),
+            {
+                'type': 'chat_message',
+                'room_id': str(chat_room.id),
+                'message': {
+                    'id': str(message.id),
+                    'content': message.content,
+                    'sender_id': self.sender_info['id'],
+                    'sender_name': self.sender_info['name'],
+                    'created_at': message.created_at.isoformat(),
+                    'message_type': message.message_type,
+                }
+            }
+        )
+        await self.typing_for(chat_room).stop()
+
+    def typing_for(self, chat_room):
+        room_id = str(chat_room.id)
+        if room_id not in self.typing:
+            self.typing[room_id] = TypingThrottle(partial(self.send_typing_status, room_id))
+        return self.typing[room_id]
+
+    async def send_typing_status(self, room_id, is_typing):
+        await self.channel_layer.group_send(
+            room_group(room_id),
+            {
+                'type': 'typing_status',
+                'room_id': room_id,
+                'user_id': self.sender_info['id'],
+                'is_typing': is_typing
+            }
+        )
+
+    # ===========================
+    # Group events
+    # ===========================
+
+    async def send_frame(self, event, frame):
+        await self.send(text_data=json.dumps(self.tag(event, frame)))
+
     async def chat_message(self, event):
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send_frame(event, {
             'type': 'message',
             'message': event['message']
-        }))
+        })
 
     async def typing_status(self, event):
         # Don't send typing status to the sender
         if event['user_id'] != str(self.scope['user'].id):
-            await self.send(text_data=json.dumps({
+            await self.send_frame(event, {
                 'type': 'typing',
                 'user_id': event['user_id'],
                 'is_typing': event['is_typing']
-            }))
+            })
+
+    async def read_receipt(self, event):
+        # Only the other participant needs to know their messages were read
+        if event['user_id'] != str(self.scope['user'].id):
+            await self.send_frame(event, {
+                'type': 'read',
+                'user_id': event['user_id'],
+                'message_id': event['message_id'],
+                'read_at': event['read_at'],
+            })
+
+    async def messages_persisted(self, event):
+        # Write-behind acknowledgement for this connection's messages (see api/chat_pipeline.py)
+        await self.send(text_data=json.dumps({
+            'type': 'ack',
+            'message_ids': event['message_ids']
+        }))
+
+    async def messages_rejected(self, event):
+        # Write-behind: these client-chosen IDs belong to other messages, so nothing was stored
+        await self.send(text_data=json.dumps({
+            'type': 'rejected',
+            'message_ids': event['message_ids'],
+            'error': 'Message ID already in use'
+        }))
+
+    async def room_deactivated(self, event):
+        await self.room_closed(event['room_id'])
+
+    # ===========================
+    # Database access
+    # ===========================
 
     @database_sync_to_async
-    def verify_chat_access(self):
+    def load_chat_room(self, room_id):
+        """Returns the active room if the user is one of its participants, else None."""
         user = self.scope['user']
         if not user.is_authenticated:
-            return False
-        
+            return None
+
+        chat_room = ChatRoom.objects.select_related('student', 'tutor').filter(
+            id=room_id, is_active=True
+        ).first()
+        if chat_room is None or user.id not in (chat_room.student.user_id, chat_room.tutor.user_id):
+            return None
+        return chat_room
+
+    def build_message(self, chat_room, content, message_id=None):
+        """
+        An unsaved message with its ID and timestamp assigned in-process. A client may
+        pass its own UUID so a resend after reconnecting is stored only once.
+        """
         try:
-            chat_room = ChatRoom.objects.get(id=self.room_id)
-            if hasattr(user, 'student_profile'):
-                return chat_room.student.user == user
-            elif hasattr(user, 'tutor_profile'):
-                return chat_room.tutor.user == user
-            return False
-        except ChatRoom.DoesNotExist:
-            return False
+            message_id = uuid.UUID(str(message_id)) if message_id else uuid.uuid4()
+        except ValueError:
+            message_id = uuid.uuid4()
+        return Message(
+            id=message_id,
+            chat_room=chat_room,
+            sender_id=self.scope['user'].id,
+            content=content,
+            created_at=timezone.now()
+        )
 
     @database_sync_to_async
-    def save_message(self, content):
-        chat_room = ChatRoom.objects.get(id=self.room_id)
-        message = Message.objects.create(
+    def save_message(self, chat_room, content):
+        message = Message(
             chat_room=chat_room,
-            sender=self.scope['user'],
+            sender_id=self.scope['user'].id,
             content=content
-        )        
-        # Update chat room's last_message_at
-        chat_room.last_message_at = message.created_at
-        chat_room.save(update_fields=['last_message_at'])
-        
+        )
+        with transaction.atomic():
+            message.save(force_insert=True)
+            # Update the room's last-message snapshot and the recipient's unread count
+            if not chat_room.record_message(message):
+                raise ChatRoomInactive()
+
         return message
 
     @database_sync_to_async
-    def update_user_status(self, is_online):
+    def mark_read(self, chat_room, message_id=None):
+        try:
+            return chat_room.mark_read(self.scope['user'], message_id)
+        except (Message.DoesNotExist, ValidationError):
+            return None
+
+    # Each of these also syncs presence to the database, at most once per
+    # PRESENCE_SYNC_INTERVAL across all workers (see api/presence.py)
+
+    @database_sync_to_async
+    def presence_connect(self):
+        presence.connect(self.scope['user'].id, self.channel_name)
+        presence.sync_to_database()
+
+    @database_sync_to_async
+    def presence_heartbeat(self):
+        presence.heartbeat(self.scope['user'].id, self.channel_name)
+        presence.sync_to_database()
+
+    @database_sync_to_async
+    def presence_disconnect(self):
+        presence.disconnect(self.scope['user'].id, self.channel_name)
+        presence.sync_to_database()
+
+
+class ChatConsumer(BaseChatConsumer):
+    """
+    Chat room WebSocket (ws/chat/<room_id>/). The connection is closed when
+    the room is deactivated (signal in api/signals.py, or the UPDATE matching
+    no active room).
+    """
+    async def connect(self):
+        self.room_id = self.scope['url_route']['kwargs']['room_id']
+        self.room_group_name = room_group(self.room_id)
+
+        # Verify user has access to this chat room, and keep it for the connection
+        self.chat_room = await self.load_chat_room(self.room_id)
+        if self.chat_room is None:
+            await self.close()
+            return
+
+        # Join room group
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+        await self.start_session()
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        # Leave room group
+        await self.channel_layer.group_discard(
+            self.room_group_name,
+            self.channel_name
+        )
+        await self.end_session()
+
+    def room_for(self, data):
+        return self.chat_room
+
+    async def room_closed(self, room_id):
+        await self.close_inactive_room()
+
+    async def close_inactive_room(self):
+        self.chat_room = None
+        await self.send(text_data=json.dumps({
+            'error': 'Chat room is no longer active'
+        }))
+        await self.close()
+
+
+class UserConsumer(BaseChatConsumer):
+    """
+    One WebSocket per user (ws/user/) for all of their active chat rooms,
+    instead of one socket, handshake and access check per room.
+
+    The connection joins every room group plus the user's personal group, in
+    one query. Frames in both directions carry "room_id". The client first
+    receives {"type": "rooms"} with each room's unread count, then
+    {"type": "unread"} deltas as messages arrive or are read (also on another
+    device). Rooms created while connected arrive as {"type": "room_added"},
+    deactivated ones as {"type": "room_closed"}.
+    """
+    async def connect(self):
+        user = self.scope['user']
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.rooms = {str(chat_room.id): chat_room for chat_room in await self.load_chat_rooms()}
+        self.unread = {
+            room_id: getattr(chat_room, chat_room.unread_field_for(user))
+            for room_id, chat_room in self.rooms.items()
+        }
+        self.user_group_name = user_group(user.id)
+        for group in [self.user_group_name] + [room_group(room_id) for room_id in self.rooms]:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.start_session()
+        await self.accept()
+
+        await self.send(text_data=json.dumps({
+            'type': 'rooms',
+            'rooms': [
+                {'room_id': room_id, 'unread_count': unread_count}
+                for room_id, unread_count in self.unread.items()
+            ]
+        }))
+
+    async def disconnect(self, close_code):
+        if not hasattr(self, 'rooms'):
+            return
+        for group in [self.user_group_name] + [room_group(room_id) for room_id in self.rooms]:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        await self.end_session()
+
+    def room_for(self, data):
+        return self.rooms.get(str(data.get('room_id')))
+
+    def tag(self, event, frame):
+        return {**frame, 'room_id': event['room_id']}
+
+    async def send_unread(self, room_id, unread_count):
+        delta = unread_count - self.unread.get(room_id, 0)
+        self.unread[room_id] = unread_count
+        await self.send(text_data=json.dumps({
+            'type': 'unread',
+            'room_id': room_id,
+            'delta': delta,
+            'unread_count': unread_count
+        }))
+
+    async def chat_message(self, event):
+        await super().chat_message(event)
+        if event['message']['sender_id'] != self.sender_info['id']:
+            await self.send_unread(event['room_id'], self.unread.get(event['room_id'], 0) + 1)
+
+    async def read_receipt(self, event):
+        await super().read_receipt(event)
+        # This user read the room, on this socket or another device
+        if event['user_id'] == self.sender_info['id']:
+            await self.send_unread(event['room_id'], event['unread_count'])
+
+    async def room_added(self, event):
+        room_id = event['room_id']
+        if room_id in self.rooms:
+            return
+        chat_room = await self.load_chat_room(room_id)
+        if chat_room is None:
+            return
+        self.rooms[room_id] = chat_room
+        self.unread[room_id] = getattr(chat_room, chat_room.unread_field_for(self.scope['user']))
+        await self.channel_layer.group_add(room_group(room_id), self.channel_name)
+        await self.send(text_data=json.dumps({
+            'type': 'room_added',
+            'room_id': room_id,
+            'unread_count': self.unread[room_id]
+        }))
+
+    async def room_closed(self, room_id):
+        if self.rooms.pop(room_id, None) is None:
+            return
+        self.unread.pop(room_id, None)
+        throttle = self.typing.pop(room_id, None)
+        if throttle is not None:
+            await throttle.close()
+        await self.channel_layer.group_discard(room_group(room_id), self.channel_name)
+        await self.send(text_data=json.dumps({
+            'type': 'room_closed',
+            'room_id': room_id
+        }))
+
+    @database_sync_to_async
+    def load_chat_rooms(self):
+        """The user's active rooms, in one query."""
         user = self.scope['user']
-        user.is_online = is_online
-        user.save(update_fields=['is_online'])
+        return list(ChatRoom.objects.select_related('student', 'tutor').filter(
+            Q(student__user=user) | Q(tutor__user=user), is_active=True
+        ))
@@ -1,46 +1,116 @@
 # api/filters.py
 import django_filters
-from .models import TutorProfile
+from django.db.models import Exists, F, OuterRef
+from .availability import parse_available_at, parse_available_between
+from .class_levels import grades_mask, parse_grade
+from .fulltext import search_tutors
+from .models import TutorProfile, TutorAvailabilitySlot
 
 class TutorSearchFilter(django_filters.FilterSet):
     """
     A dedicated FilterSet for the advanced tutor search feature.
     Handles complex filtering for class levels, subjects, price, and location.
+
+    All filters run against the denormalized TutorSearchDocument (one row per tutor),
+    so no join to subjects/class levels and no distinct() is needed.
+    Availability filters use an EXISTS on the TutorAvailabilitySlot index.
+    Popularity filters and ?sort= use the TutorProfile counter columns and their indexes.
     """
+    SORT_ORDERINGS = {
+        'rating': ('-search_document__rating_average', 'uuid'),
+        'likes': ('-like_count', 'uuid'),
+        'saves': ('-save_count', 'uuid'),
+        'views': ('-view_count', 'uuid'),
+    }
+
+    q = django_filters.CharFilter(method='filter_by_text', label='Free-text search over bio, education and subjects')
     classes = django_filters.CharFilter(method='filter_by_classes', label='Filter by class grades (e.g., "1,5,10")')
-    subjects = django_filters.CharFilter(field_name='tutor_subjects__subject__name', lookup_expr='icontains', label='Filter by subject name (contains)')
-    max_price = django_filters.NumberFilter(field_name='price_min', lookup_expr='lte', label='Maximum price (tutor\'s min price <= value)')
+    subjects = django_filters.CharFilter(method='filter_by_subjects', label='Filter by subject name (contains)')
+    max_price = django_filters.NumberFilter(field_name='search_document__price_min', lookup_expr='lte', label='Maximum price (tutor\'s min price <= value)')
+    available_at = django_filters.CharFilter(method='filter_by_available_at', label='Free at a weekly time (e.g., "monday 18:30")')
+    available_between = django_filters.CharFilter(method='filter_by_available_between', label='Free during part of a weekly range (e.g., "monday 18:00-20:00")')
+    min_likes = django_filters.NumberFilter(field_name='like_count', lookup_expr='gte', label='Minimum number of likes')
+    min_saves = django_filters.NumberFilter(field_name='save_count', lookup_expr='gte', label='Minimum number of saves')
+    min_views = django_filters.NumberFilter(field_name='view_count', lookup_expr='gte', label='Minimum number of profile views')
+    sort = django_filters.ChoiceFilter(
+        method='sort_by', choices=[(key, key) for key in SORT_ORDERINGS],
+        label='Order by rating (default), likes, saves or views'
+    )
 
     class Meta:
         model = TutorProfile
-        fields = ['subjects', 'max_price', 'classes']
+        fields = [
+            'q', 'subjects', 'max_price', 'classes', 'available_at', 'available_between',
+            'min_likes', 'min_saves', 'min_views', 'sort'
+        ]
 
-    def filter_by_classes(self, queryset, name, value):
+    def filter_by_text(self, queryset, name, value):
         """
-        Custom filter to map individual grade numbers to ClassLevel groups.
-        Input `value` is a comma-separated string of grades (e.g., "1,2,10").
+        Full-text search (see api/fulltext.py). Results are re-ordered by
+        text relevance blended with rating_average.
         """
-        try:
-            grades = [int(g.strip()) for g in value.split(',') if g.strip().isdigit()]
-        except (ValueError, TypeError):
-            return queryset.none()
+        return search_tutors(queryset, value)
 
-        if not grades:
+    def filter_by_subjects(self, queryset, name, value):
+        """
+        Case-insensitive "contains" match on the tutor's subject names.
+        Names are stored lowercased, so a plain contains works for non-ASCII text on every backend.
+        """
+        value = value.strip().lower()
+        if not value:
             return queryset
+        return queryset.filter(search_document__subject_names__contains=value)
 
-        class_level_names = set()
-        for grade in grades:
-            if 1 <= grade <= 5:
-                class_level_names.add('Grade 1-5')
-            elif 6 <= grade <= 9:
-                class_level_names.add('Grade 6-9')
-            elif 10 <= grade <= 12:
-                class_level_names.add('Grade 10-12')
+    def filter_by_classes(self, queryset, name, value):
+        """
+        Filters tutors teaching any of the given grades.
+        Input `value` is a comma-separated string of grades (e.g., "1,2,10" or "12,university").
 
-        if not class_level_names:
+        Grades are matched against the search document's grade bitmask, which is
+        built from the ClassLevel grade ranges (see api/class_levels.py).
+        """
+        mask = grades_mask(parse_grade(grade) for grade in value.split(','))
+        if not mask:
             return queryset
 
-        return queryset.filter(class_levels__name__in=list(class_level_names)).distinct()
+        return queryset.annotate(
+            grade_hits=F('search_document__grade_mask').bitand(mask)
+        ).filter(grade_hits__gt=0)
+
+    def filter_by_available_at(self, queryset, name, value):
+        """
+        Tutors with a slot containing the given time: start <= t < end.
+        Invalid input returns no results.
+        """
+        parsed = parse_available_at(value)
+        if parsed is None:
+            return queryset.none()
+        weekday, minute = parsed
+        return self._with_slot(queryset, weekday=weekday, start_minute__lte=minute, end_minute__gt=minute)
+
+    def filter_by_available_between(self, queryset, name, value):
+        """
+        Tutors with a slot overlapping the given range: slot.start < end AND slot.end > start.
+        Invalid input returns no results.
+        """
+        parsed = parse_available_between(value)
+        if parsed is None:
+            return queryset.none()
+        weekday, start, end = parsed
+        return self._with_slot(queryset, weekday=weekday, start_minute__lt=end, end_minute__gt=start)
+
+    def sort_by(self, queryset, name, value):
+        """
+        Replaces the ordering (including the text relevance order of ?q=).
+        Each ordering has a matching (-counter, uuid) index for keyset pagination.
+        """
+        return queryset.order_by(*self.SORT_ORDERINGS[value])
+
+    @staticmethod
+    def _with_slot(queryset, **conditions):
+        # EXISTS rather than a join: a tutor with several matching slots appears once, without DISTINCT
+        slots = TutorAvailabilitySlot.objects.filter(tutor=OuterRef('pk'), **conditions)
+        return queryset.filter(Exists(slots))
 
 
 # class TutorProfileFilter(django_filters.FilterSet):
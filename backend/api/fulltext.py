@@ -0,0 +1,244 @@
+# api/fulltext.py
+"""
+Full-text search over tutor bio, education and subject names.
+
+PostgreSQL: a weighted tsvector stored in TutorSearchDocument.search_vector (GIN index)
+plus pg_trgm similarity on subject names, so misspelled subjects still match.
+SQLite (dev): an FTS5 virtual table, ranked with bm25().
+Any other backend falls back to icontains matching without ranking.
+
+The indexes and the FTS5 table are created in migration 0005. Both are kept
+current by database triggers on TutorSearchDocument and on
+TutorProfile.bio/education, so bulk update(), raw SQL and fixture loads are
+indexed too. The triggers are created by create_text_triggers() (migration
+0017). On SQLite, a migration that rebuilds either table drops its triggers, so
+it must call create_text_triggers() again. The api.E001 check (run by migrate
+and `manage.py check --database default`) reports missing triggers.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce
+
+from api.models import TutorProfile
+
+SEARCH_CONFIG = 'simple'  # No stemming: content is mostly Vietnamese
+FTS_TABLE = 'api_tutorsearchtext'
+TRIGRAM_THRESHOLD = 0.3  # Minimum word similarity for a fuzzy subject match
+
+# Final ordering score = TEXT_WEIGHT * relevance + RATING_WEIGHT * (rating / 5)
+TEXT_WEIGHT = 0.7
+RATING_WEIGHT = 0.3
+
+
+# PostgreSQL: search_vector is computed by a BEFORE trigger on the document, and
+# a bio/education change on the profile re-fires it.
+POSTGRES_CREATE = [
+    """
+    CREATE OR REPLACE FUNCTION api_tutorsearchdocument_set_vector() RETURNS trigger AS $$
+    BEGIN
+        SELECT setweight(to_tsvector('simple', replace(NEW.subject_names, '|', ' ')), 'A')
+            || setweight(to_tsvector('simple', coalesce(t.education, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(t.bio, '')), 'C')
+        INTO NEW.search_vector
+        FROM api_tutorprofile AS t WHERE t.uuid = NEW.tutor_id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER api_tutorsearchdocument_vector
+    BEFORE INSERT OR UPDATE ON api_tutorsearchdocument
+    FOR EACH ROW EXECUTE FUNCTION api_tutorsearchdocument_set_vector()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION api_tutorprofile_reindex_text() RETURNS trigger AS $$
+    BEGIN
+        UPDATE api_tutorsearchdocument SET search_vector = NULL WHERE tutor_id = NEW.uuid;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER api_tutorprofile_text
+    AFTER UPDATE OF bio, education ON api_tutorprofile
+    FOR EACH ROW WHEN (OLD.bio IS DISTINCT FROM NEW.bio OR OLD.education IS DISTINCT FROM NEW.education)
+    EXECUTE FUNCTION api_tutorprofile_reindex_text()
+    """,
+    # Recompute every vector through the new trigger
+    'UPDATE api_tutorsearchdocument SET search_vector = NULL',
+]
+
+POSTGRES_DROP = [
+    'DROP TRIGGER IF EXISTS api_tutorprofile_text ON api_tutorprofile',
+    'DROP FUNCTION IF EXISTS api_tutorprofile_reindex_text()',
+    'DROP TRIGGER IF EXISTS api_tutorsearchdocument_vector ON api_tutorsearchdocument',
+    'DROP FUNCTION IF EXISTS api_tutorsearchdocument_set_vector()',
+]
+
+# SQLite: the FTS5 table follows the document and profile rows
+SQLITE_INSERT_DOCUMENT = (
+    f'INSERT INTO {FTS_TABLE} (tutor_id, subjects, education, bio) '
+    "SELECT NEW.tutor_id, trim(replace(NEW.subject_names, '|', ' ')), t.education, t.bio "
+    'FROM api_tutorprofile AS t WHERE t.uuid = NEW.tutor_id;'
+)
+SQLITE_CREATE = [
+    f"""
+    CREATE TRIGGER api_tutorsearchtext_insert AFTER INSERT ON api_tutorsearchdocument
+    BEGIN
+        {SQLITE_INSERT_DOCUMENT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER api_tutorsearchtext_update AFTER UPDATE OF subject_names ON api_tutorsearchdocument
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE tutor_id = OLD.tutor_id;
+        {SQLITE_INSERT_DOCUMENT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER api_tutorsearchtext_delete AFTER DELETE ON api_tutorsearchdocument
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE tutor_id = OLD.tutor_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER api_tutorsearchtext_profile AFTER UPDATE OF bio, education ON api_tutorprofile
+    WHEN OLD.bio IS NOT NEW.bio OR OLD.education IS NOT NEW.education
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE tutor_id = NEW.uuid;
+        INSERT INTO {FTS_TABLE} (tutor_id, subjects, education, bio)
+        SELECT d.tutor_id, trim(replace(d.subject_names, '|', ' ')), NEW.education, NEW.bio
+        FROM api_tutorsearchdocument AS d WHERE d.tutor_id = NEW.uuid;
+    END
+    """,
+]
+
+# Refills the FTS table from the documents, e.g. for rows written while the triggers were missing
+SQLITE_REBUILD = [
+    f'DELETE FROM {FTS_TABLE}',
+    f'INSERT INTO {FTS_TABLE} (tutor_id, subjects, education, bio) '
+    "SELECT d.tutor_id, trim(replace(d.subject_names, '|', ' ')), t.education, t.bio "
+    'FROM api_tutorsearchdocument AS d JOIN api_tutorprofile AS t ON t.uuid = d.tutor_id',
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS api_tutorsearchtext_insert',
+    'DROP TRIGGER IF EXISTS api_tutorsearchtext_update',
+    'DROP TRIGGER IF EXISTS api_tutorsearchtext_delete',
+    'DROP TRIGGER IF EXISTS api_tutorsearchtext_profile',
+]
+
+TEXT_TRIGGERS = {
+    'postgresql': ['api_tutorsearchdocument_vector', 'api_tutorprofile_text'],
+    'sqlite': [
+        'api_tutorsearchtext_insert', 'api_tutorsearchtext_update',
+        'api_tutorsearchtext_delete', 'api_tutorsearchtext_profile',
+    ],
+}
+
+
+def create_text_triggers(schema_editor):
+    """Creates the triggers that keep the text index current, then brings the index up to date."""
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_CREATE, 'sqlite': SQLITE_CREATE + SQLITE_REBUILD}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_text_triggers(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def missing_text_triggers(using=None):
+    """Names of the text index triggers that are missing from the database."""
+    conn = connections[using or DEFAULT_DB_ALIAS]
+    expected = TEXT_TRIGGERS.get(conn.vendor, [])
+    if not expected:
+        return []
+    sql = {
+        'postgresql': 'SELECT tgname FROM pg_trigger WHERE NOT tgisinternal',
+        'sqlite': "SELECT name FROM sqlite_master WHERE type = 'trigger'",
+    }[conn.vendor]
+    with conn.cursor() as cursor:
+        cursor.execute(sql)
+        present = {name for name, in cursor.fetchall()}
+    return [name for name in expected if name not in present]
+
+
+def search_tutors(queryset, text):
+    """
+    Restricts a TutorProfile queryset to tutors matching `text`, annotates
+    `search_score` (text relevance blended with rating) and orders by it.
+    """
+    text = text.strip()
+    if not text:
+        return queryset
+
+    if connection.vendor == 'postgresql':
+        queryset = _search_postgres(queryset, text)
+    elif connection.vendor == 'sqlite':
+        matched = _search_sqlite(queryset, text)
+        if matched is None:
+            return queryset.none()
+        queryset = matched
+    else:
+        queryset = queryset.filter(
+            Q(bio__icontains=text) | Q(education__icontains=text)
+            | Q(search_document__subject_names__contains=text.lower())
+        ).annotate(text_rank=Value(0.0, output_field=FloatField()))
+
+    rating = Cast(F('search_document__rating_average'), FloatField()) / 5.0
+    return queryset.annotate(
+        search_score=TEXT_WEIGHT * F('text_rank') + RATING_WEIGHT * rating
+    ).order_by('-search_score', 'uuid')
+
+
+def _search_postgres(queryset, text):
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.annotate(
+        # A NULL vector has a NULL rank, which would sort first under DESC
+        vector_rank=Coalesce(SearchRank(F('search_document__search_vector'), query), 0.0, output_field=FloatField()),
+        subject_similarity=TrigramWordSimilarity(text, 'search_document__subject_names'),
+    ).filter(
+        Q(search_document__search_vector=query) | Q(subject_similarity__gte=TRIGRAM_THRESHOLD)
+    ).annotate(
+        # ts_rank is roughly 0..1 for short documents; similarity is 0..1
+        text_rank=(F('vector_rank') + F('subject_similarity')) / 2.0
+    )
+
+
+def _fts5_query(text):
+    """Turns free text into an FTS5 prefix query, e.g. 'toan ly' -> '"toan"* "ly"*'."""
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _search_sqlite(queryset, text):
+    """Returns None when nothing matches, so the caller can short-circuit."""
+    match = _fts5_query(text)
+    if not match:
+        return None
+    bm25 = f'-bm25({FTS_TABLE}, 0, 10.0, 5.0, 1.0)'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {bm25} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY 1 DESC LIMIT 1', [match])
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    best, = row
+
+    # Join the FTS table itself, so every match is ranked by bm25 (unbounded; normalised to 0..1 against the best)
+    profile = connection.ops.quote_name(TutorProfile._meta.db_table)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.tutor_id = {profile}.uuid', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    ).annotate(
+        text_rank=RawSQL(f'{bm25} / %s', [best or 1.0], output_field=FloatField())
+    )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import trending
+from api.models import TrendingWatermark, TutorTrendingScore
+
+
+class Command(BaseCommand):
+    help = (
+        'Folds the likes, saves, views and reviews since the last run into the trending scores '
+        'and rebuilds the trending feeds. Run it from cron every few minutes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=300.0, help='Seconds between runs with --loop.')
+        parser.add_argument('--reset', action='store_true',
+                            help='Drop the scores and watermark first, recomputing from all stored events.')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            TutorTrendingScore.objects.all().delete()
+            TrendingWatermark.objects.filter(name=trending.WATERMARK_NAME).delete()
+        while True:
+            result = trending.update_trending()
+            self.stdout.write(
+                f"Trending: {result['events']} new events for {result['tutors']} tutors, {result['feeds']} feeds."
+            )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import view_tracking
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes buffered tutor profile views to TutorView and the TutorViewDaily counters. '
+        'Use it with TUTOR_VIEW_FLUSH_INTERVAL=0 to flush outside the web workers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep flushing every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between flushes with --loop.')
+
+    def handle(self, *args, **options):
+        if not view_tracking.get_buffer().shared:
+            # The in-memory buffer belongs to each web process; this command would always find it empty
+            raise CommandError('Tutor views are buffered in process memory; flush_tutor_views needs the Redis cache.')
+        while True:
+            written = view_tracking.flush()
+            self.stdout.write(f'Flushed {written} tutor views ({view_tracking.get_buffer().pending()} pending).')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.attachments import generate_preview
+from api.models import ChatAttachment
+
+
+class Command(BaseCommand):
+    help = 'Generates missing image previews for chat attachments (e.g. after a restart dropped queued ones).'
+
+    def handle(self, *args, **options):
+        count = 0
+        pending = ChatAttachment.objects.filter(content_type__startswith='image/', preview='')
+        for sha256 in pending.values_list('sha256', flat=True).iterator():
+            count += generate_preview(sha256)
+        self.stdout.write(self.style.SUCCESS(f'Generated {count} attachment previews.'))
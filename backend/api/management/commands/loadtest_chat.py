@@ -0,0 +1,241 @@
+import asyncio
+import json
+import time
+import tracemalloc
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from api.chat_pipeline import message_writer
+from api.models import CustomUser, StudentProfile, TutorProfile, ChatRoom, Message
+from api.routing import websocket_urlpatterns
+
+LOADTEST_PREFIX = 'loadtest_chat_'
+
+LAYERS = {
+    'memory': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+    'redis': {'BACKEND': 'channels_redis.core.RedisChannelLayer'},
+}
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper() that counts every statement. Unlike
+    CaptureQueriesContext it keeps no log, so it is not capped at 9000 queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def is_scratch_database():
+    """True for a test database (test_<name>) or an in-memory SQLite one."""
+    name = str(connection.settings_dict['NAME'])
+    return name.startswith('test_') or name == ':memory:' or 'mode=memory' in name
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests the chat WebSockets in-process: N rooms x M sockets per room send messages and typing '
+        'frames through the real consumers and channel layer. Reports delivery latency percentiles, '
+        'database queries per message and memory per connection. Uses temporary users that are deleted afterwards. '
+        'Refuses to run against anything but a test database unless --allow-writes is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=20, help='Chat rooms (one student and one tutor each).')
+        parser.add_argument('--participants', type=int, default=2,
+                            help='Sockets per room, alternating between the student and the tutor (extra tabs/devices).')
+        parser.add_argument('--messages', type=int, default=10, help='Messages sent per socket.')
+        parser.add_argument('--typing', type=int, default=10, help='Typing frames sent per socket before each message.')
+        parser.add_argument('--interval', type=float, default=0.0,
+                            help='Seconds between messages on each socket (0 sends as fast as possible, i.e. saturates).')
+        parser.add_argument('--endpoint', choices=['room', 'user'], default='room',
+                            help='ws/chat/<room_id>/ (ChatConsumer) or ws/user/ (UserConsumer).')
+        parser.add_argument('--layer', choices=sorted(LAYERS), default='memory', help='Channel layer to run on.')
+        parser.add_argument('--redis-url', default='redis://localhost:6379/0', help='Redis for --layer redis.')
+        parser.add_argument('--write-behind', action='store_true', help='Run with CHAT_WRITE_BEHIND enabled.')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Seconds to wait for each frame.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON (for CI).')
+        parser.add_argument('--allow-writes', action='store_true',
+                            help='Run against a database that is not a test database. Creates and then deletes '
+                                 f'{LOADTEST_PREFIX}* users and everything attached to them.')
+
+    def handle(self, *args, **options):
+        if options['rooms'] < 1 or options['participants'] < 2:
+            raise CommandError('Need at least one room and two participants per room.')
+        if not options['allow_writes'] and not is_scratch_database():
+            raise CommandError(
+                f"Refusing to write load-test data to database {connection.settings_dict['NAME']!r}. "
+                'Point DATABASES at a test/scratch database or pass --allow-writes.'
+            )
+
+        layer = dict(LAYERS[options['layer']])
+        if options['layer'] == 'redis':
+            layer['CONFIG'] = {'hosts': [options['redis_url']]}
+
+        self.cleanup()
+        rooms = self.setup(options['rooms'])
+        queries = QueryCounter()
+        try:
+            # The consumers' queries run on this thread's connection (database_sync_to_async is thread-sensitive)
+            with override_settings(CHANNEL_LAYERS={'default': layer}, CHAT_WRITE_BEHIND=options['write_behind']), \
+                    connection.execute_wrapper(queries):
+                report = async_to_sync(self.run)(rooms, options, queries)
+        finally:
+            self.cleanup()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.write_report(report)
+
+    # ===========================
+    # Setup
+    # ===========================
+
+    def setup(self, room_count):
+        """Returns [(room, student_user, tutor_user)]."""
+        rooms = []
+        for index in range(room_count):
+            student_user = CustomUser.objects.create_user(
+                username=f'{LOADTEST_PREFIX}student{index}', email=f'{LOADTEST_PREFIX}student{index}@example.com',
+                password=None, user_type='student'
+            )
+            tutor_user = CustomUser.objects.create_user(
+                username=f'{LOADTEST_PREFIX}tutor{index}', email=f'{LOADTEST_PREFIX}tutor{index}@example.com',
+                password=None, user_type='tutor'
+            )
+            room = ChatRoom.objects.create(
+                student=StudentProfile.objects.create(user=student_user),
+                tutor=TutorProfile.objects.create(user=tutor_user)
+            )
+            rooms.append((room, student_user, tutor_user))
+        return rooms
+
+    def cleanup(self):
+        CustomUser.objects.filter(username__startswith=LOADTEST_PREFIX).delete()
+
+    # ===========================
+    # Run
+    # ===========================
+
+    async def run(self, rooms, options, queries):
+        participants = options['participants']
+        sockets = []  # (room_id, communicator)
+
+        # Connect phase: throughput and Python memory per connection
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        for room, student_user, tutor_user in rooms:
+            for index in range(participants):
+                user = student_user if index % 2 == 0 else tutor_user
+                sockets.append((str(room.id), await self.connect(room, user, options['endpoint'])))
+        connect_seconds = time.perf_counter() - start
+        memory_per_connection = (tracemalloc.get_traced_memory()[0] - memory_before) / len(sockets)
+        tracemalloc.stop()
+
+        # Message phase: every socket receives every message of its room, its own included
+        expected = participants * options['messages']
+        latencies = []
+        typing_received = [0]
+
+        async def send(room_id, communicator):
+            for _ in range(options['messages']):
+                for _ in range(options['typing']):
+                    await communicator.send_json_to({'type': 'typing', 'room_id': room_id, 'is_typing': True})
+                await communicator.send_json_to({
+                    'type': 'message', 'room_id': room_id, 'content': f'{time.perf_counter():.9f}'
+                })
+                if options['interval']:
+                    await asyncio.sleep(options['interval'])
+
+        async def receive(communicator):
+            received = 0
+            while received < expected:
+                frame = await communicator.receive_json_from(timeout=options['timeout'])
+                if frame.get('type') == 'message':
+                    latencies.append(time.perf_counter() - float(frame['message']['content']))
+                    received += 1
+                elif frame.get('type') == 'typing':
+                    typing_received[0] += 1
+
+        queries_before = queries.count
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[send(room_id, communicator) for room_id, communicator in sockets],
+            *[receive(communicator) for _, communicator in sockets],
+        )
+        message_seconds = time.perf_counter() - start
+        # Write-behind batches still pending count towards the queries per message
+        await message_writer.stop()
+        query_total = queries.count - queries_before
+        stored = await database_sync_to_async(
+            Message.objects.filter(chat_room__in=[room for room, _, _ in rooms]).count
+        )()
+
+        for _, communicator in sockets:
+            await communicator.disconnect()
+
+        sent = len(sockets) * options['messages']
+        percentiles = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        return {
+            'endpoint': options['endpoint'],
+            'layer': options['layer'],
+            'write_behind': options['write_behind'],
+            'rooms': len(rooms),
+            'connections': len(sockets),
+            'connections_per_second': round(len(sockets) / connect_seconds, 1),
+            'memory_per_connection_kib': round(memory_per_connection / 1024, 1),
+            'messages_sent': sent,
+            'messages_delivered': len(latencies),
+            'messages_stored': stored,
+            'messages_per_second': round(sent / message_seconds, 1),
+            'latency_ms': {name: round(float(value), 2) for name, value in zip(('p50', 'p95', 'p99'), percentiles)},
+            'queries_per_message': round(query_total / sent, 2),
+            'typing_frames_sent': sent * options['typing'],
+            'typing_frames_delivered': typing_received[0],
+        }
+
+    @staticmethod
+    async def connect(room, user, endpoint):
+        path = f'/ws/chat/{room.id}/' if endpoint == 'room' else '/ws/user/'
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise CommandError(f'Could not connect {user.username} to {path}')
+        return communicator
+
+    def write_report(self, report):
+        latency = report['latency_ms']
+        self.stdout.write(
+            f"{report['rooms']} rooms, {report['connections']} connections "
+            f"({report['endpoint']} endpoint, {report['layer']} layer, write-behind {report['write_behind']})"
+        )
+        self.stdout.write(
+            f"Connect: {report['connections_per_second']} connections/s, "
+            f"{report['memory_per_connection_kib']} KiB per connection (Python heap, client side included)"
+        )
+        self.stdout.write(
+            f"Messages: {report['messages_sent']} sent, {report['messages_delivered']} deliveries, "
+            f"{report['messages_stored']} stored, {report['messages_per_second']} msg/s"
+        )
+        if report['messages_stored'] != report['messages_sent']:
+            self.stderr.write(self.style.ERROR('Not every message sent was stored.'))
+        self.stdout.write(f"Delivery latency: p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+        self.stdout.write(f"Database queries per message: {report['queries_per_message']}")
+        self.stdout.write(
+            f"Typing frames: {report['typing_frames_sent']} sent, {report['typing_frames_delivered']} delivered"
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api import view_tracking
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes TutorView rows older than TUTOR_VIEW_RETENTION_DAYS. View totals are kept in TutorViewDaily '
+        'and TutorProfile.view_count, so only the raw per-view history is lost. Run it daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Retention in days (default: TUTOR_VIEW_RETENTION_DAYS).')
+
+    def handle(self, *args, **options):
+        deleted = view_tracking.prune_views(retention_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tutor views.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.models import TutorProfile, TutorSearchDocument, TutorAvailabilitySlot
+from api.search_cache import bump_search_generation
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the denormalized TutorSearchDocument rows and availability slots for every tutor.'
+
+    def handle(self, *args, **options):
+        count = 0
+        for tutor in TutorProfile.objects.only('pk', 'availability').iterator():
+            TutorSearchDocument.rebuild(tutor.pk)
+            TutorAvailabilitySlot.sync_tutor(tutor)
+            count += 1
+        bump_search_generation()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} tutor search documents.'))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from api.models import TutorProfile, TutorLike, TutorSave, TutorViewDaily
+
+
+def actual_count(queryset, aggregate):
+    """Correlated subquery with the true value of a counter for the outer TutorProfile row."""
+    totals = queryset.filter(tutor=OuterRef('pk')).values('tutor').annotate(total=aggregate).values('total')
+    return Coalesce(Subquery(totals, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes TutorProfile like_count, save_count and view_count from TutorLike, TutorSave and '
+        'TutorViewDaily, and fixes the tutors whose counters drifted. Run it periodically.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it.')
+
+    def handle(self, *args, **options):
+        actual = {
+            'like_count': actual_count(TutorLike.objects, Count('pk')),
+            'save_count': actual_count(TutorSave.objects, Count('pk')),
+            'view_count': actual_count(TutorViewDaily.objects, Sum('views')),
+        }
+        drift = {field: ~Q(**{field: value}) for field, value in actual.items()}
+
+        with transaction.atomic():
+            drifted = TutorProfile.objects.filter(drift['like_count'] | drift['save_count'] | drift['view_count']).count()
+            fixed = {}
+            for field, value in actual.items():
+                stale = TutorProfile.objects.filter(drift[field])
+                # One UPDATE ... SET field = (SELECT ...): the value is read and written in the same
+                # statement, so increments committed before it are never overwritten
+                fixed[field] = stale.count() if options['dry_run'] else stale.update(**{field: value})
+
+        verb = 'would fix' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb.capitalize()} {drifted} tutors "
+            f"(likes {fixed['like_count']}, saves {fixed['save_count']}, views {fixed['view_count']})."
+        ))
@@ -2,7 +2,7 @@ import random
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from api.models import (
-    CustomUser, TutorProfile, StudentProfile, Subject, TutorSubject, ChatRoom, Message
+    CustomUser, TutorProfile, StudentProfile, Subject, TutorSubject, ClassLevel, ChatRoom, Message
 )
 from django.utils import timezone
 
@@ -15,6 +15,16 @@ SINGAPORE_SUBJECTS = [
     "Literature", "Principles of Accounts", "Economics", "Computer Applications"
 ]
 
+# Singapore levels mapped onto grade numbers: Primary 1-6 = 1-6, Secondary 1-4 = 7-10, JC 1-2 = 11-12
+# (name, min_grade, max_grade)
+SINGAPORE_CLASS_LEVELS = [
+    ("Primary 1-3", 1, 3),
+    ("Primary 4-6", 4, 6),
+    ("Secondary 1-2", 7, 8),
+    ("Secondary 3-4", 9, 10),
+    ("JC 1-2", 11, 12),
+]
+
 SINGAPORE_LOCATIONS = [
     ("central", "Central"), ("east", "East"), ("west", "West"), ("north", "North"), ("northeast", "North-East"),
     ("bukit_timah", "Bukit Timah"), ("bedok", "Bedok"), ("tampines", "Tampines"), ("jurong_east", "Jurong East"),
@@ -68,6 +78,9 @@ def seed_sg_subjects_and_locations():
     # Subjects
     for subj in SINGAPORE_SUBJECTS:
         Subject.objects.get_or_create(name=subj)
+    # Class levels
+    for name, min_grade, max_grade in SINGAPORE_CLASS_LEVELS:
+        ClassLevel.objects.update_or_create(name=name, defaults={"min_grade": min_grade, "max_grade": max_grade})
     # Note: Locations may need to be added to LOCATION_CHOICES in model code for full support
 
 class Command(BaseCommand):
@@ -76,7 +89,8 @@ class Command(BaseCommand):
     @transaction.atomic
     def handle(self, *args, **options):
         seed_sg_subjects_and_locations()
-        self.stdout.write('Singapore MOE subjects seeded.')
+        self.stdout.write('Singapore MOE subjects and class levels seeded.')
+        class_levels = list(ClassLevel.objects.filter(name__in=[name for name, _, _ in SINGAPORE_CLASS_LEVELS]))
 
         # Create 30 tutors
         tutors = []
@@ -131,6 +145,7 @@ class Command(BaseCommand):
                     price=ts["price"]
                 )
             profile.update_price_range()
+            profile.class_levels.set(random.sample(class_levels, k=random.randint(1, 2)))
             tutors.append(profile)
         self.stdout.write(f"Seeded {len(tutors)} Singapore tutors.")
 
@@ -173,11 +188,12 @@ class Command(BaseCommand):
             for j in range(num_messages):
                 sender = random.choice([student.user, tutor.user])
                 content = MOCK_MESSAGES[j % len(MOCK_MESSAGES)]
-                Message.objects.create(
+                message = Message.objects.create(
                     chat_room=chat_room,
                     sender=sender,
                     content=content,
                     message_type="text",
                     created_at=timezone.now()
                 )
+                chat_room.record_message(message)
         self.stdout.write(self.style.SUCCESS("Singapore mock data seeded successfully."))
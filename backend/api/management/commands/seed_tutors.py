@@ -27,10 +27,16 @@ class Command(BaseCommand):
 
         # --- Define Subjects and Class Levels ---
         subjects_data = ['Toán', 'Vật lý', 'Hóa học', 'Tiếng Anh', 'Ngữ văn', 'Sinh học']
-        class_levels_data = ['Grade 1-5', 'Grade 6-9', 'Grade 10-12']
+        # (name, min_grade, max_grade)
+        class_levels_data = [('Grade 1-5', 1, 5), ('Grade 6-9', 6, 9), ('Grade 10-12', 10, 12)]
 
         subjects = {name: Subject.objects.get_or_create(name=name)[0] for name in subjects_data}
-        class_levels = {name: ClassLevel.objects.get_or_create(name=name)[0] for name in class_levels_data}
+        class_levels = {
+            name: ClassLevel.objects.update_or_create(
+                name=name, defaults={'min_grade': min_grade, 'max_grade': max_grade}
+            )[0]
+            for name, min_grade, max_grade in class_levels_data
+        }
 
         # --- Define Diverse Tutor Profiles ---
         tutors_to_create = [
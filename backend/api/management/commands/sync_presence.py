@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import presence
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies WebSocket presence into CustomUser.is_online/last_activity. '
+        'Run it from cron so users are marked offline even when nobody is connected.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep syncing every PRESENCE_SYNC_INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        if not presence.get_store().shared:
+            # The in-memory store only sees this process, so every user would look offline
+            raise CommandError('Presence is kept in process memory; sync_presence needs the Redis channel layer.')
+        while True:
+            result = presence.sync_to_database(force=True)
+            self.stdout.write(f"Presence synced: {result['online']} online, {result['offline']} offline.")
+            if not options['loop']:
+                return
+            time.sleep(presence.PRESENCE_SYNC_INTERVAL)
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _join_tokens(values):
+    values = [str(value) for value in values]
+    return f"|{'|'.join(values)}|" if values else ''
+
+
+def build_search_documents(apps, schema_editor):
+    TutorProfile = apps.get_model('api', 'TutorProfile')
+    TutorSubject = apps.get_model('api', 'TutorSubject')
+    TutorSearchDocument = apps.get_model('api', 'TutorSearchDocument')
+    through = TutorProfile.class_levels.through
+
+    subjects, levels = {}, {}
+    for tutor_id, subject_id, name in TutorSubject.objects.values_list(
+        'tutor_profile_id', 'subject_id', 'subject__name'
+    ).order_by('subject__name'):
+        tutor_subjects = subjects.setdefault(tutor_id, {})
+        tutor_subjects.setdefault(subject_id.hex, name.lower())
+    for tutor_id, level_id in through.objects.values_list('tutorprofile_id', 'classlevel_id').order_by('classlevel_id'):
+        levels.setdefault(tutor_id, []).append(level_id)
+
+    documents = []
+    for tutor in TutorProfile.objects.all().iterator():
+        tutor_subjects = subjects.get(tutor.pk, {})
+        documents.append(TutorSearchDocument(
+            tutor_id=tutor.pk,
+            subject_ids=_join_tokens(tutor_subjects.keys()),
+            subject_names=_join_tokens(tutor_subjects.values()),
+            class_level_ids=_join_tokens(levels.get(tutor.pk, [])),
+            location=tutor.location,
+            price_min=tutor.price_min,
+            price_max=tutor.price_max,
+            rating_average=tutor.rating_average,
+            is_verified=tutor.is_verified,
+        ))
+    TutorSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_customuser_wallet_balance_alter_customuser_username'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TutorSearchDocument',
+            fields=[
+                ('tutor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='api.tutorprofile')),
+                ('subject_ids', models.TextField(blank=True)),
+                ('subject_names', models.TextField(blank=True)),
+                ('class_level_ids', models.TextField(blank=True)),
+                ('location', models.CharField(blank=True, max_length=50)),
+                ('price_min', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('price_max', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('rating_average', models.DecimalField(decimal_places=2, default=0.0, max_digits=3)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['location', 'price_min'], name='api_tutorse_locatio_941078_idx'), models.Index(fields=['price_min'], name='api_tutorse_price_m_fabb88_idx'), models.Index(fields=['rating_average'], name='api_tutorse_rating__61e852_idx'), models.Index(fields=['is_verified'], name='api_tutorse_is_veri_1b0bc6_idx')],
+            },
+        ),
+        migrations.RunPython(build_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:17
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from api import fulltext
+
+FTS_TABLE = fulltext.FTS_TABLE
+
+
+def create_text_indexes(apps, schema_editor):
+    """
+    PostgreSQL: GIN index on search_vector, pg_trgm GIN index on subject_names, and backfill.
+    SQLite: FTS5 virtual table (diacritics folded) and backfill.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS api_tutorsearch_vector_gin '
+            'ON api_tutorsearchdocument USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS api_tutorsearch_subjects_trgm '
+            'ON api_tutorsearchdocument USING gin (subject_names gin_trgm_ops)'
+        )
+        schema_editor.execute(
+            "UPDATE api_tutorsearchdocument AS d SET search_vector = "
+            "setweight(to_tsvector('simple', replace(d.subject_names, '|', ' ')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(t.education, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(t.bio, '')), 'C') "
+            "FROM api_tutorprofile AS t WHERE t.uuid = d.tutor_id"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            'tutor_id UNINDEXED, subjects, education, bio, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        for statement in fulltext.SQLITE_REBUILD:
+            schema_editor.execute(statement)
+
+
+def drop_text_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS api_tutorsearch_vector_gin')
+        schema_editor.execute('DROP INDEX IF EXISTS api_tutorsearch_subjects_trgm')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_tutorsearchdocument'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='tutorsearchdocument',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, null=True),
+        ),
+        migrations.RunPython(create_text_indexes, drop_text_indexes),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_tutor_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='tutorsearchdocument',
+            name='api_tutorse_rating__61e852_idx',
+        ),
+        migrations.AddIndex(
+            model_name='tutorsearchdocument',
+            index=models.Index(fields=['-rating_average', 'tutor'], name='api_tutorse_rating__a48ff8_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:24
+
+import re
+
+from django.db import migrations, models
+
+MAX_GRADE = 13  # university; grades above this have no bit in grade_mask
+
+
+def set_grade_ranges(apps, schema_editor):
+    """
+    Derives grade ranges from existing names such as 'Grade 1-5' or 'Lớp 6-9',
+    then recomputes every tutor's grade mask.
+    """
+    ClassLevel = apps.get_model('api', 'ClassLevel')
+    TutorProfile = apps.get_model('api', 'TutorProfile')
+    TutorSearchDocument = apps.get_model('api', 'TutorSearchDocument')
+
+    masks = {}
+    for level in ClassLevel.objects.all():
+        match = re.search(r'(\d+)\s*-\s*(\d+)', level.name) or re.search(r'(\d+)', level.name)
+        if not match:
+            continue
+        # Clamp to the grades a mask can hold (see api/class_levels.py); leave out-of-range levels unset
+        min_grade = max(int(match.group(1)), 1)
+        max_grade = min(int(match.group(match.lastindex)), MAX_GRADE)
+        if min_grade > max_grade:
+            continue
+        level.min_grade, level.max_grade = min_grade, max_grade
+        level.save(update_fields=['min_grade', 'max_grade'])
+        masks[level.pk] = sum(1 << grade for grade in range(level.min_grade, level.max_grade + 1))
+
+    tutor_masks = {}
+    for tutor_id, level_id in TutorProfile.class_levels.through.objects.values_list('tutorprofile_id', 'classlevel_id'):
+        tutor_masks[tutor_id] = tutor_masks.get(tutor_id, 0) | masks.get(level_id, 0)
+    for tutor_id, mask in tutor_masks.items():
+        TutorSearchDocument.objects.filter(tutor_id=tutor_id).update(grade_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_search_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classlevel',
+            name='max_grade',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='classlevel',
+            name='min_grade',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tutorsearchdocument',
+            name='grade_mask',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(set_grade_ranges, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from api.availability import parse_availability
+
+
+def backfill_slots(apps, schema_editor):
+    TutorProfile = apps.get_model('api', 'TutorProfile')
+    TutorAvailabilitySlot = apps.get_model('api', 'TutorAvailabilitySlot')
+    slots = [
+        TutorAvailabilitySlot(tutor_id=tutor_id, weekday=weekday, start_minute=start, end_minute=end)
+        for tutor_id, availability in TutorProfile.objects.values_list('pk', 'availability').iterator()
+        for weekday, start, end in parse_availability(availability)
+    ]
+    TutorAvailabilitySlot.objects.bulk_create(slots, batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_class_level_grade_ranges'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TutorAvailabilitySlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField()),
+                ('start_minute', models.PositiveSmallIntegerField()),
+                ('end_minute', models.PositiveSmallIntegerField()),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_slots', to='api.tutorprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['weekday', 'start_minute', 'end_minute'], name='api_tutorav_weekday_a49aaf_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tutoravailabilityslot',
+            constraint=models.UniqueConstraint(fields=('tutor', 'weekday', 'start_minute', 'end_minute'), name='unique_tutor_availability_slot'),
+        ),
+        migrations.RunPython(backfill_slots, migrations.RunPython.noop),
+    ]
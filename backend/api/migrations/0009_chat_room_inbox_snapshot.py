@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_inbox_snapshot(apps, schema_editor):
+    ChatRoom = apps.get_model('api', 'ChatRoom')
+    Message = apps.get_model('api', 'Message')
+    for room in ChatRoom.objects.select_related('student').iterator():
+        messages = Message.objects.filter(chat_room=room)
+        last = messages.order_by('-created_at').first()
+        if last is None:
+            continue
+        unread = messages.filter(is_read=False)
+        room.last_message_at = last.created_at
+        room.last_message_preview = last.content[:200]
+        room.last_message_sender_id = last.sender_id
+        room.student_unread_count = unread.exclude(sender_id=room.student.user_id).count()
+        room.tutor_unread_count = unread.filter(sender_id=room.student.user_id).count()
+        room.save(update_fields=[
+            'last_message_at', 'last_message_preview', 'last_message_sender',
+            'student_unread_count', 'tutor_unread_count',
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_tutor_availability_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='student_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='tutor_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_inbox_snapshot, migrations.RunPython.noop),
+    ]
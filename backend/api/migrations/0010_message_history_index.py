@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_chat_room_inbox_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat_room', 'created_at'], name='api_message_chat_ro_f8cc84_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def watermarks_from_read_flags(apps, schema_editor):
+    """Each side's watermark becomes the newest message it received that was flagged as read."""
+    ChatRoom = apps.get_model('api', 'ChatRoom')
+    Message = apps.get_model('api', 'Message')
+    for room in ChatRoom.objects.select_related('student', 'tutor').iterator():
+        read = Message.objects.filter(chat_room=room, is_read=True).order_by('-created_at')
+        for side, sender_id in [('student', room.tutor.user_id), ('tutor', room.student.user_id)]:
+            message = read.filter(sender_id=sender_id).first()
+            if message is not None:
+                setattr(room, f'{side}_last_read_at', message.created_at)
+                setattr(room, f'{side}_last_read_message', message)
+        room.save(update_fields=[
+            'student_last_read_at', 'student_last_read_message', 'tutor_last_read_at', 'tutor_last_read_message',
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_message_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='student_last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='student_last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.message'),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='tutor_last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='tutor_last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.message'),
+        ),
+        migrations.RunPython(watermarks_from_read_flags, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:03
+
+import api.models.chat
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_message_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatAttachment',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('file', models.FileField(upload_to=api.models.chat.chat_attachment_path)),
+                ('size', models.PositiveBigIntegerField()),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('preview', models.ImageField(blank=True, upload_to=api.models.chat.chat_attachment_preview_path)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messages', to='api.chatattachment'),
+        ),
+    ]
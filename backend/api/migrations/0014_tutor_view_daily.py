@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_chat_attachments'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tutorview',
+            name='viewed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='TutorViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='api.tutorprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'tutor'], name='api_tutorvi_date_a71f09_idx')],
+                'unique_together': {('tutor', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:12
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_counters(apps, schema_editor):
+    TutorProfile = apps.get_model('api', 'TutorProfile')
+    TutorLike = apps.get_model('api', 'TutorLike')
+    TutorSave = apps.get_model('api', 'TutorSave')
+    TutorView = apps.get_model('api', 'TutorView')
+    TutorViewDaily = apps.get_model('api', 'TutorViewDaily')
+
+    # Daily counters for the views recorded before they existed
+    TutorViewDaily.objects.bulk_create([
+        TutorViewDaily(tutor_id=row['tutor'], date=row['date'], views=row['views'])
+        for row in TutorView.objects.annotate(date=TruncDate('viewed_at')).values('tutor', 'date').annotate(
+            views=Count('pk')
+        ).order_by()
+    ], batch_size=1000, ignore_conflicts=True)
+
+    totals = {}
+    for field, rows in (
+        ('like_count', TutorLike.objects.values('tutor').annotate(total=Count('pk'))),
+        ('save_count', TutorSave.objects.values('tutor').annotate(total=Count('pk'))),
+        ('view_count', TutorViewDaily.objects.values('tutor').annotate(total=Sum('views'))),
+    ):
+        for row in rows.order_by():
+            totals.setdefault(row['tutor'], {})[field] = row['total']
+    for tutor_id, values in totals.items():
+        TutorProfile.objects.filter(pk=tutor_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_tutor_view_daily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tutorprofile',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tutorprofile',
+            name='save_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tutorprofile',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='tutorprofile',
+            index=models.Index(fields=['-like_count', 'uuid'], name='api_tutorpr_like_co_15cfb7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutorprofile',
+            index=models.Index(fields=['-save_count', 'uuid'], name='api_tutorpr_save_co_b94c0f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutorprofile',
+            index=models.Index(fields=['-view_count', 'uuid'], name='api_tutorpr_view_co_4a4d62_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_tutor_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(blank=True, max_length=50)),
+                ('tutor_ids', models.JSONField(default=list)),
+                ('scores', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TutorTrendingScore',
+            fields=[
+                ('tutor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending_score', serialize=False, to='api.tutorprofile')),
+                ('log_score', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at'], name='api_review_created_24e07e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutorlike',
+            index=models.Index(fields=['created_at'], name='api_tutorli_created_62ed16_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutorsave',
+            index=models.Index(fields=['created_at'], name='api_tutorsa_created_2779a4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutorview',
+            index=models.Index(fields=['viewed_at'], name='api_tutorvi_viewed__1d0a42_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutortrendingscore',
+            index=models.Index(fields=['-log_score'], name='api_tutortr_log_sco_fc70be_idx'),
+        ),
+        migrations.AddField(
+            model_name='trendingfeed',
+            name='subject',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.subject'),
+        ),
+        migrations.AddIndex(
+            model_name='trendingfeed',
+            index=models.Index(fields=['location', 'subject'], name='api_trendin_locatio_e6e9dd_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from api import fulltext
+
+
+def create_text_triggers(apps, schema_editor):
+    """Moves full-text indexing from Python signal handlers into the database (SQL in api/fulltext.py)."""
+    fulltext.create_text_triggers(schema_editor)
+
+
+def drop_text_triggers(apps, schema_editor):
+    fulltext.drop_text_triggers(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_trending_tutors'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_text_triggers, drop_text_triggers),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+from django.db.models.functions import Lower, Trim
+
+
+def normalize_locations(apps, schema_editor):
+    """Search matches document locations exactly; stored values must be stripped and lowercase."""
+    TutorSearchDocument = apps.get_model('api', 'TutorSearchDocument')
+    TutorSearchDocument.objects.update(location=Lower(Trim('location')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_tutor_search_text_triggers'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_viewed_at(apps, schema_editor):
+    # Existing views were written when they happened, and the trending watermark was compared to viewed_at
+    TutorView = apps.get_model('api', 'TutorView')
+    TutorView.objects.update(created_at=models.F('viewed_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_normalize_search_document_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tutorview',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_viewed_at, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='tutorview',
+            name='api_tutorvi_viewed__1d0a42_idx',
+        ),
+        migrations.AddIndex(
+            model_name='tutorview',
+            index=models.Index(fields=['created_at'], name='api_tutorvi_created_5303ed_idx'),
+        ),
+        migrations.AlterField(
+            model_name='trendingwatermark',
+            name='value',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
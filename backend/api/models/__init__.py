@@ -2,9 +2,11 @@
 from .user import CustomUser
 from .subject import Subject
 from .profile import StudentProfile, TutorProfile, TutorSubject, ClassLevel
-from .interaction import TutorLike, TutorSave, TutorView
-from .chat import ChatRoom, Message
+from .interaction import TutorLike, TutorSave, TutorView, TutorViewDaily
+from .chat import ChatRoom, ChatAttachment, Message
 from .review import Review
+from .search import TutorSearchDocument, TutorAvailabilitySlot
+from .trending import TutorTrendingScore, TrendingFeed, TrendingWatermark
 
 __all__ = [
     'CustomUser',
@@ -15,10 +17,17 @@ __all__ = [
     'TutorLike',
     'TutorSave', 
     'TutorView',
+    'TutorViewDaily',
     'ChatRoom',
+    'ChatAttachment',
     'Message',
     'Review',
     'ClassLevel',
+    'TutorSearchDocument',
+    'TutorAvailabilitySlot',
+    'TutorTrendingScore',
+    'TrendingFeed',
+    'TrendingWatermark',
     # 'user_profile_path',
     # 'chat_file_path',
 ]
\ No newline at end of file
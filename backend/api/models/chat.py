@@ -1,13 +1,27 @@
 # models/chat.py
 from django.db import models
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from api.models.user import CustomUser
 from api.models.profile import StudentProfile, TutorProfile
+import os
 import uuid
 
 
 def chat_file_path(instance, filename):
     return f'chat/{instance.chat_room.id}/{filename}'
 
+
+def chat_attachment_path(instance, filename):
+    """Content-addressed, so identical uploads in any room share one file."""
+    extension = os.path.splitext(filename)[1].lower()[:10]
+    return f'chat/attachments/{instance.sha256[:2]}/{instance.sha256}{extension}'
+
+
+def chat_attachment_preview_path(instance, filename):
+    return f'chat/attachments/previews/{instance.sha256}.jpg'
+
 class ChatRoom(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     student = models.ForeignKey(StudentProfile, to_field='uuid', db_column='student_profile_uuid', on_delete=models.CASCADE, related_name='chat_rooms')
@@ -15,10 +29,128 @@ class ChatRoom(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     last_message_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
+
+    # Denormalized inbox data, maintained by record_message() / mark_read()
+    last_message_preview = models.CharField(max_length=200, blank=True)  # e.g., "Hẹn em 7h tối nay nhé"
+    last_message_sender = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    student_unread_count = models.PositiveIntegerField(default=0)
+    tutor_unread_count = models.PositiveIntegerField(default=0)
+
+    # Read watermarks: everything up to this message has been read by that participant
+    student_last_read_at = models.DateTimeField(null=True, blank=True)
+    student_last_read_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    tutor_last_read_at = models.DateTimeField(null=True, blank=True)
+    tutor_last_read_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    PREVIEW_LENGTH = 200
     
     class Meta:
         unique_together = ['student', 'tutor']
 
+    def side_for(self, user_id):
+        """'student' or 'tutor', for a participant of this room."""
+        return 'student' if user_id == self.student.user_id else 'tutor'
+
+    def unread_field_for(self, user):
+        """Name of the unread counter column belonging to `user` (a participant of this room)."""
+        return f'{self.side_for(user.id)}_unread_count'
+
+    def last_read_at_for(self, user_id):
+        """Read watermark of a participant, or None if they have read nothing."""
+        return getattr(self, f'{self.side_for(user_id)}_last_read_at')
+
+    def record_message(self, message):
+        """
+        Updates the last-message snapshot and bumps the recipient's unread counter
+        in one UPDATE. The snapshot only moves forward, so a late write never
+        replaces a newer message.
+
+        Returns the number of rooms updated: 0 means the room has been
+        deactivated, and callers should roll the message back.
+        """
+        return self.record_messages([message])
+
+    def record_messages(self, messages):
+        """
+        record_message() for a batch of this room's messages: still one UPDATE,
+        with the newest message as the snapshot and one increment per recipient.
+        """
+        latest = max(messages, key=lambda message: message.created_at)
+        to_tutor = sum(1 for message in messages if message.sender_id == self.student.user_id)
+        increments = {}
+        if to_tutor:
+            increments['tutor_unread_count'] = F('tutor_unread_count') + to_tutor
+        if len(messages) - to_tutor:
+            increments['student_unread_count'] = F('student_unread_count') + (len(messages) - to_tutor)
+
+        def if_newer(value, field):
+            return Case(
+                When(last_message_at__lte=latest.created_at, then=Value(value)),
+                default=F(field),
+                output_field=ChatRoom._meta.get_field(field),
+            )
+
+        return ChatRoom.objects.filter(pk=self.pk, is_active=True).update(
+            last_message_at=if_newer(latest.created_at, 'last_message_at'),
+            last_message_preview=if_newer(latest.content[:self.PREVIEW_LENGTH], 'last_message_preview'),
+            last_message_sender=if_newer(latest.sender_id, 'last_message_sender'),
+            **increments,
+        )
+
+    def mark_read(self, user, message_id=None):
+        """
+        Advances `user`'s read watermark to the given message (default: the newest
+        one) and recomputes their unread counter, in one UPDATE however many
+        messages that covers. The watermark never moves backwards.
+
+        Returns the watermark message, or None if there was nothing to mark.
+        Raises Message.DoesNotExist if message_id is not a message of this room.
+        """
+        messages = Message.objects.filter(chat_room=self)
+        if message_id is None:
+            message = messages.order_by('-created_at', '-pk').only('pk', 'created_at').first()
+            if message is None:
+                return None
+        else:
+            message = messages.only('pk', 'created_at').get(pk=message_id)
+
+        side = self.side_for(user.id)
+        read_at_field = f'{side}_last_read_at'
+        unread = Message.objects.filter(
+            chat_room=OuterRef('pk'), created_at__gt=message.created_at
+        ).exclude(sender_id=user.id).values('chat_room').annotate(n=Count('pk')).values('n')
+
+        ChatRoom.objects.filter(
+            Q(**{f'{read_at_field}__isnull': True}) | Q(**{f'{read_at_field}__lt': message.created_at}),
+            pk=self.pk,
+        ).update(**{
+            read_at_field: message.created_at,
+            f'{side}_last_read_message': message.pk,
+            f'{side}_unread_count': Coalesce(Subquery(unread, output_field=IntegerField()), Value(0)),
+        })
+        self.refresh_from_db(fields=[read_at_field, f'{side}_last_read_message', f'{side}_unread_count'])
+        return message
+
+class ChatAttachment(models.Model):
+    """
+    One stored file per distinct content (keyed by its SHA-256), shared by
+    every message that attaches it. Uploaded through api/attachments.py;
+    image previews are generated in the background.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(upload_to=chat_attachment_path)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True)
+    preview = models.ImageField(upload_to=chat_attachment_preview_path, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+    @property
+    def is_image(self):
+        return self.content_type.startswith('image/')
+
 class Message(models.Model):
     MESSAGE_TYPES = [
         ('text', 'Text'),
@@ -32,8 +164,13 @@ class Message(models.Model):
     content = models.TextField()
     message_type = models.CharField(max_length=20, choices=MESSAGE_TYPES, default='text')
     file_attachment = models.FileField(upload_to=chat_file_path, blank=True)
-    is_read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    attachment = models.ForeignKey(ChatAttachment, on_delete=models.SET_NULL, null=True, blank=True, related_name='messages')
+    # default rather than auto_now_add: write-behind batches keep the time the message was sent
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Chat history windows (see MessageWindowPagination)
+            models.Index(fields=['chat_room', 'created_at']),
+        ]
@@ -1,24 +1,150 @@
 # models/interaction.py
-from django.db import models
+from collections import defaultdict
+
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
 from .profile import StudentProfile, TutorProfile
 
 
-class TutorLike(models.Model):
+class StudentTutorToggle:
+    """
+    Idempotent add/remove for a (student, tutor) row, such as a like or a save.
+
+    Both are a single statement keyed on the requesting user's ID and the tutor
+    UUID, so neither profile is loaded:
+
+        INSERT ... SELECT <student uuid>, <tutor uuid>, now
+          FROM student_profiles, api_tutorprofile WHERE <both match>
+          ON CONFLICT DO NOTHING
+        DELETE ... WHERE tutor = <uuid> AND student IN (<student of user>)
+
+    The affected row count says whether anything changed. A double tap therefore
+    changes nothing, and the tutor's COUNTER_FIELD moves only on a real change,
+    in the same transaction. An unknown tutor or student matches no row.
+    """
+    COUNTER_FIELD = None  # TutorProfile counter kept in step, e.g. 'like_count'
+
+    @classmethod
+    def _columns(cls):
+        quote = connection.ops.quote_name
+        student_field = cls._meta.get_field('student')
+        return {
+            'table': quote(cls._meta.db_table),
+            'student': quote(student_field.column),
+            'tutor': quote(cls._meta.get_field('tutor').column),
+            'created_at': quote(cls._meta.get_field('created_at').column),
+            'students': quote(StudentProfile._meta.db_table),
+            'student_key': quote(student_field.target_field.column),
+            'student_user': quote(StudentProfile._meta.get_field('user').column),
+            'tutors': quote(TutorProfile._meta.db_table),
+            'tutor_key': quote(TutorProfile._meta.pk.column),
+        }
+
+    @staticmethod
+    def _params(user_id, tutor_id):
+        """(user_id, tutor_id) as the database expects them, e.g. hex strings on SQLite."""
+        return (
+            StudentProfile._meta.get_field('user').get_db_prep_value(user_id, connection),
+            TutorProfile._meta.pk.get_db_prep_value(tutor_id, connection),
+        )
+
+    @classmethod
+    def add(cls, user_id, tutor_id):
+        """Returns True if the row was inserted, False if it already existed or nothing matched."""
+        sql = (
+            'INSERT INTO {table} ({student}, {tutor}, {created_at}) '
+            'SELECT s.{student_key}, t.{tutor_key}, %s FROM {students} s, {tutors} t '
+            'WHERE s.{student_user} = %s AND t.{tutor_key} = %s '
+            'ON CONFLICT DO NOTHING'
+        ).format(**cls._columns())
+        created_at = cls._meta.get_field('created_at').get_db_prep_value(timezone.now(), connection)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [created_at, *cls._params(user_id, tutor_id)])
+            created = cursor.rowcount > 0
+            if created:
+                TutorProfile.add_to_counter(cls.COUNTER_FIELD, {tutor_id: 1})
+        return created
+
+    @classmethod
+    def remove(cls, user_id, tutor_id):
+        """Returns True if a row was deleted."""
+        sql = (
+            'DELETE FROM {table} WHERE {tutor} = %s '
+            'AND {student} IN (SELECT {student_key} FROM {students} WHERE {student_user} = %s)'
+        ).format(**cls._columns())
+        user_param, tutor_param = cls._params(user_id, tutor_id)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [tutor_param, user_param])
+            deleted = cursor.rowcount > 0
+            if deleted:
+                TutorProfile.add_to_counter(cls.COUNTER_FIELD, {tutor_id: -1})
+        return deleted
+
+    @classmethod
+    def set_many(cls, student_uuid, states):
+        """
+        Applies {tutor_id: True/False} for one student with at most one INSERT,
+        one DELETE and one counter UPDATE. The tutors must exist.
+
+        As in add()/remove(), the counters move only by what the statements
+        changed: INSERT ... ON CONFLICT DO NOTHING RETURNING and DELETE ...
+        RETURNING report the affected rows, so concurrent batches for the same
+        student never count a row twice. Returns the (added, removed) tutor ID sets.
+        """
+        tutor_key = TutorProfile._meta.pk
+        student = cls._meta.get_field('student').target_field.get_db_prep_value(student_uuid, connection)
+        on = [tutor_key.get_db_prep_value(tutor_id, connection) for tutor_id, state in states.items() if state]
+        off = [tutor_key.get_db_prep_value(tutor_id, connection) for tutor_id, state in states.items() if not state]
+        columns = cls._columns()
+        added, removed = set(), set()
+        with transaction.atomic(), connection.cursor() as cursor:
+            if on:
+                created_at = cls._meta.get_field('created_at').get_db_prep_value(timezone.now(), connection)
+                cursor.execute(
+                    'INSERT INTO {table} ({student}, {tutor}, {created_at}) VALUES {rows} '
+                    'ON CONFLICT DO NOTHING RETURNING {tutor}'.format(
+                        rows=', '.join(['(%s, %s, %s)'] * len(on)), **columns
+                    ),
+                    [param for tutor_id in on for param in (student, tutor_id, created_at)],
+                )
+                added = {tutor_key.to_python(row[0]) for row in cursor.fetchall()}
+            if off:
+                cursor.execute(
+                    'DELETE FROM {table} WHERE {student} = %s AND {tutor} IN ({placeholders}) RETURNING {tutor}'.format(
+                        placeholders=', '.join(['%s'] * len(off)), **columns
+                    ),
+                    [student, *off],
+                )
+                removed = {tutor_key.to_python(row[0]) for row in cursor.fetchall()}
+            amounts = {**dict.fromkeys(added, 1), **dict.fromkeys(removed, -1)}
+            if amounts:
+                TutorProfile.add_to_counter(cls.COUNTER_FIELD, amounts)
+        return added, removed
+
+
+class TutorLike(StudentTutorToggle, models.Model):
     student = models.ForeignKey(StudentProfile, to_field='uuid', db_column='student_profile_uuid', on_delete=models.CASCADE, related_name='liked_tutors')
     tutor = models.ForeignKey(TutorProfile, on_delete=models.CASCADE, related_name='likes')
     created_at = models.DateTimeField(auto_now_add=True)
+
+    COUNTER_FIELD = 'like_count'
     
     class Meta:
         unique_together = ['student', 'tutor']
+        indexes = [models.Index(fields=['created_at'])]  # incremental reads by the trending job
 
 
-class TutorSave(models.Model):
+class TutorSave(StudentTutorToggle, models.Model):
     student = models.ForeignKey(StudentProfile, to_field='uuid', db_column='student_profile_uuid', on_delete=models.CASCADE, related_name='saved_tutors')
     tutor = models.ForeignKey(TutorProfile, on_delete=models.CASCADE, related_name='saves')
     created_at = models.DateTimeField(auto_now_add=True)
+
+    COUNTER_FIELD = 'save_count'
     
     class Meta:
         unique_together = ['student', 'tutor']
+        indexes = [models.Index(fields=['created_at'])]  # incremental reads by the trending job
 
 
 class TutorView(models.Model):
@@ -35,5 +161,41 @@ class TutorView(models.Model):
         related_name='views'  # Allows reverse lookup: tutor.views.all()
     )
     viewed_at = models.DateTimeField(
-        auto_now_add=True  # Timestamp for when the view was created
-    )
\ No newline at end of file
+        default=timezone.now  # When the view happened; set by the view buffer, which writes in batches
+    )
+    created_at = models.DateTimeField(auto_now_add=True)  # When the buffer wrote it, possibly much later
+
+    class Meta:
+        indexes = [models.Index(fields=['created_at'])]  # incremental reads by the trending job, pruning
+
+
+class TutorViewDaily(models.Model):
+    # Views per tutor per day, maintained by the view-tracking flush (api/view_tracking.py).
+    # Cheap to sum over a window for ranking, unlike counting TutorView rows.
+    tutor = models.ForeignKey(TutorProfile, on_delete=models.CASCADE, related_name='daily_views')
+    date = models.DateField()  # Local date (TIME_ZONE), e.g. 2024-03-15
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['tutor', 'date']
+        indexes = [models.Index(fields=['date', 'tutor'])]
+
+    @classmethod
+    def add_views(cls, counts):
+        """
+        Adds {(tutor_id, date): views} to the counters: one INSERT for the
+        missing rows, then one UPDATE per date.
+        """
+        if not counts:
+            return
+        cls.objects.bulk_create(
+            [cls(tutor_id=tutor_id, date=date) for tutor_id, date in counts], ignore_conflicts=True
+        )
+        by_date = defaultdict(dict)
+        for (tutor_id, date), views in counts.items():
+            by_date[date][tutor_id] = views
+        for date, per_tutor in by_date.items():
+            cls.objects.filter(date=date, tutor_id__in=per_tutor).update(views=F('views') + Case(
+                *[When(tutor_id=tutor_id, then=Value(views)) for tutor_id, views in per_tutor.items()],
+                default=Value(0), output_field=models.PositiveIntegerField()
+            ))
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Greatest
 from .user import CustomUser
 from .subject import Subject
 import uuid
@@ -84,6 +85,12 @@ class TutorProfile(models.Model):
     rating_average = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)  # e.g., 4.85
     total_reviews = models.IntegerField(default=0)  # e.g., 15
 
+    # Denormalized popularity counters, kept with F() increments (see add_to_counter)
+    # and corrected by the reconcile_tutor_counters command
+    like_count = models.PositiveIntegerField(default=0)  # e.g., 42
+    save_count = models.PositiveIntegerField(default=0)  # e.g., 17
+    view_count = models.PositiveIntegerField(default=0)  # e.g., 1250
+
     profile_image = models.ImageField(upload_to=user_profile_path, blank=True)  # e.g., "profiles/{user_id}/avatar.png"
     availability = models.JSONField(default=dict, blank=True)  # e.g., {"monday": ["18:00-20:00"], "tuesday": []}
 
@@ -100,8 +107,35 @@ class TutorProfile(models.Model):
             models.Index(fields=['price_max']),
             models.Index(fields=['location']),
             models.Index(fields=['rating_average']),
+            # Match the popularity orderings of the tutor search, for keyset pagination
+            models.Index(fields=['-like_count', 'uuid']),
+            models.Index(fields=['-save_count', 'uuid']),
+            models.Index(fields=['-view_count', 'uuid']),
         ]
 
+    COUNTER_FIELDS = ('like_count', 'save_count', 'view_count')
+
+    @classmethod
+    def add_to_counter(cls, field, amounts):
+        """
+        Atomically adds {tutor_id: amount} to a counter column with an F() expression,
+        in one UPDATE. Amounts may be negative; a counter never goes below zero
+        (a single decrement that would is skipped, batched results are clamped).
+        """
+        if len(amounts) == 1:
+            (tutor_id, amount), = amounts.items()
+            queryset = cls.objects.filter(pk=tutor_id)
+            if amount < 0:
+                queryset = queryset.filter(**{f'{field}__gte': -amount})
+            return queryset.update(**{field: models.F(field) + amount})
+        total = models.F(field) + models.Case(
+            *[models.When(pk=tutor_id, then=models.Value(amount)) for tutor_id, amount in amounts.items()],
+            default=models.Value(0), output_field=models.IntegerField()
+        )
+        if min(amounts.values()) < 0:
+            total = Greatest(total, models.Value(0))
+        return cls.objects.filter(pk__in=amounts).update(**{field: total})
+
     def update_rating(self):
         """Recalculate rating average and review count from related reviews."""
         reviews = self.reviews_received.all()  # e.g., all Review objects for this tutor
@@ -160,6 +194,9 @@ class TutorSubject(models.Model):
 
 class ClassLevel(models.Model):
     name = models.CharField(max_length=50, unique=True)  # e.g., "Lớp 6-9"
+    # Inclusive grade range covered by this level; university is grade 13 (see api/class_levels.py)
+    min_grade = models.PositiveSmallIntegerField(null=True, blank=True)  # e.g., 6
+    max_grade = models.PositiveSmallIntegerField(null=True, blank=True)  # e.g., 9
 
     def __str__(self):
         return self.name
\ No newline at end of file
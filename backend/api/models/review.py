@@ -34,4 +34,5 @@ class Review(models.Model):
     
     class Meta:
         # Each student can only leave one review per tutor
-        unique_together = ['student', 'tutor']
\ No newline at end of file
+        unique_together = ['student', 'tutor']
+        indexes = [models.Index(fields=['created_at'])]  # incremental reads by the trending job
\ No newline at end of file
@@ -0,0 +1,179 @@
+# models/search.py
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+from api.availability import parse_availability
+from .profile import TutorProfile, TutorSubject
+
+
+def _join_tokens(values):
+    """Returns values as a '|'-delimited string, e.g. '|toán|vật lý|', or '' if empty."""
+    values = [str(value) for value in values]
+    return f"|{'|'.join(values)}|" if values else ''
+
+
+# ===========================
+# Tutor Search Document
+# ===========================
+class TutorSearchDocument(models.Model):
+    """
+    Flattened, one-row-per-tutor copy of everything the tutor search filters on.
+
+    Subjects and class levels are stored as '|'-delimited token strings so the
+    search can match them with a plain LIKE on this table instead of joining
+    TutorSubject/Subject/ClassLevel and de-duplicating with DISTINCT.
+    Kept in sync incrementally by the handlers in api/signals.py.
+
+    search_vector has a GIN index (and subject_names a pg_trgm GIN index) on PostgreSQL.
+    They are created in migration 0005 rather than Meta.indexes so SQLite can still migrate.
+    """
+    PROFILE_FIELDS = ('location', 'price_min', 'price_max', 'rating_average', 'is_verified')
+
+    tutor = models.OneToOneField(TutorProfile, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    subject_ids = models.TextField(blank=True)  # e.g., "|6f1c...|9a2b...|"
+    subject_names = models.TextField(blank=True)  # e.g., "|toán|vật lý|" (lowercased)
+    class_level_ids = models.TextField(blank=True)  # e.g., "|1|3|"
+    grade_mask = models.IntegerField(default=0)  # bit g set if any class level covers grade g
+    location = models.CharField(max_length=50, blank=True)  # e.g., "hanoi" (always lowercase)
+    price_min = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    price_max = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    rating_average = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
+    is_verified = models.BooleanField(default=False)
+    # Weighted tsvector of subjects/education/bio; PostgreSQL only, see api/fulltext.py
+    search_vector = SearchVectorField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['location', 'price_min']),
+            models.Index(fields=['price_min']),
+            # Matches the search ordering, for keyset pagination (see api/pagination.py)
+            models.Index(fields=['-rating_average', 'tutor']),
+            models.Index(fields=['is_verified']),
+        ]
+
+    def __str__(self):
+        return f"Search document for {self.tutor_id}"
+
+    @staticmethod
+    def subject_tokens(tutor_id):
+        """Returns the (subject_ids, subject_names) token strings for a tutor."""
+        rows = TutorSubject.objects.filter(tutor_profile_id=tutor_id).values_list(
+            'subject_id', 'subject__name'
+        ).order_by('subject__name')
+        subject_ids, subject_names = [], []
+        for subject_id, name in rows:
+            if subject_id.hex not in subject_ids:
+                subject_ids.append(subject_id.hex)
+                subject_names.append(name.lower())
+        return _join_tokens(subject_ids), _join_tokens(subject_names)
+
+    @staticmethod
+    def class_level_fields(tutor_id):
+        """Returns the class_level_ids tokens and grade_mask for a tutor."""
+        # Imported here: api.class_levels imports api.models
+        from api.class_levels import mask_for_class_levels
+
+        through = TutorProfile.class_levels.through
+        level_ids = list(through.objects.filter(tutorprofile_id=tutor_id).values_list(
+            'classlevel_id', flat=True
+        ).order_by('classlevel_id'))
+        return {
+            'class_level_ids': _join_tokens(level_ids),
+            'grade_mask': mask_for_class_levels(level_ids),
+        }
+
+    @staticmethod
+    def normalize_location(value):
+        """Location codes are matched exactly, so the document stores them stripped and lowercased."""
+        return (value or '').strip().lower()
+
+    @classmethod
+    def profile_values(cls, tutor):
+        values = {field: getattr(tutor, field) for field in cls.PROFILE_FIELDS}
+        values['location'] = cls.normalize_location(values['location'])
+        return values
+
+    @classmethod
+    def rebuild(cls, tutor_id):
+        """Builds (or rebuilds) the full document for a single tutor."""
+        tutor = TutorProfile.objects.filter(pk=tutor_id).first()
+        if tutor is None:
+            return None
+        subject_ids, subject_names = cls.subject_tokens(tutor_id)
+        defaults = cls.profile_values(tutor)
+        defaults.update(
+            subject_ids=subject_ids,
+            subject_names=subject_names,
+            **cls.class_level_fields(tutor_id),
+        )
+        document, _ = cls.objects.update_or_create(tutor_id=tutor_id, defaults=defaults)
+        return document
+
+    @classmethod
+    def sync_profile(cls, tutor):
+        """Copies the denormalized TutorProfile columns onto the document."""
+        values = cls.profile_values(tutor)
+        if not cls.objects.filter(tutor_id=tutor.pk).update(**values):
+            cls.rebuild(tutor.pk)
+
+    @classmethod
+    def sync_subjects(cls, tutor_id, create=True):
+        """Refreshes the subject tokens. Pass create=False from delete handlers."""
+        subject_ids, subject_names = cls.subject_tokens(tutor_id)
+        updated = cls.objects.filter(tutor_id=tutor_id).update(
+            subject_ids=subject_ids, subject_names=subject_names
+        )
+        if not updated and create:
+            cls.rebuild(tutor_id)
+
+    @classmethod
+    def sync_class_levels(cls, tutor_id, create=True):
+        """Refreshes the class level tokens and grade mask. Pass create=False from delete handlers."""
+        updated = cls.objects.filter(tutor_id=tutor_id).update(**cls.class_level_fields(tutor_id))
+        if not updated and create:
+            cls.rebuild(tutor_id)
+
+
+# ===========================
+# Tutor Availability Slot
+# ===========================
+class TutorAvailabilitySlot(models.Model):
+    """
+    One row per weekly time slot parsed from TutorProfile.availability (see api/availability.py).
+
+    "Free at/between" searches are interval-overlap tests on
+    (weekday, start_minute, end_minute), which the composite index answers
+    with a range scan. Kept in sync by the TutorProfile handler in api/signals.py.
+    """
+    tutor = models.ForeignKey(TutorProfile, on_delete=models.CASCADE, related_name='availability_slots')
+    weekday = models.PositiveSmallIntegerField()  # 0 = Monday ... 6 = Sunday
+    start_minute = models.PositiveSmallIntegerField()  # e.g., 1080 for 18:00
+    end_minute = models.PositiveSmallIntegerField()  # e.g., 1200 for 20:00 (exclusive)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['weekday', 'start_minute', 'end_minute']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['tutor', 'weekday', 'start_minute', 'end_minute'], name='unique_tutor_availability_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.tutor_id} {self.weekday} {self.start_minute}-{self.end_minute}"
+
+    @classmethod
+    def sync_tutor(cls, tutor):
+        """
+        Replaces a tutor's slots with those parsed from tutor.availability.
+        Returns True if anything changed.
+        """
+        slots = parse_availability(tutor.availability)
+        existing = sorted(cls.objects.filter(tutor_id=tutor.pk).values_list('weekday', 'start_minute', 'end_minute'))
+        if existing == slots:
+            return False
+        cls.objects.filter(tutor_id=tutor.pk).delete()
+        cls.objects.bulk_create([
+            cls(tutor_id=tutor.pk, weekday=weekday, start_minute=start, end_minute=end)
+            for weekday, start, end in slots
+        ])
+        return True
@@ -0,0 +1,38 @@
+# models/trending.py
+from django.db import models
+from .profile import TutorProfile
+from .subject import Subject
+
+
+class TutorTrendingScore(models.Model):
+    """
+    A tutor's exponentially decayed interaction score, kept in log space against
+    a fixed epoch so stored rows never need re-decaying (see api/trending.py).
+    """
+    tutor = models.OneToOneField(TutorProfile, on_delete=models.CASCADE, primary_key=True, related_name='trending_score')
+    log_score = models.FloatField()  # log(sum(weight * exp(decay_rate * (t - epoch)))), e.g. 12.7
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-log_score'])]
+
+
+class TrendingFeed(models.Model):
+    """
+    Precomputed top trending tutors for one location/subject combination.
+    An empty location or a null subject means "any"; rebuilt by update_trending().
+    """
+    location = models.CharField(max_length=50, blank=True)  # e.g., "hanoi", or "" for all locations
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    tutor_ids = models.JSONField(default=list)  # ordered, e.g. ["6f1c...", "9a2b..."]
+    scores = models.JSONField(default=list)  # current decayed score per tutor, same order
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['location', 'subject'])]
+
+
+class TrendingWatermark(models.Model):
+    """Interaction events up to `value` have been folded into the trending scores."""
+    name = models.CharField(max_length=50, primary_key=True)  # e.g., "tutor_events"
+    value = models.DateTimeField(null=True)  # null until the first run
@@ -0,0 +1,242 @@
+# api/pagination.py
+import base64
+import json
+import math
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination over the queryset's own order_by().
+
+    The cursor holds the ordering values of the last row of the page, and the
+    next page is fetched with a WHERE (a, b) "after" (x, y) clause instead of
+    OFFSET, so every page costs the same regardless of depth. The primary key
+    is appended to the ordering as a tie-breaker when it is not already there.
+
+    COUNT(*) is only run when the client asks for it with ?count=true.
+
+    Response: {"next": <url or null>, "results": [...], "count": <int, optional>}
+    """
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering).annotate(**{
+            self._alias(index): F(field.lstrip('-')) for index, field in enumerate(self.ordering)
+        })
+        self.fields = [queryset.query.annotations[self._alias(index)].output_field for index in range(len(self.ordering))]
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self._after(cursor))
+
+        page_size = self.get_page_size(request)
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        self.next_cursor = self.get_next_cursor()
+        return self.page
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([('next', self.get_next_link()), ('results', data)])
+        if self.count is not None:
+            payload['count'] = self.count
+            payload.move_to_end('count', last=False)
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_ordering(self, queryset):
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)]
+        pk_name = queryset.model._meta.pk.name
+        if not any(field.lstrip('-') in ('pk', pk_name) for field in ordering):
+            ordering.append(pk_name)
+        return ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        values = [getattr(last, self._alias(index)) for index in range(len(self.ordering))]
+        return self.encode_cursor(values)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(self.base_url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_page_state(self):
+        """Returns a cacheable summary of the current page: row pks, next cursor and count."""
+        return {
+            'pks': [row.pk for row in self.page],
+            'next_cursor': self.next_cursor,
+            'count': self.count,
+        }
+
+    def restore_page_state(self, request, state, rows):
+        """Re-creates a page from get_page_state() output without querying."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page = rows
+        self.next_cursor = state['next_cursor']
+        self.count = state['count']
+        return rows
+
+    def encode_cursor(self, values):
+        raw = json.dumps([str(value) for value in values])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return [self.coerce_cursor_value(field, value) for field, value in zip(self.fields, values)]
+
+    def coerce_cursor_value(self, field, value):
+        """Converts a cursor component to its ordering field's type, so a forged cursor is a 404 rather than a 500."""
+        if not isinstance(value, str):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            value = field.to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        if value is None or (isinstance(value, float) and not math.isfinite(value)):
+            raise NotFound(self.invalid_cursor_message)
+        return value
+
+    def _after(self, values):
+        """
+        Builds the lexicographic "row comes after cursor" condition:
+        (a > x) OR (a = x AND b > y) OR ..., flipping < / > for descending fields.
+        """
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            term = Q(**{f'{self._alias(index)}__{lookup}': values[index]})
+            for prev in range(index):
+                term &= Q(**{self._alias(prev): values[prev]})
+            condition |= term
+        return condition
+
+    @staticmethod
+    def _alias(index):
+        return f'keyset_{index}'
+
+
+class MessageWindowPagination(BasePagination):
+    """
+    Windowed pagination over a chat room's messages, keyed on (created_at, id).
+
+    Without parameters the newest window is returned. ?before=<message id> loads
+    the window of older messages just before that message (scrollback), and
+    ?after=<message id> loads the newer ones just after it. Each window is one
+    index range scan on (chat_room, created_at), so cost does not grow with
+    thread length. Results are always in chronological order.
+
+    Response: {"previous": <url of older window or null>, "next": <url of newer window or null>, "results": [...]}
+    """
+    page_size = 50
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    before_query_param = 'before'
+    after_query_param = 'after'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        before = request.query_params.get(self.before_query_param)
+        after = request.query_params.get(self.after_query_param)
+
+        if after:
+            created_at, pk = self.get_anchor(queryset, after)
+            rows = list(queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+            ).order_by('created_at', 'pk')[:page_size + 1])
+            self.has_older, self.has_newer = True, len(rows) > page_size
+            self.page = rows[:page_size]
+        else:
+            if before:
+                created_at, pk = self.get_anchor(queryset, before)
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+            rows = list(queryset.order_by('-created_at', '-pk')[:page_size + 1])
+            self.has_older, self.has_newer = len(rows) > page_size, bool(before)
+            self.page = rows[:page_size][::-1]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('previous', self.get_previous_link()),
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_anchor(self, queryset, message_id):
+        """Returns (created_at, pk) of the cursor message, which must belong to the queryset."""
+        try:
+            return queryset.values_list('created_at', 'pk').get(pk=message_id)
+        except (queryset.model.DoesNotExist, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_previous_link(self):
+        if not self.has_older or not self.page:
+            return None
+        url = remove_query_param(self.base_url, self.after_query_param)
+        return replace_query_param(url, self.before_query_param, self.page[0].pk)
+
+    def get_next_link(self):
+        if not self.has_newer or not self.page:
+            return None
+        url = remove_query_param(self.base_url, self.before_query_param)
+        return replace_query_param(url, self.after_query_param, self.page[-1].pk)
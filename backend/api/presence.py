@@ -0,0 +1,260 @@
+# api/presence.py
+"""
+Which users currently have an open WebSocket connection.
+
+Every connection is registered under its channel name with an expiry time that
+the consumer's heartbeat pushes forward. A user is online while at least one
+of their connections has not expired. Several tabs or rooms are counted
+correctly, and connections left behind by a crashed worker age out after
+PRESENCE_TTL seconds.
+
+The state lives in the channel-layer Redis when RedisChannelLayer is
+configured, and in process memory otherwise (development, tests).
+
+CustomUser.is_online and last_activity are copied from it by
+sync_to_database() in a few batched UPDATEs. Consumers call it on connect,
+disconnect and heartbeat. A shared lock makes it run at most once every
+PRESENCE_SYNC_INTERVAL seconds across all workers. The sync_presence command
+runs it from cron, for when nobody is connected.
+"""
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+
+from api.models import CustomUser
+
+PRESENCE_TTL = getattr(settings, 'PRESENCE_TTL', 90)  # seconds without a heartbeat before a connection expires
+PRESENCE_HEARTBEAT_INTERVAL = getattr(settings, 'PRESENCE_HEARTBEAT_INTERVAL', 30)  # seconds
+PRESENCE_SYNC_INTERVAL = getattr(settings, 'PRESENCE_SYNC_INTERVAL', 15)  # seconds between database syncs
+
+SYNC_BATCH_SIZE = 500  # users per last_activity UPDATE
+
+
+class MemoryPresenceStore:
+    """Per-process presence state. Only correct with a single worker process."""
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = {}  # user_id -> {channel_name: expires_at}
+        self._last_seen = {}  # user_id -> timestamp
+        self._dirty = set()
+        self._sync_after = 0.0
+
+    def touch(self, user_id, channel_name, now):
+        with self._lock:
+            self._connections.setdefault(user_id, {})[channel_name] = now + PRESENCE_TTL
+            self._last_seen[user_id] = now
+            self._dirty.add(user_id)
+
+    def remove(self, user_id, channel_name, now):
+        with self._lock:
+            connections = self._connections.get(user_id, {})
+            connections.pop(channel_name, None)
+            if not connections:
+                self._connections.pop(user_id, None)
+            self._last_seen[user_id] = now
+            self._dirty.add(user_id)
+
+    def online(self, user_ids, now):
+        with self._lock:
+            return {
+                user_id for user_id in user_ids
+                if any(expires_at > now for expires_at in self._connections.get(user_id, {}).values())
+            }
+
+    def take_dirty(self):
+        with self._lock:
+            dirty = {user_id: self._last_seen.pop(user_id, None) for user_id in self._dirty}
+            self._dirty = set()
+            return dirty
+
+    def mark_dirty(self, last_seen):
+        with self._lock:
+            for user_id, seen in last_seen.items():
+                self._dirty.add(user_id)
+                if seen is not None:
+                    self._last_seen[user_id] = max(seen, self._last_seen.get(user_id, seen))
+
+    def acquire_sync_lock(self, now):
+        with self._lock:
+            if now < self._sync_after:
+                return False
+            self._sync_after = now + PRESENCE_SYNC_INTERVAL
+            return True
+
+
+class RedisPresenceStore:
+    """
+    Presence state shared by all workers:
+
+    presence:conns:<user_id>  sorted set of channel names, scored by expiry time
+    presence:last_seen        hash of user_id -> timestamp, not yet synced
+    presence:dirty            set of user IDs changed since the last sync
+    presence:sync_lock        held for PRESENCE_SYNC_INTERVAL by the worker that syncs
+    """
+    shared = True
+
+    LAST_SEEN_KEY = 'presence:last_seen'
+    DIRTY_KEY = 'presence:dirty'
+    SYNC_LOCK_KEY = 'presence:sync_lock'
+
+    def __init__(self, url):
+        # Imported here: redis is only needed when the channel layer uses it
+        import redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def connections_key(user_id):
+        return f'presence:conns:{user_id}'
+
+    def touch(self, user_id, channel_name, now):
+        key = self.connections_key(user_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(key, {channel_name: now + PRESENCE_TTL})
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.expire(key, PRESENCE_TTL)
+        pipe.hset(self.LAST_SEEN_KEY, user_id, now)
+        pipe.sadd(self.DIRTY_KEY, user_id)
+        pipe.execute()
+
+    def remove(self, user_id, channel_name, now):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrem(self.connections_key(user_id), channel_name)
+        pipe.hset(self.LAST_SEEN_KEY, user_id, now)
+        pipe.sadd(self.DIRTY_KEY, user_id)
+        pipe.execute()
+
+    def online(self, user_ids, now):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zcount(self.connections_key(user_id), f'({now}', '+inf')
+        return {user_id for user_id, count in zip(user_ids, pipe.execute()) if count}
+
+    def take_dirty(self):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.smembers(self.DIRTY_KEY)
+        pipe.hgetall(self.LAST_SEEN_KEY)
+        pipe.delete(self.DIRTY_KEY, self.LAST_SEEN_KEY)
+        user_ids, last_seen, _ = pipe.execute()
+        return {user_id: float(last_seen[user_id]) if user_id in last_seen else None for user_id in user_ids}
+
+    def mark_dirty(self, last_seen):
+        if not last_seen:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.sadd(self.DIRTY_KEY, *last_seen)
+        for user_id, seen in last_seen.items():
+            if seen is not None:
+                pipe.hsetnx(self.LAST_SEEN_KEY, user_id, seen)
+        pipe.execute()
+
+    def acquire_sync_lock(self, now):
+        return bool(self.redis.set(self.SYNC_LOCK_KEY, now, nx=True, px=int(PRESENCE_SYNC_INTERVAL * 1000)))
+
+
+def _redis_url():
+    """The channel layer's Redis URL, or None if it does not use Redis."""
+    layer = settings.CHANNEL_LAYERS.get('default', {})
+    if not layer.get('BACKEND', '').startswith('channels_redis.'):
+        return None
+    host = layer.get('CONFIG', {}).get('hosts', [None])[0]
+    if isinstance(host, dict):
+        host = host.get('address')
+    if isinstance(host, (list, tuple)):
+        host = f'redis://{host[0]}:{host[1]}/0'
+    return host
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        url = _redis_url()
+        _store = RedisPresenceStore(url) if url else MemoryPresenceStore()
+    return _store
+
+
+# ===========================
+# Connection tracking (called by the WebSocket consumers)
+# ===========================
+
+def connect(user_id, channel_name):
+    get_store().touch(str(user_id), channel_name, time.time())
+
+
+def heartbeat(user_id, channel_name):
+    get_store().touch(str(user_id), channel_name, time.time())
+
+
+def disconnect(user_id, channel_name):
+    get_store().remove(str(user_id), channel_name, time.time())
+
+
+# ===========================
+# Lookups
+# ===========================
+
+def online_user_ids(user_ids):
+    """Returns the subset of `user_ids` (as strings) that are online, in one round trip."""
+    return get_store().online({str(user_id) for user_id in user_ids}, time.time())
+
+
+def is_online(user_id):
+    return str(user_id) in online_user_ids([user_id])
+
+
+# ===========================
+# Database sync
+# ===========================
+
+def sync_to_database(force=False):
+    """
+    Copies presence into CustomUser.is_online/last_activity for users whose
+    state changed since the last sync. It also clears is_online for users whose
+    connections expired without a disconnect.
+
+    Unless `force` is set, returns None without doing anything if another
+    sync ran in the last PRESENCE_SYNC_INTERVAL seconds. Otherwise returns the
+    number of users set online and offline.
+    """
+    store = get_store()
+    now = time.time()
+    if not force and not store.acquire_sync_lock(now):
+        return None
+
+    dirty = store.take_dirty()
+    try:
+        stale = {str(pk) for pk in CustomUser.objects.filter(is_online=True).values_list('pk', flat=True)}
+        candidates = set(dirty) | stale
+        online = store.online(candidates, now)
+        offline = candidates - online
+        last_seen = {
+            user_id: datetime.fromtimestamp(seen, tz=dt_timezone.utc)
+            for user_id, seen in dirty.items() if seen is not None
+        }
+        with transaction.atomic():
+            went_online = CustomUser.objects.filter(pk__in=online, is_online=False).update(is_online=True)
+            went_offline = CustomUser.objects.filter(pk__in=offline, is_online=True).update(is_online=False)
+            user_ids = list(last_seen)
+            for start in range(0, len(user_ids), SYNC_BATCH_SIZE):
+                batch = user_ids[start:start + SYNC_BATCH_SIZE]
+                CustomUser.objects.filter(pk__in=batch).update(last_activity=Case(
+                    *[When(pk=user_id, then=Value(last_seen[user_id])) for user_id in batch],
+                    output_field=DateTimeField(),
+                ))
+    except Exception:
+        # Keep the changes for the next sync
+        store.mark_dirty(dirty)
+        raise
+    return {'online': went_online, 'offline': went_offline}
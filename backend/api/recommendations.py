@@ -0,0 +1,190 @@
+# api/recommendations.py
+"""
+Student -> tutor recommendations.
+
+Candidates are precomputed per (subject, location, grade) from the search
+documents and cached as NumPy arrays. A student's candidates are the union of
+the sets for their preferred subjects. They are scored in one vectorized pass
+over price overlap with the student's budget, rating, popularity (the
+TutorProfile like/save/view counters) and subject coverage. The top RECOMMENDATION_TOP_K tutor IDs are then cached per student.
+
+Candidate sets expire after RECOMMENDATION_CANDIDATE_TIMEOUT. They are not tied
+to the search generation, because any tutor edit bumps that and recommendations
+tolerate a few minutes of staleness. A student's cached top-K is dropped
+whenever their profile or preferred subjects change (see api/signals.py).
+"""
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from api.class_levels import grades_mask, parse_grade
+from api.models import TutorSearchDocument
+
+RECOMMENDATION_TOP_K = 50
+RECOMMENDATION_TIMEOUT = getattr(settings, 'TUTOR_RECOMMENDATION_TIMEOUT', 600)  # seconds
+RECOMMENDATION_CANDIDATE_TIMEOUT = getattr(settings, 'TUTOR_RECOMMENDATION_CANDIDATE_TIMEOUT', 600)  # seconds
+
+# Score = sum of weight * feature, every feature scaled to 0..1
+WEIGHTS = {
+    'price': 0.35,
+    'rating': 0.30,
+    'popularity': 0.15,
+    'subjects': 0.10,
+    'location': 0.10,
+}
+POPULARITY_VIEW_WEIGHT = 0.1  # A profile view counts for a tenth of a like or save
+NEUTRAL_PRICE_FIT = 0.5  # Tutors without prices are neither favoured nor excluded
+
+ANY = '*'
+
+
+def student_cache_key(student_uuid):
+    return f'recommendations:student:{student_uuid}'
+
+
+def invalidate_student(student_uuid):
+    cache.delete(student_cache_key(student_uuid))
+
+
+# ===========================
+# Candidate sets
+# ===========================
+
+def build_candidates(subject_id, location, grade):
+    """
+    Loads the active tutors teaching `subject_id` (ANY for all subjects) in
+    `location` (ANY for everywhere) whose class levels cover `grade` (None for
+    any grade). Tutors without class levels are kept.
+    """
+    documents = TutorSearchDocument.objects.filter(tutor__user__is_active=True)
+    if subject_id != ANY:
+        documents = documents.filter(subject_ids__contains=f'|{subject_id}|')
+    if location != ANY:
+        documents = documents.filter(location=location)
+    if grade is not None:
+        documents = documents.annotate(
+            grade_hits=F('grade_mask').bitand(grades_mask([grade]))
+        ).filter(Q(grade_hits__gt=0) | Q(grade_mask=0))
+
+    rows = list(documents.values_list(
+        'tutor_id', 'location', 'price_min', 'price_max', 'rating_average',
+        'tutor__like_count', 'tutor__save_count', 'tutor__view_count',
+    ))
+
+    return {
+        # Fixed-width arrays (not dtype=object) keep the cached pickle small and fast to load
+        'ids': np.array([row[0].bytes for row in rows], dtype='S16'),
+        'location': np.array([row[1] for row in rows], dtype=str),
+        'price_min': np.array([np.nan if row[2] is None else float(row[2]) for row in rows], dtype=float),
+        'price_max': np.array([np.nan if row[3] is None else float(row[3]) for row in rows], dtype=float),
+        'rating': np.array([float(row[4]) for row in rows], dtype=float),
+        'popularity': np.array([row[5] + row[6] + POPULARITY_VIEW_WEIGHT * row[7] for row in rows], dtype=float),
+    }
+
+
+def get_candidates(subject_id, location, grade):
+    key = f'recommendations:candidates:{subject_id}:{location}:{grade}'
+    candidates = cache.get(key)
+    if candidates is None:
+        candidates = build_candidates(subject_id, location, grade)
+        cache.set(key, candidates, RECOMMENDATION_CANDIDATE_TIMEOUT)
+    return candidates
+
+
+def merge_candidates(candidate_sets):
+    """
+    Concatenates candidate sets, keeping one row per tutor plus the number of
+    sets (i.e. preferred subjects) it appeared in.
+    """
+    if not candidate_sets:
+        return None, np.zeros(0)
+    if len(candidate_sets) == 1:
+        return candidate_sets[0], np.ones(len(candidate_sets[0]['ids']))
+    merged = {name: np.concatenate([c[name] for c in candidate_sets]) for name in candidate_sets[0]}
+    _, first, counts = np.unique(merged['ids'], return_index=True, return_counts=True)
+    return {name: values[first] for name, values in merged.items()}, counts.astype(float)
+
+
+# ===========================
+# Scoring
+# ===========================
+
+def price_fit(price_min, price_max, budget_min, budget_max):
+    """
+    Fraction of each tutor's [price_min, price_max] range inside the student's budget.
+    Single-price tutors score 1 inside the budget and 0 outside.
+    """
+    if budget_min is None and budget_max is None:
+        return np.ones_like(price_min)
+    low = -np.inf if budget_min is None else float(budget_min)
+    high = np.inf if budget_max is None else float(budget_max)
+
+    price_max = np.where(np.isnan(price_max), price_min, price_max)
+    width = price_max - price_min
+    overlap = np.clip(np.minimum(price_max, high) - np.maximum(price_min, low), 0, None)
+    inside = ((price_min >= low) & (price_min <= high)).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fit = np.where(width > 0, overlap / width, inside)
+    return np.where(np.isnan(price_min), NEUTRAL_PRICE_FIT, fit)
+
+
+def score_candidates(candidates, subject_counts, n_subjects, budget_min, budget_max, location):
+    popularity = np.log1p(candidates['popularity'])
+    top = popularity.max() if len(popularity) else 0
+    local = (candidates['location'] == location) if location else np.zeros(len(popularity), dtype=bool)
+    return (
+        WEIGHTS['price'] * price_fit(candidates['price_min'], candidates['price_max'], budget_min, budget_max)
+        + WEIGHTS['rating'] * candidates['rating'] / 5.0
+        + WEIGHTS['popularity'] * (popularity / top if top > 0 else popularity)
+        + WEIGHTS['subjects'] * subject_counts / max(n_subjects, 1)
+        + WEIGHTS['location'] * local.astype(float)
+    )
+
+
+def top_k(ids, scores, k):
+    """Returns the IDs of the k best scores, best first (ties broken by ID)."""
+    if len(ids) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[keep], scores[keep]
+    order = np.lexsort((ids, -scores))
+    # NumPy 'S' arrays drop trailing NUL bytes, so pad the UUIDs back to 16 bytes
+    return [uuid.UUID(bytes=tutor_id.ljust(16, b'\0')).hex for tutor_id in ids[order]]
+
+
+# ===========================
+# Entry point
+# ===========================
+
+def recommend_tutor_ids(student):
+    """
+    Returns up to RECOMMENDATION_TOP_K tutor UUID hex strings for a StudentProfile, best first.
+    """
+    key = student_cache_key(student.uuid)
+    tutor_ids = cache.get(key)
+    if tutor_ids is not None:
+        return tutor_ids
+
+    subject_ids = [subject_id.hex for subject_id in student.preferred_subjects.values_list('id', flat=True)] or [ANY]
+    grade = parse_grade(student.grade)
+
+    # Local tutors first; widen to every location if there are not enough of them
+    location = TutorSearchDocument.normalize_location(student.location)
+    candidate_sets = []
+    if location:
+        candidate_sets = [get_candidates(subject_id, location, grade) for subject_id in subject_ids]
+    candidates, counts = merge_candidates(candidate_sets)
+    if not location or len(counts) < RECOMMENDATION_TOP_K:
+        candidates, counts = merge_candidates([get_candidates(subject_id, ANY, grade) for subject_id in subject_ids])
+
+    if not len(counts):
+        tutor_ids = []
+    else:
+        scores = score_candidates(
+            candidates, counts, len(subject_ids), student.budget_min, student.budget_max, location
+        )
+        tutor_ids = top_k(candidates['ids'], scores, RECOMMENDATION_TOP_K)
+    cache.set(key, tutor_ids, RECOMMENDATION_TIMEOUT)
+    return tutor_ids
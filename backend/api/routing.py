@@ -4,4 +4,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/chat/(?P<room_id>[0-9a-f-]+)/$', consumers.ChatConsumer.as_asgi()),
+    # All of the user's rooms on one socket
+    re_path(r'ws/user/$', consumers.UserConsumer.as_asgi()),
 ]
\ No newline at end of file
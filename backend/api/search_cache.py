@@ -0,0 +1,94 @@
+# api/search_cache.py
+"""
+Versioned cache for tutor search results.
+
+Entries are keyed on the normalized search parameters plus a global
+"generation" number. Any change that can alter search membership or order
+(see api/signals.py) bumps the generation, which orphans every older entry
+at once; they simply expire. Works with any Django cache backend that
+supports incr() (LocMemCache, django_redis).
+
+Like/save/view counters do not bump the generation (that would happen on every
+tap), so pages ordered or filtered by them can lag by up to SEARCH_CACHE_TIMEOUT.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+GENERATION_KEY = 'tutor_search:generation'
+SEARCH_CACHE_TIMEOUT = getattr(settings, 'TUTOR_SEARCH_CACHE_TIMEOUT', 300)  # seconds
+
+
+# Each normalizer must only merge values that the search itself treats as equal
+
+def _text(value):
+    return ' '.join(value.split()).lower()
+
+
+def _lower(value):
+    return value.strip().lower()
+
+
+def _token_set(value):
+    return ','.join(sorted({token.strip() for token in value.split(',') if token.strip()}))
+
+
+def _raw(value):
+    return value
+
+
+# Query parameters that affect search results, with how to normalize each value
+SEARCH_PARAMS = {
+    'q': _text,
+    'subjects': _lower,
+    'classes': _token_set,
+    'max_price': _raw,
+    'location_type': _raw,
+    'city': _lower,
+    'available_at': _text,
+    'available_between': _text,
+    'min_likes': _raw,
+    'min_saves': _raw,
+    'min_views': _raw,
+    'sort': _raw,
+    'cursor': _raw,
+    'page_size': _raw,
+    'count': _lower,
+}
+
+
+def get_search_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock rather than 1 so an evicted counter can never
+        # fall back to a generation whose entries are still cached
+        cache.add(GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_search_generation():
+    """Invalidates every cached search result."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Key missing (never set or evicted): a fresh clock-based value is newer than any old one
+        cache.set(GENERATION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def search_signature(query_params, params=SEARCH_PARAMS):
+    """Returns a stable hash of the normalized search parameters."""
+    normalized = {}
+    for name, normalize in params.items():
+        value = query_params.get(name)
+        if value:
+            normalized[name] = normalize(value)
+    raw = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def make_search_key(prefix, query_params, params=SEARCH_PARAMS):
+    return f'{prefix}:v{get_search_generation()}:{search_signature(query_params, params)}'
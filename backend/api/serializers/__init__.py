@@ -5,6 +5,7 @@ from .subject import SubjectSerializer, TutorSubjectSerializer
 from .tutor import TutorListSerializer, TutorDetailSerializer
 from .chat import ChatRoomSerializer, MessageSerializer
 from .review import ReviewSerializer, CreateReviewSerializer
+from .interaction import InteractionBatchSerializer
 
 __all__ = [
     'RegisterSerializer',
@@ -20,4 +21,5 @@ __all__ = [
     'MessageSerializer',
     'ReviewSerializer',
     'CreateReviewSerializer',
+    'InteractionBatchSerializer',
 ]
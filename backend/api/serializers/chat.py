@@ -19,6 +19,7 @@ class ChatRoomSerializer(serializers.ModelSerializer):
                     'name': f"{obj.tutor.user.first_name} {obj.tutor.user.last_name}",
                     'user_type': 'tutor',
                     'profile_image': obj.tutor.profile_image.url if obj.tutor.profile_image else None,
+                    'is_online': self._is_online(obj.tutor.user),
                 }
             elif hasattr(request.user, 'tutor_profile'):
                 return {
@@ -26,31 +27,65 @@ class ChatRoomSerializer(serializers.ModelSerializer):
                     'name': f"{obj.student.user.first_name} {obj.student.user.last_name}",
                     'user_type': 'student',
                     'profile_image': obj.student.profile_image.url if obj.student.profile_image else None,
+                    'is_online': self._is_online(obj.student.user),
                 }
         return None
     
+    def _is_online(self, user):
+        # Views pass the bulk presence lookup as context['online_user_ids'] (see api/presence.py)
+        online_user_ids = self.context.get('online_user_ids')
+        if online_user_ids is None:
+            return user.is_online
+        return str(user.id) in online_user_ids
+
     def get_last_message(self, obj):
-        last_message = obj.messages.first()
-        if last_message:
-            return {
-                'content': last_message.content,
-                'created_at': last_message.created_at,
-                'sender_id': str(last_message.sender.id),
-            }
-        return None
+        # Read from the room's denormalized snapshot (see ChatRoom.record_message)
+        if obj.last_message_sender_id is None:
+            return None
+        return {
+            'content': obj.last_message_preview,
+            'created_at': obj.last_message_at,
+            'sender_id': str(obj.last_message_sender_id),
+        }
     
     def get_unread_count(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.messages.filter(is_read=False).exclude(sender=request.user).count()
+            return getattr(obj, obj.unread_field_for(request.user))
         return 0
 
 class MessageSerializer(serializers.ModelSerializer):
+    """
+    Pass the message's room as context['chat_room'] to fill is_read from the
+    room's read watermarks: a message is read once the participant who did not
+    send it has read up to it. Without a room, is_read is False (new messages).
+    """
     sender = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
+    attachment = serializers.SerializerMethodField()
     
     class Meta:
         model = Message
-        fields = ['id', 'content', 'message_type', 'is_read', 'created_at', 'sender']
+        fields = ['id', 'content', 'message_type', 'is_read', 'created_at', 'sender', 'attachment']
+
+    def get_attachment(self, obj):
+        attachment = obj.attachment
+        if attachment is None:
+            return None
+        return {
+            'url': attachment.file.url,
+            'size': attachment.size,
+            'content_type': attachment.content_type,
+            'preview_url': attachment.preview.url if attachment.preview else None,
+        }
+
+    def get_is_read(self, obj):
+        chat_room = self.context.get('chat_room')
+        if chat_room is None:
+            return False
+        recipient_id = chat_room.tutor.user_id if obj.sender_id == chat_room.student.user_id else chat_room.student.user_id
+        last_read_at = chat_room.last_read_at_for(recipient_id)
+        return last_read_at is not None and obj.created_at <= last_read_at
     
     def get_sender(self, obj):
         return {
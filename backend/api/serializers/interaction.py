@@ -0,0 +1,17 @@
+# serializers/interaction.py
+from rest_framework import serializers
+
+MAX_BATCH_OPERATIONS = 200  # per request
+
+
+class InteractionOperationSerializer(serializers.Serializer):
+    """One queued tap, e.g. {"action": "like", "tutor_id": "<uuid>"}."""
+    action = serializers.ChoiceField(choices=['like', 'unlike', 'save', 'unsave'])
+    tutor_id = serializers.UUIDField()
+
+
+class InteractionBatchSerializer(serializers.Serializer):
+    """An ordered list of like/save operations, as queued by an offline client."""
+    operations = serializers.ListField(
+        child=InteractionOperationSerializer(), allow_empty=False, max_length=MAX_BATCH_OPERATIONS
+    )
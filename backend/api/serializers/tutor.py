@@ -1,6 +1,55 @@
+from django.db import models
 from rest_framework import serializers
 from api.models import TutorProfile, TutorLike, TutorSave
 
+
+def get_requesting_student(context):
+    """
+    Returns the StudentProfile of the authenticated request user, or None.
+    """
+    request = context.get('request')
+    if request and request.user.is_authenticated and hasattr(request.user, 'student_profile'):
+        return request.user.student_profile
+    return None
+
+
+class TutorListListSerializer(serializers.ListSerializer):
+    """
+    List serializer used whenever TutorListSerializer is called with many=True.
+
+    Loads the requesting student's liked and saved tutor IDs for the whole page in
+    one query and stores them in the serializer context, so the per-row
+    is_liked / is_saved fields become set lookups instead of EXISTS queries.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        tutors = list(iterable)
+        self._load_interactions(tutors)
+        return super().to_representation(tutors)
+
+    def _load_interactions(self, tutors):
+        student = get_requesting_student(self.context)
+        if student is None:
+            return
+
+        liked_ids, saved_ids = set(), set()
+        tutor_ids = [tutor.uuid for tutor in tutors]
+        if tutor_ids:
+            # A single UNION query covers both tables, tagged by interaction kind
+            likes = TutorLike.objects.filter(student=student, tutor_id__in=tutor_ids).annotate(
+                kind=models.Value('like', output_field=models.CharField())
+            ).values_list('tutor_id', 'kind')
+            saves = TutorSave.objects.filter(student=student, tutor_id__in=tutor_ids).annotate(
+                kind=models.Value('save', output_field=models.CharField())
+            ).values_list('tutor_id', 'kind')
+            for tutor_id, kind in likes.union(saves, all=True):
+                (liked_ids if kind == 'like' else saved_ids).add(tutor_id)
+
+        self.context['liked_tutor_ids'] = liked_ids
+        self.context['saved_tutor_ids'] = saved_ids
+
+
 class TutorListSerializer(serializers.ModelSerializer):
     """
     Serializes tutor list data for API responses.
@@ -21,9 +70,20 @@ class TutorListSerializer(serializers.ModelSerializer):
         fields = [
             'uuid', 'user', 'education', 'location', 'rating_average', 'total_reviews',
             'profile_image', 'subjects', 'class_levels', 'price_min', 'price_max',
-            'is_liked', 'is_saved'
+            'like_count', 'save_count', 'view_count', 'is_liked', 'is_saved'
         ]
+        list_serializer_class = TutorListListSerializer
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Applies the select/prefetch calls this serializer relies on, so that
+        subjects and class levels are read from the prefetch cache.
+        """
+        return queryset.select_related('user').prefetch_related(
+            'tutor_subjects__subject', 'class_levels'
+        )
+
     def get_user(self, obj):
         """
         Returns a dictionary with basic user info.
@@ -40,30 +100,39 @@ class TutorListSerializer(serializers.ModelSerializer):
         Assumes TutorSubject model has 'subject' and 'level' or 'proficiency_level'.
         """
         # If TutorSubject has 'level' (common), use 'level' instead of 'proficiency_level'
+        # Slice in Python: slicing the manager would bypass prefetch_related and query per row
         return [
             {
                 'name': ts.subject.name,
                 'level': ts.level
             }
-            for ts in obj.tutor_subjects.all()[:3]
+            for ts in list(obj.tutor_subjects.all())[:3]
         ]
     
     def get_is_liked(self, obj):
         """
         Returns True if the current authenticated student has liked this tutor.
+        Uses the page-level ID set when serialized as a list.
         """
-        request = self.context.get('request')
-        if request and request.user.is_authenticated and hasattr(request.user, 'student_profile'):
-            return TutorLike.objects.filter(student=request.user.student_profile, tutor=obj).exists()
+        liked_ids = self.context.get('liked_tutor_ids')
+        if liked_ids is not None:
+            return obj.uuid in liked_ids
+        student = get_requesting_student(self.context)
+        if student is not None:
+            return TutorLike.objects.filter(student=student, tutor=obj).exists()
         return False
     
     def get_is_saved(self, obj):
         """
         Returns True if the current authenticated student has saved this tutor.
+        Uses the page-level ID set when serialized as a list.
         """
-        request = self.context.get('request')
-        if request and request.user.is_authenticated and hasattr(request.user, 'student_profile'):
-            return TutorSave.objects.filter(student=request.user.student_profile, tutor=obj).exists()
+        saved_ids = self.context.get('saved_tutor_ids')
+        if saved_ids is not None:
+            return obj.uuid in saved_ids
+        student = get_requesting_student(self.context)
+        if student is not None:
+            return TutorSave.objects.filter(student=student, tutor=obj).exists()
         return False
 
 class TutorDetailSerializer(TutorListSerializer):
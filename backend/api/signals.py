@@ -0,0 +1,199 @@
+# api/signals.py
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+
+from api import class_levels
+from api.models import (
+    ChatRoom, StudentProfile, TutorProfile, TutorSubject, Subject, ClassLevel, TutorSearchDocument, TutorAvailabilitySlot,
+)
+from api.recommendations import invalidate_student
+from api.search_cache import bump_search_generation
+
+logger = logging.getLogger(__name__)
+
+# TutorProfile fields that feed the full-text index (kept current by database triggers, see api/fulltext.py)
+TEXT_FIELDS = ('bio', 'education')
+
+
+# ===========================
+# Tutor search document sync
+# ===========================
+# Every handler that changes search membership or order also bumps the
+# search cache generation (api/search_cache.py).
+
+@receiver(post_save, sender=TutorProfile)
+def sync_search_document_on_profile_save(sender, instance, created, update_fields=None, **kwargs):
+    """Keeps the search document's profile columns in step with TutorProfile."""
+    if created:
+        TutorSearchDocument.rebuild(instance.pk)
+        TutorAvailabilitySlot.sync_tutor(instance)
+        bump_search_generation()
+        return
+    changed = set(update_fields) if update_fields is not None else None
+    if changed is None or changed & set(TutorSearchDocument.PROFILE_FIELDS):
+        TutorSearchDocument.sync_profile(instance)
+    slots_changed = (changed is None or 'availability' in changed) and TutorAvailabilitySlot.sync_tutor(instance)
+    if slots_changed or changed is None or changed & set(TutorSearchDocument.PROFILE_FIELDS + TEXT_FIELDS):
+        bump_search_generation()
+
+
+@receiver(post_delete, sender=TutorProfile)
+def bump_search_generation_on_profile_delete(sender, instance, **kwargs):
+    bump_search_generation()
+
+
+@receiver(post_save, sender=TutorSubject)
+def sync_search_document_on_subject_save(sender, instance, **kwargs):
+    TutorSearchDocument.sync_subjects(instance.tutor_profile_id)
+    bump_search_generation()
+
+
+@receiver(post_delete, sender=TutorSubject)
+def sync_search_document_on_subject_delete(sender, instance, **kwargs):
+    # Never create documents here: this also runs while a TutorProfile is being cascade-deleted
+    TutorSearchDocument.sync_subjects(instance.tutor_profile_id, create=False)
+    bump_search_generation()
+
+
+@receiver(post_save, sender=Subject)
+def sync_search_documents_on_subject_rename(sender, instance, created, **kwargs):
+    if created:
+        return
+    tutor_ids = TutorSubject.objects.filter(subject=instance).values_list('tutor_profile_id', flat=True).distinct()
+    for tutor_id in tutor_ids:
+        TutorSearchDocument.sync_subjects(tutor_id, create=False)
+    bump_search_generation()
+
+
+@receiver(m2m_changed, sender=TutorProfile.class_levels.through)
+def sync_search_document_on_class_levels_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Handles both directions of the M2M:
+    tutor.class_levels.add(...) (forward) and class_level.tutors.add(...) (reverse).
+    """
+    if reverse and action == 'pre_clear':
+        # pk_set is not provided for clear(), so remember the affected tutors first
+        instance._search_tutor_ids = list(instance.tutors.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        tutor_ids = [instance.pk]
+    elif action == 'post_clear':
+        tutor_ids = getattr(instance, '_search_tutor_ids', [])
+    else:
+        tutor_ids = pk_set or []
+
+    for tutor_id in tutor_ids:
+        TutorSearchDocument.sync_class_levels(tutor_id)
+    bump_search_generation()
+
+
+@receiver(post_save, sender=ClassLevel)
+def sync_search_documents_on_class_level_save(sender, instance, created, **kwargs):
+    """Grade ranges are data: reload the in-process map and recompute affected grade masks."""
+    class_levels.invalidate()
+    if created:
+        return
+    for tutor_id in instance.tutors.values_list('pk', flat=True):
+        TutorSearchDocument.sync_class_levels(tutor_id, create=False)
+    bump_search_generation()
+
+
+@receiver(pre_delete, sender=ClassLevel)
+def remember_class_level_tutors(sender, instance, **kwargs):
+    # Deleting a ClassLevel drops its M2M rows without sending m2m_changed
+    instance._search_tutor_ids = list(instance.tutors.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=ClassLevel)
+def sync_search_documents_on_class_level_delete(sender, instance, **kwargs):
+    class_levels.invalidate()
+    for tutor_id in getattr(instance, '_search_tutor_ids', []):
+        TutorSearchDocument.sync_class_levels(tutor_id, create=False)
+    bump_search_generation()
+
+
+# ===========================
+# Recommendation cache
+# ===========================
+
+@receiver(post_save, sender=StudentProfile)
+def invalidate_recommendations_on_profile_save(sender, instance, **kwargs):
+    invalidate_student(instance.uuid)
+
+
+@receiver(m2m_changed, sender=StudentProfile.preferred_subjects.through)
+def invalidate_recommendations_on_preferred_subjects_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._recommendation_student_ids = list(
+            StudentProfile.objects.filter(preferred_subjects=instance).values_list('uuid', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        student_ids = [instance.uuid]
+    elif action == 'post_clear':
+        student_ids = getattr(instance, '_recommendation_student_ids', [])
+    else:
+        # pk_set holds StudentProfile primary keys; the cache is keyed by uuid
+        student_ids = StudentProfile.objects.filter(pk__in=pk_set or []).values_list('uuid', flat=True)
+
+    for student_id in student_ids:
+        invalidate_student(student_id)
+
+
+# ===========================
+# Chat rooms
+# ===========================
+
+@receiver(pre_save, sender=ChatRoom)
+def remember_room_active_state(sender, instance, update_fields=None, **kwargs):
+    # Only a save that turns is_active off should close connections, not every save of an inactive room
+    instance._was_active = bool(
+        not instance.is_active and not instance._state.adding
+        and (update_fields is None or 'is_active' in update_fields)
+        and ChatRoom.objects.filter(pk=instance.pk, is_active=True).exists()
+    )
+
+
+@receiver(post_save, sender=ChatRoom)
+def close_connections_on_room_deactivation(sender, instance, created, **kwargs):
+    """Chat consumers cache the room for the whole connection; tell them when it is deactivated."""
+    if created or not getattr(instance, '_was_active', False):
+        return
+    instance._was_active = False
+    room_id = str(instance.id)
+    transaction.on_commit(lambda: _group_send(f'chat_{room_id}', {'type': 'room_deactivated', 'room_id': room_id}))
+
+
+@receiver(post_save, sender=ChatRoom)
+def subscribe_user_connections_to_new_room(sender, instance, created, **kwargs):
+    """Adds a new room to both participants' open user-level sockets (UserConsumer)."""
+    if not created:
+        return
+    room_id = str(instance.id)
+    user_ids = (instance.student.user_id, instance.tutor.user_id)
+    # After commit: UserConsumer loads the room from the database when the message arrives
+    transaction.on_commit(lambda: [
+        _group_send(f'user_{user_id}', {'type': 'room_added', 'room_id': room_id}) for user_id in user_ids
+    ])
+
+
+def _group_send(group, message):
+    """Best effort: a slow or unavailable channel layer must not fail the save that triggered it."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group, message)
+    except Exception:
+        logger.warning('Could not send %s to %s', message['type'], group, exc_info=True)
@@ -1,7 +1,64 @@
+import asyncio
+import base64
+import hashlib
+import json
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from collections import deque
+from io import BytesIO, StringIO
+from unittest.mock import AsyncMock, patch
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 from rest_framework.test import APITestCase
 from rest_framework import status
-from api.models import CustomUser
+from api.models import (
+    CustomUser, StudentProfile, TutorProfile, TutorLike, TutorSave,
+    Subject, TutorSubject, ClassLevel, TutorSearchDocument, TutorAvailabilitySlot,
+    ChatRoom, ChatAttachment, Message, TutorView, TutorViewDaily, Review, TrendingFeed, TrendingWatermark,
+    TutorTrendingScore,
+)
+from api.attachments import HashingUploadHandler, generate_preview
+from api import presence
+from api.checks import check_text_index_triggers
+from api.management.commands.loadtest_chat import QueryCounter
+from api.chat_pipeline import MessageWriter, PendingMessage, message_writer, write_batch
+from api.routing import websocket_urlpatterns
+from api.typing_indicator import TypingThrottle
+from api import trending, view_tracking
+
+
+class UserFixtures:
+    """Creates the users and profiles the API test cases below share."""
+
+    password = "Testpass123!"
+
+    def create_user(self, username, user_type, **fields):
+        return CustomUser.objects.create_user(
+            username=username, email=f"{username}@example.com", password=self.password, user_type=user_type, **fields
+        )
+
+    def create_student(self, username="student", **profile):
+        return StudentProfile.objects.create(user=self.create_user(username, 'student'), **profile)
+
+    def create_tutor(self, username="tutor", **profile):
+        return TutorProfile.objects.create(user=self.create_user(username, 'tutor'), **profile)
+
+    def create_tutors(self, count, **profile):
+        return [self.create_tutor(f"tutor{index}", **profile) for index in range(count)]
+
 
 class AuthTests(APITestCase):
     def test_register_student(self):
@@ -43,4 +100,1553 @@ class AuthTests(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('tokens', response.data)
-        self.assertIn('user', response.data)
\ No newline at end of file
+        self.assertIn('user', response.data)
+
+
+class TutorListInteractionTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.student = self.create_student(grade='10')
+        self.student_user = self.student.user
+        self.tutors = [self.create_tutor(f"tutor{i}", rating_average=i) for i in range(6)]
+        self.client.force_authenticate(self.student_user)
+
+    def _interaction_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tables = ('"api_tutorlike"', '"api_tutorsave"')
+        count = sum(1 for q in ctx.captured_queries if any(t in q['sql'] for t in tables))
+        return response, count
+
+    def test_saved_tutors_resolve_interactions_in_one_query(self):
+        for tutor in self.tutors:
+            TutorSave.objects.create(student=self.student, tutor=tutor)
+        TutorLike.objects.create(student=self.student, tutor=self.tutors[0])
+
+        response, count = self._interaction_queries(reverse('saved-tutors'))
+        # One query for the saved list itself, one for the page membership lookup
+        self.assertEqual(count, 2)
+        by_id = {row['uuid']: row for row in response.data}
+        self.assertTrue(by_id[str(self.tutors[0].uuid)]['is_liked'])
+        self.assertFalse(by_id[str(self.tutors[1].uuid)]['is_liked'])
+        self.assertTrue(all(row['is_saved'] for row in response.data))
+
+    def test_search_resolves_interactions_in_one_query(self):
+        TutorLike.objects.create(student=self.student, tutor=self.tutors[2])
+        TutorSave.objects.create(student=self.student, tutor=self.tutors[3])
+
+        response, count = self._interaction_queries(reverse('tutor-search'))
+        self.assertEqual(count, 1)
+        by_id = {row['uuid']: row for row in response.data['results']}
+        self.assertTrue(by_id[str(self.tutors[2].uuid)]['is_liked'])
+        self.assertTrue(by_id[str(self.tutors[3].uuid)]['is_saved'])
+        self.assertFalse(by_id[str(self.tutors[4].uuid)]['is_saved'])
+
+
+class TutorListQueryCountTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.student = self.create_student(grade='10')
+        self.student_user = self.student.user
+        self.subjects = [Subject.objects.create(name=name) for name in ['Math', 'Physics', 'English', 'Biology']]
+        self.class_levels = [ClassLevel.objects.create(name=name) for name in ['Grade 6-9', 'Grade 10-12']]
+        self.client.force_authenticate(self.student_user)
+
+    def _create_tutor(self, index):
+        tutor = self.create_tutor(f"tutor{index}")
+        for subject in self.subjects:
+            TutorSubject.objects.create(tutor_profile=tutor, subject=subject, level='basic', price=100000)
+        tutor.class_levels.set(self.class_levels)
+        TutorSave.objects.create(student=self.student, tutor=tutor)
+        return tutor
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(ctx.captured_queries)
+
+    def test_page_cost_is_independent_of_page_size(self):
+        for url in [reverse('saved-tutors'), reverse('tutor-search')]:
+            with self.subTest(url=url):
+                CustomUser.objects.filter(user_type='tutor').delete()
+                self._create_tutor(0)
+                _, small = self._count_queries(url)
+                for i in range(1, 6):
+                    self._create_tutor(i)
+                response, large = self._count_queries(url)
+                self.assertEqual(small, large)
+
+    def test_subject_summary_uses_prefetched_rows(self):
+        tutor = self._create_tutor(0)
+        response, _ = self._count_queries(reverse('saved-tutors'))
+        row = response.data[0]
+        self.assertEqual(len(row['subjects']), 3)
+        self.assertEqual(sorted(row['class_levels']), sorted(level.id for level in self.class_levels))
+        self.assertEqual(row['uuid'], str(tutor.uuid))
+
+
+class TutorSearchDocumentTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.math = Subject.objects.create(name='Toán')
+        self.physics = Subject.objects.create(name='Vật lý')
+        self.secondary = ClassLevel.objects.create(name='Grade 6-9', min_grade=6, max_grade=9)
+        self.high_school = ClassLevel.objects.create(name='Grade 10-12', min_grade=10, max_grade=12)
+        self.tutor = self.create_tutor(location='hanoi')
+        self.client.force_authenticate(self.create_user("student", 'student'))
+
+    def _document(self):
+        return TutorSearchDocument.objects.get(tutor=self.tutor)
+
+    def test_document_follows_profile_subjects_and_class_levels(self):
+        self.assertEqual(self._document().location, 'hanoi')
+
+        TutorSubject.objects.create(tutor_profile=self.tutor, subject=self.math, level='basic', price=200000)
+        TutorSubject.objects.create(tutor_profile=self.tutor, subject=self.math, level='advanced', price=300000)
+        TutorSubject.objects.create(tutor_profile=self.tutor, subject=self.physics, level='basic', price=250000)
+        self.tutor.update_price_range()
+        document = self._document()
+        self.assertEqual(document.subject_names, '|toán|vật lý|')
+        self.assertEqual(document.price_min, 200000)
+        self.assertEqual(document.price_max, 300000)
+
+        self.tutor.class_levels.add(self.secondary, self.high_school)
+        self.assertEqual(self._document().class_level_ids, f'|{self.secondary.id}|{self.high_school.id}|')
+        self.high_school.tutors.clear()
+        self.assertEqual(self._document().class_level_ids, f'|{self.secondary.id}|')
+
+        TutorSubject.objects.filter(subject=self.physics).delete()
+        self.assertEqual(self._document().subject_names, '|toán|')
+
+        self.tutor.user.delete()
+        self.assertFalse(TutorSearchDocument.objects.exists())
+
+    def test_search_filters_run_without_distinct(self):
+        TutorSubject.objects.create(tutor_profile=self.tutor, subject=self.math, level='basic', price=200000)
+        TutorSubject.objects.create(tutor_profile=self.tutor, subject=self.math, level='advanced', price=300000)
+        self.tutor.class_levels.add(self.secondary, self.high_school)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('tutor-search'), {'subjects': 'TOÁN', 'classes': '7,11'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['uuid'] for row in response.data['results']], [str(self.tutor.uuid)])
+        self.assertFalse(any('DISTINCT' in q['sql'] for q in ctx.captured_queries))
+
+        response = self.client.get(reverse('tutor-search'), {'subjects': 'Hóa'})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(reverse('tutor-search'), {'location_type': 'offline', 'city': 'danang'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_city_filter_ignores_case(self):
+        self.tutor.location = ' HaNoi '
+        self.tutor.save(update_fields=['location'])
+        self.assertEqual(self._document().location, 'hanoi')
+        response = self.client.get(reverse('tutor-search'), {'location_type': 'offline', 'city': 'Hanoi'})
+        self.assertEqual([row['uuid'] for row in response.data['results']], [str(self.tutor.uuid)])
+
+    def test_classes_filter_follows_grade_ranges(self):
+        self.tutor.class_levels.add(self.secondary)
+        self.assertEqual(self._document().grade_mask, sum(1 << grade for grade in range(6, 10)))
+
+        def search(classes):
+            response = self.client.get(reverse('tutor-search'), {'classes': classes})
+            return [row['uuid'] for row in response.data['results']]
+
+        self.assertEqual(search('9'), [str(self.tutor.uuid)])
+        self.assertEqual(search('10,university'), [])
+
+        # Editing a level's range re-masks its tutors
+        self.secondary.max_grade = 10
+        self.secondary.save()
+        self.assertEqual(search('10'), [str(self.tutor.uuid)])
+
+
+class TutorTextSearchTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.math = Subject.objects.create(name='Toán')
+        self.tutors = {}
+        for key, bio, education, rating in [
+            ('math', 'Giáo viên luyện thi đại học', 'ĐH Sư phạm', 4.0),
+            ('math_top', 'Luyện thi chuyên', 'ĐH Bách khoa', 5.0),
+            ('english', 'IELTS 8.0, dạy tiếng Anh giao tiếp', 'ĐH Ngoại ngữ', 5.0),
+        ]:
+            self.tutors[key] = self.create_tutor(key, bio=bio, education=education, rating_average=rating)
+        for key in ['math', 'math_top']:
+            TutorSubject.objects.create(tutor_profile=self.tutors[key], subject=self.math, level='basic', price=200000)
+        self.client.force_authenticate(self.create_user("student", 'student'))
+
+    def _search(self, **params):
+        response = self.client.get(reverse('tutor-search'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['uuid'] for row in response.data['results']]
+
+    def test_matches_subjects_bio_and_education_without_diacritics(self):
+        self.assertEqual(
+            self._search(q='toan'),
+            [str(self.tutors['math_top'].uuid), str(self.tutors['math'].uuid)]
+        )
+        self.assertEqual(self._search(q='ielts'), [str(self.tutors['english'].uuid)])
+        self.assertEqual(self._search(q='Bách'), [str(self.tutors['math_top'].uuid)])
+        self.assertEqual(self._search(q='chemistry'), [])
+
+    def test_ranked_results_paginate_with_cursor(self):
+        seen = []
+        url = reverse('tutor-search') + '?q=toan&page_size=1'
+        while url:
+            response = self.client.get(url)
+            seen.extend(row['uuid'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, self._search(q='toan'))
+
+    def test_index_follows_profile_updates(self):
+        tutor = self.tutors['english']
+        tutor.bio = 'Chemistry olympiad coach'
+        tutor.save()
+        self.assertEqual(self._search(q='chemistry'), [str(tutor.uuid)])
+        self.assertEqual(self._search(q='ielts'), [])
+        tutor.user.delete()
+        self.assertEqual(self._search(q='chemistry'), [])
+
+    def test_index_follows_bulk_updates_and_subject_renames(self):
+        # Maintained by database triggers, so writes that skip signals are indexed too
+        TutorProfile.objects.filter(pk=self.tutors['english'].pk).update(education='Oxford')
+        self.assertEqual(self._search(q='oxford'), [str(self.tutors['english'].uuid)])
+        self.math.name = 'Hình học'
+        self.math.save()
+        self.assertEqual(
+            self._search(q='hinh hoc'),
+            [str(self.tutors['math_top'].uuid), str(self.tutors['math'].uuid)]
+        )
+
+    def test_missing_triggers_are_reported(self):
+        self.assertEqual(check_text_index_triggers(None, databases=['default']), [])
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER api_tutorsearchtext_profile')  # as a SQLite table rebuild would
+        errors = check_text_index_triggers(None, databases=['default'])
+        self.assertEqual([error.id for error in errors], ['api.E001'])
+        self.assertIn('api_tutorsearchtext_profile', errors[0].msg)
+
+    def test_every_match_is_ranked(self):
+        # Matches are joined to the FTS table, not capped at a candidate list
+        for index in range(30):
+            self.create_tutor(f"extra{index}", bio='Luyện thi', rating_average=5.0)
+        results = self._search(q='luyen thi', page_size=50)
+        self.assertEqual(len(results), 32)
+        self.assertIn(str(self.tutors['math'].uuid), results)
+
+
+class TutorSearchPaginationTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.tutors = [
+            self.create_tutor(f"tutor{i}", rating_average=rating) for i, rating in enumerate([5, 4, 4, 4, 3])
+        ]
+        self.client.force_authenticate(self.create_user("student", 'student'))
+
+    def test_cursor_walks_every_tutor_once_in_rating_order(self):
+        expected = [
+            str(t.uuid) for t in sorted(self.tutors, key=lambda t: (-t.rating_average, str(t.uuid)))
+        ]
+        seen = []
+        url = reverse('tutor-search') + '?page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            self.assertFalse(any('COUNT(' in q['sql'] or 'OFFSET' in q['sql'] for q in ctx.captured_queries))
+            seen.extend(row['uuid'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_count_only_when_requested(self):
+        response = self.client.get(reverse('tutor-search'), {'count': 'true', 'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertNotIn('count=', response.data['next'])
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('tutor-search'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_forged_cursor_values_return_404(self):
+        tutor_id = str(self.tutors[0].uuid)
+        for values in [['abc', tutor_id], ['4.00', 'not-a-uuid'], ['None', tutor_id], ['NaN', tutor_id], [4, tutor_id]]:
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+            response = self.client.get(reverse('tutor-search'), {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+            self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+class TutorSearchCacheTests(UserFixtures, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.math = Subject.objects.create(name='Toán')
+        self.tutor = self.create_tutor()
+        self.student = self.create_student(grade='10')
+        self.client.force_authenticate(self.student.user)
+
+    def _search(self, params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('tutor-search'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        hit_search_table = any('"api_tutorsearchdocument"' in q['sql'] for q in ctx.captured_queries)
+        return response.data['results'], hit_search_table
+
+    def test_repeated_search_is_served_from_cache_with_fresh_user_fields(self):
+        TutorSubject.objects.create(tutor_profile=self.tutor, subject=self.math, level='basic', price=200000)
+        results, hit_search_table = self._search({'subjects': 'toán'})
+        self.assertTrue(hit_search_table)
+        self.assertFalse(results[0]['is_liked'])
+
+        TutorLike.objects.create(student=self.student, tutor=self.tutor)
+        results, hit_search_table = self._search({'subjects': ' TOÁN '})
+        self.assertFalse(hit_search_table)
+        self.assertEqual([row['uuid'] for row in results], [str(self.tutor.uuid)])
+        self.assertTrue(results[0]['is_liked'])
+
+    def test_search_changes_invalidate_cached_pages(self):
+        results, _ = self._search({'subjects': 'toán'})
+        self.assertEqual(results, [])
+
+        TutorSubject.objects.create(tutor_profile=self.tutor, subject=self.math, level='basic', price=200000)
+        results, hit_search_table = self._search({'subjects': 'toán'})
+        self.assertTrue(hit_search_table)
+        self.assertEqual([row['uuid'] for row in results], [str(self.tutor.uuid)])
+
+        self.tutor.class_levels.add(ClassLevel.objects.create(name='Grade 1-5'))
+        _, hit_search_table = self._search({'subjects': 'toán'})
+        self.assertTrue(hit_search_table)
+
+
+class TutorSearchFacetsTests(UserFixtures, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.math = Subject.objects.create(name='Toán')
+        self.physics = Subject.objects.create(name='Vật lý')
+        self.high_school = ClassLevel.objects.create(name='Grade 10-12')
+        for i, (location, subjects, price) in enumerate([
+            ('hanoi', [self.math, self.physics], 150000),
+            ('hanoi', [self.math], 250000),
+            ('danang', [self.physics], 600000),
+        ]):
+            tutor = self.create_tutor(f"tutor{i}", location=location)
+            for subject in subjects:
+                TutorSubject.objects.create(tutor_profile=tutor, subject=subject, level='basic', price=price)
+                TutorSubject.objects.create(tutor_profile=tutor, subject=subject, level='advanced', price=price)
+            tutor.update_price_range()
+            tutor.class_levels.add(self.high_school)
+        self.client.force_authenticate(self.create_user("student", 'student'))
+
+    def test_facet_counts_follow_filters_with_constant_queries(self):
+        url = reverse('tutor-search-facets')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+        self.assertEqual(
+            {row['name']: row['count'] for row in response.data['subjects']},
+            {'Toán': 2, 'Vật lý': 2}
+        )
+        self.assertEqual(response.data['class_levels'][0]['count'], 3)
+        self.assertEqual(
+            {row['location']: row['count'] for row in response.data['cities']},
+            {'hanoi': 2, 'danang': 1}
+        )
+        self.assertEqual(
+            [row['count'] for row in response.data['price_ranges']],
+            [1, 1, 0, 1]
+        )
+
+        response = self.client.get(url, {'location_type': 'offline', 'city': 'hanoi'})
+        self.assertEqual(
+            {row['name']: row['count'] for row in response.data['subjects']},
+            {'Toán': 2, 'Vật lý': 1}
+        )
+
+    def test_facets_are_cached_per_filter_signature(self):
+        url = reverse('tutor-search-facets')
+        self.client.get(url, {'subjects': 'toán'})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'subjects': 'Toán', 'page_size': 5})
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(len(response.data['cities']), 1)
+
+
+class TutorAvailabilitySearchTests(UserFixtures, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.tutors = {}
+        for key, availability in [
+            ('evening', {'monday': ['18:00-20:00', '20:00-21:30'], 'tuesday': []}),
+            ('late', {'Sunday': ['22:00-01:00'], 'friday': ['not a time']}),
+        ]:
+            self.tutors[key] = self.create_tutor(key, availability=availability)
+        self.client.force_authenticate(self.create_user("student", 'student'))
+
+    def _search(self, **params):
+        response = self.client.get(reverse('tutor-search'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row['uuid'] for row in response.data['results']}
+
+    def test_slots_are_parsed_and_follow_profile_updates(self):
+        slots = TutorAvailabilitySlot.objects.filter(tutor=self.tutors['late'])
+        self.assertEqual(
+            sorted(slots.values_list('weekday', 'start_minute', 'end_minute')),
+            [(0, 0, 60), (6, 1320, 1440)]
+        )
+
+        tutor = self.tutors['evening']
+        tutor.availability = {'wed': ['08:00-10:00']}
+        tutor.save()
+        self.assertEqual(
+            list(tutor.availability_slots.values_list('weekday', 'start_minute', 'end_minute')),
+            [(2, 480, 600)]
+        )
+
+    def test_available_at_and_between(self):
+        evening, late = str(self.tutors['evening'].uuid), str(self.tutors['late'].uuid)
+        self.assertEqual(self._search(available_at='monday 18:00'), {evening})
+        self.assertEqual(self._search(available_at='mon 00:30'), {late})
+        self.assertEqual(self._search(available_at='monday 21:30'), set())
+
+        self.assertEqual(self._search(available_between='monday 21:00-23:00'), {evening})
+        self.assertEqual(self._search(available_between='sunday 23:00-24:00'), {late})
+        self.assertEqual(self._search(available_between='tuesday 18:00-20:00'), set())
+        self.assertEqual(self._search(available_between='monday 20:00-18:00'), set())
+
+        # Overlapping slots of one tutor must not duplicate it
+        response = self.client.get(reverse('tutor-search'), {'available_between': 'monday 19:00-21:00'})
+        self.assertEqual([row['uuid'] for row in response.data['results']], [evening])
+
+
+class TutorRecommendationTests(UserFixtures, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.math = Subject.objects.create(name='Toán')
+        physics = Subject.objects.create(name='Vật lý')
+        high_school = ClassLevel.objects.create(name='Grade 10-12', min_grade=10, max_grade=12)
+        primary = ClassLevel.objects.create(name='Grade 1-5', min_grade=1, max_grade=5)
+        self.tutors = {}
+        for key, location, subject, price, rating, level in [
+            ('fit', 'hanoi', self.math, 300000, 4.5, high_school),
+            ('pricey', 'hanoi', self.math, 900000, 5.0, high_school),
+            ('remote', 'danang', self.math, 300000, 4.5, high_school),
+            ('primary', 'hanoi', self.math, 300000, 5.0, primary),
+            ('physics', 'hanoi', physics, 300000, 5.0, high_school),
+        ]:
+            tutor = self.create_tutor(key, location=location, rating_average=rating)
+            TutorSubject.objects.create(tutor_profile=tutor, subject=subject, level='basic', price=price)
+            tutor.update_price_range()
+            tutor.class_levels.add(level)
+            self.tutors[key] = tutor
+
+        self.student = self.create_student(grade='10', location='hanoi', budget_min=200000, budget_max=400000)
+        self.student.preferred_subjects.add(self.math)
+        self.client.force_authenticate(self.student.user)
+
+    def _recommended(self):
+        response = self.client.get(reverse('tutor-recommendations'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['uuid'] for row in response.data['results']]
+
+    def test_ranks_by_budget_rating_and_location(self):
+        self.assertEqual(
+            self._recommended(),
+            [str(self.tutors[key].uuid) for key in ['fit', 'remote', 'pricey']]
+        )
+
+    def test_profile_changes_invalidate_cached_recommendations(self):
+        self._recommended()
+        self.student.update_budget(800000, 1000000)
+        self.assertEqual(self._recommended()[0], str(self.tutors['pricey'].uuid))
+
+        self.student.preferred_subjects.set([self.math, Subject.objects.get(name='Vật lý')])
+        self.assertIn(str(self.tutors['physics'].uuid), self._recommended())
+
+    def test_popularity_comes_from_the_counter_columns(self):
+        TutorProfile.objects.filter(pk=self.tutors['remote'].pk).update(like_count=5, view_count=20)
+        self.assertEqual(self._recommended()[0], str(self.tutors['remote'].uuid))
+
+    def test_tutor_ids_ending_in_zero_bytes(self):
+        # NumPy 'S16' arrays strip trailing NUL bytes from values such as ...0100
+        tutor = self.create_tutor("zero", uuid=uuid.UUID(int=1 << 8), location='hanoi', rating_average=5.0)
+        TutorSubject.objects.create(tutor_profile=tutor, subject=self.math, level='basic', price=300000)
+        tutor.update_price_range()
+        self.assertEqual(self._recommended()[0], str(tutor.uuid))
+
+    def test_only_students_get_recommendations(self):
+        self.client.force_authenticate(self.tutors['fit'].user)
+        response = self.client.get(reverse('tutor-recommendations'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ChatInboxTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.student = self.create_student(grade='10')
+        self.student_user = self.student.user
+        self.rooms = [ChatRoom.objects.create(student=self.student, tutor=tutor) for tutor in self.create_tutors(3)]
+        self.room = self.rooms[0]
+        self.tutor_user = self.room.tutor.user
+
+    def _send(self, user, content, room=None):
+        self.client.force_authenticate(user)
+        response = self.client.post(reverse('send-message', args=[(room or self.room).id]), {'content': content})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def _inbox(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('chat-rooms'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row['id']: row for row in response.data}
+
+    def test_inbox_uses_denormalized_snapshot_and_counters(self):
+        self._send(self.student_user, 'Chào thầy')
+        self._send(self.student_user, 'Thầy dạy tối thứ 2 được không?')
+        self._send(self.tutor_user, 'Được em nhé')
+        for room in self.rooms[1:]:
+            self._send(self.student_user, 'Hello', room)
+
+        with CaptureQueriesContext(connection) as ctx:
+            inbox = self._inbox(self.student_user)
+        self.assertEqual(len(inbox), 3)
+        self.assertLessEqual(len(ctx.captured_queries), 2)  # student profile lookup + rooms
+
+        row = inbox[str(self.room.id)]
+        self.assertEqual(row['last_message']['content'], 'Được em nhé')
+        self.assertEqual(row['last_message']['sender_id'], str(self.tutor_user.id))
+        self.assertEqual(row['unread_count'], 1)
+        self.assertEqual(self._inbox(self.tutor_user)[str(self.room.id)]['unread_count'], 2)
+
+        response = self.client.post(reverse('mark-chat-read', args=[self.room.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['unread_count'], 0)
+        self.assertEqual(self._inbox(self.tutor_user)[str(self.room.id)]['unread_count'], 0)
+        self.assertEqual(self._inbox(self.student_user)[str(self.room.id)]['unread_count'], 1)
+
+    def test_non_participants_cannot_read_or_write(self):
+        other_tutor = self.rooms[1].tutor.user
+        self.client.force_authenticate(other_tutor)
+        response = self.client.post(reverse('send-message', args=[self.room.id]), {'content': 'Hi'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(reverse('mark-chat-read', args=[self.room.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ChatHistoryPaginationTests(UserFixtures, APITestCase):
+    def setUp(self):
+        student = self.create_student(grade='10')
+        student_user = student.user
+        self.room = ChatRoom.objects.create(student=student, tutor=self.create_tutor())
+        start = timezone.now() - timedelta(hours=1)
+        # m2 and m3 share a timestamp, so the id tie-breaker is exercised
+        for i, offset in enumerate([0, 1, 2, 2, 3, 4, 5]):
+            message = Message.objects.create(chat_room=self.room, sender=student_user, content=f'm{i}')
+            Message.objects.filter(pk=message.pk).update(created_at=start + timedelta(seconds=offset))
+        self.client.force_authenticate(student_user)
+
+    def _get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def _contents(self, data):
+        return [row['content'] for row in data['results']]
+
+    def test_windows_cover_history_in_order_without_gaps(self):
+        url = reverse('chat-messages', args=[self.room.id])
+        page = self._get(url, limit=3)
+        self.assertIsNone(page['next'])
+        seen = self._contents(page)
+        while page['previous']:
+            page = self._get(page['previous'])
+            seen = self._contents(page) + seen
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(sorted(seen), [f'm{i}' for i in range(7)])
+        self.assertEqual(seen[:2], ['m0', 'm1'])
+
+        oldest = Message.objects.filter(chat_room=self.room).order_by('created_at', 'pk').first()
+        newer = self._get(url, after=oldest.pk, limit=10)
+        self.assertEqual(len(newer['results']), 6)
+        self.assertIsNone(newer['next'])
+        self.assertIsNotNone(newer['previous'])
+
+    def test_invalid_cursor(self):
+        url = reverse('chat-messages', args=[self.room.id])
+        self.assertEqual(self.client.get(url, {'before': 'nope'}).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ChatReadWatermarkTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.room = ChatRoom.objects.create(student=self.create_student(grade='10'), tutor=self.create_tutor())
+        self.student_user, self.tutor_user = self.room.student.user, self.room.tutor.user
+        self.client.force_authenticate(self.student_user)
+        for i in range(5):
+            self.client.post(reverse('send-message', args=[self.room.id]), {'content': f'm{i}'})
+        self.message_ids = [row['id'] for row in self.client.get(reverse('chat-messages', args=[self.room.id])).data['results']]
+
+    def _mark_read(self, **data):
+        response = self.client.post(reverse('mark-chat-read', args=[self.room.id]), data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_watermark_advances_in_one_write(self):
+        self.client.force_authenticate(self.tutor_user)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self._mark_read(message_id=self.message_ids[2])
+        self.assertEqual([q['sql'].split()[0] for q in ctx.captured_queries].count('UPDATE'), 1)
+        self.assertEqual(data['last_read_message_id'], self.message_ids[2])
+        self.assertEqual(data['unread_count'], 2)
+
+        # Never moves backwards
+        self.assertEqual(self._mark_read(message_id=self.message_ids[0])['last_read_message_id'], self.message_ids[2])
+        self.assertEqual(self._mark_read()['unread_count'], 0)
+
+    def test_is_read_follows_recipient_watermark(self):
+        self.client.force_authenticate(self.tutor_user)
+        self._mark_read(message_id=self.message_ids[1])
+
+        self.client.force_authenticate(self.student_user)
+        results = self.client.get(reverse('chat-messages', args=[self.room.id])).data['results']
+        self.assertEqual([row['is_read'] for row in results], [True, True, False, False, False])
+
+    def test_unknown_message(self):
+        self.client.force_authenticate(self.tutor_user)
+        response = self.client.post(reverse('mark-chat-read', args=[self.room.id]), {'message_id': 'nope'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ChatConsumerTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.student_user = self.create_user("student", 'student', first_name="An", last_name="Nguyen")
+        student = StudentProfile.objects.create(user=self.student_user, grade='10')
+        self.room = ChatRoom.objects.create(student=student, tutor=self.create_tutor())
+
+    async def _connect(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.room.id}/')
+        communicator.scope['user'] = self.student_user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def test_messages_cost_one_insert_and_one_update(self):
+        # Queries run on the test thread (database_sync_to_async is thread-sensitive), so read them there
+        captured = database_sync_to_async(lambda ctx: ctx.captured_queries)
+
+        async def run(ctx):
+            communicator = await self._connect()
+            start = len(await captured(ctx))
+            await communicator.send_json_to({'type': 'message', 'content': 'Chào thầy'})
+            ack = await communicator.receive_json_from()
+            frame = await communicator.receive_json_from()
+            queries = (await captured(ctx))[start:]
+            await communicator.disconnect()
+            return ack, frame, queries
+
+        with CaptureQueriesContext(connection) as ctx:
+            ack, frame, queries = async_to_sync(run)(ctx)
+        self.assertEqual(ack, {'type': 'ack', 'message_ids': [frame['message']['id']]})
+        self.assertEqual(frame['message']['sender_name'], 'An Nguyen')
+        statements = [q['sql'].split()[0] for q in queries if q['sql'].split()[0] in ('SELECT', 'INSERT', 'UPDATE')]
+        self.assertEqual(statements, ['INSERT', 'UPDATE'])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message_preview, 'Chào thầy')
+        self.assertEqual(self.room.tutor_unread_count, 1)
+
+    def test_deactivating_the_room_closes_the_connection(self):
+        async def run():
+            communicator = await self._connect()
+            await database_sync_to_async(self._deactivate)()
+            frame = await communicator.receive_json_from()
+            closed = await communicator.receive_output()
+            await communicator.disconnect()
+            return frame, closed
+
+        frame, closed = async_to_sync(run)()
+        self.assertEqual(frame['error'], 'Chat room is no longer active')
+        self.assertEqual(closed['type'], 'websocket.close')
+
+    def _deactivate(self):
+        self.room.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.save(update_fields=['is_active'])
+
+    @override_settings(CHAT_WRITE_BEHIND=True)
+    def test_write_behind_broadcasts_first_and_acks_once_stored(self):
+        message_id = str(uuid.uuid4())
+
+        async def run():
+            communicator = await self._connect()
+            frames = []
+            # The resend (same id, e.g. after a reconnect) must not be stored twice
+            for _ in range(2):
+                await communicator.send_json_to({'type': 'message', 'id': message_id, 'content': 'Chào thầy'})
+                frames.append(await communicator.receive_json_from())
+                frames.append(await communicator.receive_json_from())
+            await message_writer.stop()
+            await communicator.disconnect()
+            return frames
+
+        frames = async_to_sync(run)()
+        self.assertEqual([frame['type'] for frame in frames], ['message', 'ack', 'message', 'ack'])
+        self.assertEqual(frames[0]['message']['id'], message_id)
+        self.assertEqual(frames[1]['message_ids'], [message_id])
+        self.assertEqual(list(Message.objects.values_list('id', flat=True)), [uuid.UUID(message_id)])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message_preview, 'Chào thầy')
+        self.assertEqual(self.room.tutor_unread_count, 1)
+
+    def test_write_batch_updates_each_room_once(self):
+        now = timezone.now()
+        batch = [
+            PendingMessage(
+                Message(id=uuid.uuid4(), chat_room=self.room, sender=self.student_user,
+                        content=f'Tin nhắn {index}', created_at=now + timedelta(seconds=index)),
+                self.room, None
+            )
+            for index in range(3)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            write_batch(batch)
+        statements = [q['sql'].split()[0] for q in ctx.captured_queries if q['sql'].split()[0] in ('INSERT', 'UPDATE')]
+        self.assertEqual(statements, ['INSERT', 'UPDATE'])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message_preview, 'Tin nhắn 2')
+        self.assertEqual(self.room.tutor_unread_count, 3)
+
+    def _pending(self, room, content):
+        message = Message(id=uuid.uuid4(), chat_room=room, sender=self.student_user, content=content, created_at=timezone.now())
+        return PendingMessage(message, room, None)
+
+    def _second_room(self):
+        return ChatRoom.objects.create(student=self.room.student, tutor=self.create_tutor("tutor2"))
+
+    def test_write_batch_rolls_back_inactive_rooms(self):
+        other = self._second_room()
+        ChatRoom.objects.filter(pk=other.pk).update(is_active=False)
+        stored, rejected, failed, conflicts = write_batch([self._pending(self.room, 'Còn mở'), self._pending(other, 'Đã đóng')])
+        self.assertEqual([item.chat_room for item in stored], [self.room])
+        self.assertEqual([item.chat_room for item in rejected], [other])
+        self.assertEqual((failed, conflicts), ([], []))
+        self.assertEqual(list(Message.objects.values_list('content', flat=True)), ['Còn mở'])
+
+    def test_write_batch_stores_resends_once_and_rejects_foreign_ids(self):
+        theirs = Message.objects.create(chat_room=self.room, sender=self.room.tutor.user, content='Chào em')
+        resend = self._pending(self.room, 'Gửi lại')
+        stolen = self._pending(self.room, 'Giả mạo')
+        stolen.message.id = theirs.pk
+
+        stored, rejected, failed, conflicts = write_batch([resend, resend, stolen])
+        self.assertEqual((len(stored), rejected, failed, conflicts), (2, [], [], [stolen]))
+        self.assertEqual(sorted(Message.objects.values_list('content', flat=True)), ['Chào em', 'Gửi lại'])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.tutor_unread_count, 1)
+
+        # Stored again later under the same room and sender: still one row, no extra unread
+        stored, rejected, failed, conflicts = write_batch([resend])
+        self.assertEqual(len(stored), 1)
+        self.room.refresh_from_db()
+        self.assertEqual((Message.objects.count(), self.room.tutor_unread_count), (2, 1))
+
+    @override_settings(CHAT_WRITE_BEHIND=True)
+    def test_write_behind_rejects_another_messages_id(self):
+        theirs = Message.objects.create(chat_room=self.room, sender=self.room.tutor.user, content='Chào em')
+
+        async def run():
+            communicator = await self._connect()
+            await communicator.send_json_to({'type': 'message', 'id': str(theirs.pk), 'content': 'Giả mạo'})
+            frames = [await communicator.receive_json_from()]
+            with self.assertLogs('api.chat_pipeline', 'WARNING'):
+                await message_writer.stop()
+            frames.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return frames
+
+        frames = async_to_sync(run)()
+        self.assertEqual([frame['type'] for frame in frames], ['message', 'rejected'])
+        self.assertEqual(frames[1]['message_ids'], [str(theirs.pk)])
+        self.assertEqual(Message.objects.get(pk=theirs.pk).content, 'Chào em')
+
+    def test_failing_room_is_retried_then_dropped_without_stalling_the_queue(self):
+        broken = self._second_room()
+        record_messages = ChatRoom.record_messages
+
+        def fail_for_broken_room(room, messages):
+            if room.pk == broken.pk:
+                raise ValueError('broken room')
+            return record_messages(room, messages)
+
+        writer = MessageWriter(max_attempts=2)
+        with patch.object(ChatRoom, 'record_messages', autospec=True, side_effect=fail_for_broken_room):
+            writer._append([self._pending(broken, 'Lỗi'), self._pending(self.room, 'Một')])
+            with self.assertLogs('api.chat_pipeline', 'ERROR'):
+                writer.flush_sync()
+            self.assertEqual([item.attempts for item in writer._pending], [1])
+
+            writer._append([self._pending(self.room, 'Hai')])
+            with self.assertLogs('api.chat_pipeline', 'ERROR') as logs:
+                writer.flush_sync()
+        self.assertIn('Dropping chat message', logs.output[-1])
+        self.assertEqual(len(writer._pending), 0)
+        self.assertEqual(writer.stats['dropped'], 1)
+        self.assertEqual(sorted(Message.objects.values_list('content', flat=True)), ['Hai', 'Một'])
+
+
+class PresenceTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.room = ChatRoom.objects.create(student=self.create_student(), tutor=self.create_tutor())
+        self.student_user, self.tutor_user = self.room.student.user, self.room.tutor.user
+        # Drop changes left over from other tests
+        presence.get_store().take_dirty()
+
+    def test_user_stays_online_until_last_connection_closes(self):
+        presence.connect(self.student_user.id, 'tab-1')
+        presence.connect(self.student_user.id, 'tab-2')
+        presence.disconnect(self.student_user.id, 'tab-1')
+        self.assertTrue(presence.is_online(self.student_user.id))
+        presence.sync_to_database(force=True)
+        self.student_user.refresh_from_db()
+        self.assertTrue(self.student_user.is_online)
+
+        presence.disconnect(self.student_user.id, 'tab-2')
+        self.assertFalse(presence.is_online(self.student_user.id))
+        presence.sync_to_database(force=True)
+        self.student_user.refresh_from_db()
+        self.assertFalse(self.student_user.is_online)
+
+    def test_connections_without_heartbeat_expire(self):
+        CustomUser.objects.filter(pk=self.tutor_user.pk).update(is_online=True)
+        expired = time.time() - presence.PRESENCE_TTL - 1
+        presence.get_store().touch(str(self.tutor_user.id), 'crashed-worker', expired)
+        self.assertEqual(presence.online_user_ids([self.tutor_user.id, self.student_user.id]), set())
+
+        presence.sync_to_database(force=True)
+        self.tutor_user.refresh_from_db()
+        self.assertFalse(self.tutor_user.is_online)
+        self.assertAlmostEqual(self.tutor_user.last_activity.timestamp(), expired, places=3)
+
+    def test_sync_is_batched(self):
+        presence.connect(self.student_user.id, 'student-socket')
+        presence.connect(self.tutor_user.id, 'tutor-socket')
+        with CaptureQueriesContext(connection) as ctx:
+            presence.sync_to_database(force=True)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        # One for is_online, one for last_activity, whatever the number of users
+        self.assertEqual(len(updates), 2)
+        presence.disconnect(self.student_user.id, 'student-socket')
+        presence.disconnect(self.tutor_user.id, 'tutor-socket')
+
+    def test_chat_list_reports_other_user_presence(self):
+        presence.connect(self.tutor_user.id, 'tutor-socket')
+        self.client.force_authenticate(user=self.student_user)
+        response = self.client.get(reverse('chat-rooms'))
+        presence.disconnect(self.tutor_user.id, 'tutor-socket')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data[0]['other_user']['is_online'])
+
+    def test_consumer_registers_its_connection(self):
+        async def run():
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.room.id}/')
+            communicator.scope['user'] = self.student_user
+            await communicator.connect()
+            online = await database_sync_to_async(presence.is_online)(self.student_user.id)
+            await communicator.disconnect()
+            return online
+
+        self.assertTrue(async_to_sync(run)())
+        self.assertFalse(presence.is_online(self.student_user.id))
+
+
+class TypingThrottleTests(UserFixtures, APITestCase):
+    def _throttle(self, sent, **kwargs):
+        async def emit(is_typing):
+            sent.append(is_typing)
+        return TypingThrottle(emit, **kwargs)
+
+    def test_repeated_frames_send_one_transition(self):
+        sent = []
+
+        async def run():
+            throttle = self._throttle(sent)
+            for _ in range(20):
+                await throttle.update(True)
+            await throttle.update(False)
+            await throttle.close()
+            return throttle.stats
+
+        stats = async_to_sync(run)()
+        # The stop falls inside the minimum interval and is sent when the socket closes
+        self.assertEqual(sent, [True, False])
+        self.assertEqual(stats['received'], 21)
+        self.assertEqual(stats['suppressed'], 20)
+
+    def test_transition_inside_interval_is_deferred(self):
+        sent = []
+
+        async def run():
+            throttle = self._throttle(sent, min_interval=0.05)
+            await throttle.update(True)
+            await throttle.update(False)
+            immediate = list(sent)
+            await asyncio.sleep(0.1)
+            return immediate
+
+        self.assertEqual(async_to_sync(run)(), [True])
+        self.assertEqual(sent, [True, False])
+
+    def test_typing_stops_after_timeout(self):
+        sent = []
+
+        async def run():
+            throttle = self._throttle(sent, min_interval=0, timeout=0.05)
+            await throttle.update(True)
+            await asyncio.sleep(0.1)
+            return throttle.stats
+
+        stats = async_to_sync(run)()
+        self.assertEqual(sent, [True, False])
+        self.assertEqual(stats['auto_stopped'], 1)
+
+    def test_consumer_fans_out_only_transitions(self):
+        room = ChatRoom.objects.create(student=self.create_student(), tutor=self.create_tutor())
+        student_user, tutor_user = room.student.user, room.tutor.user
+
+        async def connect(user):
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{room.id}/')
+            communicator.scope['user'] = user
+            await communicator.connect()
+            return communicator
+
+        async def run():
+            student, tutor = await connect(student_user), await connect(tutor_user)
+            for _ in range(10):
+                await student.send_json_to({'type': 'typing', 'is_typing': True})
+            frame = await tutor.receive_json_from()
+            nothing_else = await tutor.receive_nothing(timeout=0.2)
+            await student.disconnect()
+            stopped = await tutor.receive_json_from()
+            await tutor.disconnect()
+            return frame, nothing_else, stopped
+
+        frame, nothing_else, stopped = async_to_sync(run)()
+        self.assertEqual(frame, {'type': 'typing', 'user_id': str(student_user.id), 'is_typing': True})
+        self.assertTrue(nothing_else)
+        self.assertFalse(stopped['is_typing'])
+
+
+class UserConsumerTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.student = self.create_student()
+        self.student_user = self.student.user
+        *tutors, self.new_tutor = self.create_tutors(3)
+        self.tutor_users = [tutor.user for tutor in tutors]
+        self.rooms = [ChatRoom.objects.create(student=self.student, tutor=tutor) for tutor in tutors]
+
+    async def _connect(self, path, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def test_one_socket_carries_every_room(self):
+        room_one, room_two = (str(room.id) for room in self.rooms)
+
+        async def run():
+            frames = {}
+            user_socket = await self._connect('/ws/user/', self.student_user)
+            frames['rooms'] = await user_socket.receive_json_from()
+
+            tutor_socket = await self._connect(f'/ws/chat/{room_one}/', self.tutor_users[0])
+            await tutor_socket.send_json_to({'type': 'message', 'content': 'Chào em'})
+            frames['incoming'] = await user_socket.receive_json_from()
+            frames['unread'] = await user_socket.receive_json_from()
+
+            await user_socket.send_json_to({'type': 'read', 'room_id': room_one})
+            frames['read'] = await user_socket.receive_json_from()
+
+            await user_socket.send_json_to({'type': 'message', 'room_id': room_two, 'content': 'Em chào thầy'})
+            frames['ack'] = await user_socket.receive_json_from()
+            frames['outgoing'] = await user_socket.receive_json_from()
+
+            await user_socket.send_json_to({'type': 'typing', 'room_id': str(uuid.uuid4()), 'is_typing': True})
+            frames['unknown'] = await user_socket.receive_json_from()
+
+            await tutor_socket.disconnect()
+            await user_socket.disconnect()
+            return frames
+
+        frames = async_to_sync(run)()
+        self.assertEqual(
+            sorted(frames['rooms']['rooms'], key=lambda room: room['room_id']),
+            sorted([{'room_id': room_one, 'unread_count': 0}, {'room_id': room_two, 'unread_count': 0}],
+                   key=lambda room: room['room_id'])
+        )
+        self.assertEqual(frames['incoming']['type'], 'message')
+        self.assertEqual(frames['incoming']['room_id'], room_one)
+        self.assertEqual(frames['unread'], {'type': 'unread', 'room_id': room_one, 'delta': 1, 'unread_count': 1})
+        self.assertEqual(frames['read'], {'type': 'unread', 'room_id': room_one, 'delta': -1, 'unread_count': 0})
+        self.assertEqual(frames['ack']['type'], 'ack')
+        self.assertEqual(frames['outgoing']['room_id'], room_two)
+        self.assertEqual(frames['unknown'], {'error': 'Unknown chat room'})
+        self.assertEqual(Message.objects.filter(chat_room_id=room_two).count(), 1)
+
+    def test_new_and_deactivated_rooms_are_pushed(self):
+        async def run():
+            user_socket = await self._connect('/ws/user/', self.student_user)
+            await user_socket.receive_json_from()
+            new_room = await database_sync_to_async(self._committed)(
+                ChatRoom.objects.create, student=self.student, tutor=self.new_tutor
+            )
+            added = await user_socket.receive_json_from()
+            await database_sync_to_async(self._committed)(self._deactivate, new_room)
+            closed = await user_socket.receive_json_from()
+            # Saving a room that is already inactive does not close it again
+            await database_sync_to_async(self._committed)(self._deactivate, new_room)
+            repeated = await user_socket.receive_nothing()
+            await user_socket.disconnect()
+            return new_room, added, closed, repeated
+
+        new_room, added, closed, repeated = async_to_sync(run)()
+        self.assertEqual(added, {'type': 'room_added', 'room_id': str(new_room.id), 'unread_count': 0})
+        self.assertEqual(closed, {'type': 'room_closed', 'room_id': str(new_room.id)})
+        self.assertTrue(repeated)
+
+    def test_room_created_in_a_transaction_is_pushed_after_commit(self):
+        async def run():
+            user_socket = await self._connect('/ws/user/', self.student_user)
+            await user_socket.receive_json_from()
+            new_room, callbacks = await database_sync_to_async(self._create_in_atomic)()
+            before_commit = await user_socket.receive_nothing()
+            await database_sync_to_async(lambda: [callback() for callback in callbacks])()
+            added = await user_socket.receive_json_from()
+            await user_socket.disconnect()
+            return new_room, before_commit, added
+
+        new_room, before_commit, added = async_to_sync(run)()
+        self.assertTrue(before_commit)
+        self.assertEqual(added, {'type': 'room_added', 'room_id': str(new_room.id), 'unread_count': 0})
+
+    def test_messages_sent_over_http_update_unread_counts(self):
+        room = str(self.rooms[0].id)
+
+        async def run():
+            user_socket = await self._connect('/ws/user/', self.student_user)
+            await user_socket.receive_json_from()
+            response = await database_sync_to_async(self._committed)(self._send_over_http, self.rooms[0], 'Chào em')
+            incoming = await user_socket.receive_json_from()
+            unread = await user_socket.receive_json_from()
+            await user_socket.disconnect()
+            return response, incoming, unread
+
+        response, incoming, unread = async_to_sync(run)()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((incoming['type'], incoming['room_id']), ('message', room))
+        self.assertEqual(incoming['message']['content'], 'Chào em')
+        self.assertEqual(unread, {'type': 'unread', 'room_id': room, 'delta': 1, 'unread_count': 1})
+
+    def _send_over_http(self, room, content):
+        self.client.force_authenticate(room.tutor.user)
+        return self.client.post(reverse('send-message', kwargs={'room_id': room.id}), {'content': content}, format='json')
+
+    def test_channel_layer_failure_does_not_fail_the_save(self):
+        with patch('api.signals.get_channel_layer') as get_layer:
+            get_layer.return_value.group_send = AsyncMock(side_effect=ConnectionError)
+            with self.assertLogs('api.signals', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+                room = ChatRoom.objects.create(student=self.student, tutor=self.new_tutor)
+        self.assertTrue(ChatRoom.objects.filter(pk=room.pk).exists())
+        self.assertEqual(get_layer.return_value.group_send.await_count, 2)
+
+    def _committed(self, function, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return function(*args, **kwargs)
+
+    def _create_in_atomic(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                room = ChatRoom.objects.create(student=self.student, tutor=self.new_tutor)
+        return room, callbacks
+
+    def _deactivate(self, room):
+        room.is_active = False
+        room.save(update_fields=['is_active'])
+
+
+class ChatLoadTestCommandTests(APITestCase):
+    def test_small_run_delivers_every_message(self):
+        out = StringIO()
+        call_command('loadtest_chat', rooms=2, participants=3, messages=2, typing=3, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['connections'], 6)
+        # Every socket receives every message sent in its room
+        self.assertEqual(report['messages_delivered'], 2 * 3 * 3 * 2)
+        self.assertEqual(report['messages_stored'], report['messages_sent'])
+        self.assertGreaterEqual(report['queries_per_message'], 1)
+        self.assertEqual(set(report['latency_ms']), {'p50', 'p95', 'p99'})
+        self.assertFalse(CustomUser.objects.filter(username__startswith='loadtest_chat_').exists())
+
+    def test_query_counter_is_not_capped_like_the_query_log(self):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter), connection.cursor() as cursor:
+            for _ in range(connection.queries_limit + 1):
+                cursor.execute('SELECT 1')
+        self.assertEqual(counter.count, connection.queries_limit + 1)
+
+    def test_refuses_a_non_test_database_without_allow_writes(self):
+        with patch.dict(connection.settings_dict, {'NAME': 'tutorconnect'}):
+            with self.assertRaisesMessage(CommandError, '--allow-writes'):
+                call_command('loadtest_chat', rooms=1, stdout=StringIO())
+        self.assertFalse(CustomUser.objects.filter(username__startswith='loadtest_chat_').exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='chat-attachments-'))
+class ChatAttachmentTests(UserFixtures, APITestCase):
+    def setUp(self):
+        student = self.create_student()
+        self.student_user = student.user
+        self.rooms = [ChatRoom.objects.create(student=student, tutor=tutor) for tutor in self.create_tutors(2)]
+        self.client.force_authenticate(user=self.student_user)
+
+    @staticmethod
+    def _png():
+        output = BytesIO()
+        Image.new('RGB', (800, 600), (200, 30, 30)).save(output, format='PNG')
+        return output.getvalue()
+
+    def _upload(self, room, content, name='photo.png', content_type='image/png'):
+        url = reverse('upload-chat-attachment', kwargs={'room_id': room.id})
+        return self.client.post(url, {'file': SimpleUploadedFile(name, content, content_type=content_type)}, format='multipart')
+
+    def test_identical_uploads_are_stored_once(self):
+        content = self._png()
+        first = self._upload(self.rooms[0], content)
+        second = self._upload(self.rooms[1], content, name='same-photo.png')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data['message_type'], 'image')
+        self.assertEqual(first.data['attachment']['url'], second.data['attachment']['url'])
+
+        attachment = ChatAttachment.objects.get()
+        self.assertEqual(attachment.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(attachment.size, len(content))
+        self.assertEqual(attachment.messages.count(), 2)
+        with attachment.file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+        self.rooms[1].refresh_from_db()
+        self.assertEqual(self.rooms[1].tutor_unread_count, 1)
+
+    def test_files_over_the_limit_are_rejected_while_streaming(self):
+        with patch.object(HashingUploadHandler, 'chunk_size', 1024), \
+                patch('api.attachments.CHAT_ATTACHMENT_MAX_SIZE', 4096):
+            response = self._upload(self.rooms[0], b'%PDF' + b'0' * 10000, name='notes.pdf', content_type='application/pdf')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(ChatAttachment.objects.exists())
+        self.assertFalse(Message.objects.exists())
+
+    def test_preview_is_generated_for_images(self):
+        response = self._upload(self.rooms[0], self._png())
+        sha256 = ChatAttachment.objects.get().sha256
+        self.assertIsNone(response.data['attachment']['preview_url'])
+
+        self.assertTrue(generate_preview(sha256))
+        attachment = ChatAttachment.objects.get()
+        with attachment.preview.open('rb') as preview, Image.open(preview) as image:
+            self.assertLessEqual(max(image.size), 320)
+        self.assertFalse(generate_preview(sha256))
+
+    def test_content_type_is_sniffed_not_taken_from_the_client(self):
+        fake_image = self._upload(self.rooms[0], b'<script>alert(1)</script>', name='photo.png', content_type='image/png')
+        self.assertEqual(fake_image.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(fake_image.data['message_type'], 'file')
+        pdf = self._upload(self.rooms[0], b'%PDF-1.7 notes', name='notes.bin', content_type='text/html')
+        png = self._upload(self.rooms[0], self._png(), name='photo.txt', content_type='text/plain')
+        self.assertEqual(png.data['message_type'], 'image')
+        types = {
+            attachment.size: attachment.content_type for attachment in ChatAttachment.objects.all()
+        }
+        self.assertEqual(types[len(b'<script>alert(1)</script>')], 'application/octet-stream')
+        self.assertEqual(types[len(b'%PDF-1.7 notes')], 'application/pdf')
+        self.assertEqual(types[len(self._png())], 'image/png')
+        self.assertEqual(pdf.status_code, status.HTTP_201_CREATED)
+
+    def test_malformed_content_length_is_a_bad_request(self):
+        url = reverse('upload-chat-attachment', kwargs={'room_id': self.rooms[0].id})
+        response = self.client.post(url, {}, format='multipart', CONTENT_LENGTH='12abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Invalid Content-Length header"})
+        self.assertFalse(Message.objects.exists())
+
+    def test_non_participants_cannot_upload(self):
+        outsider = self.create_user("outsider", 'student')
+        self.client.force_authenticate(user=outsider)
+        response = self._upload(self.rooms[0], self._png())
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(TUTOR_VIEW_FLUSH_INTERVAL=0)  # tests call flush() themselves
+class TutorViewTrackingTests(UserFixtures, APITestCase):
+    def setUp(self):
+        view_tracking.get_buffer().take(10 ** 6)  # drop events left by other tests
+        self.student = self.create_student()
+        self.tutors = self.create_tutors(3)
+        self.client.force_authenticate(self.student.user)
+
+    def _view(self, tutor):
+        response = self.client.get(reverse('tutor-detail', args=[tutor.uuid]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_read_buffers_the_view_without_writing(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._view(self.tutors[0])
+        self.assertFalse([q for q in ctx.captured_queries if 'api_tutorview' in q['sql']])
+        self.assertFalse(TutorView.objects.exists())
+        self.assertEqual(view_tracking.get_buffer().pending(), 1)
+
+    def test_zero_interval_starts_no_flusher(self):
+        with patch.object(view_tracking.threading, 'Thread') as thread:
+            self._view(self.tutors[0])
+        thread.assert_not_called()
+
+    def test_flush_writes_views_and_daily_counters(self):
+        self._view(self.tutors[0])
+        self._view(self.tutors[0])
+        self._view(self.tutors[1])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(view_tracking.flush(), 3)
+        # Student and tutor lookups, view INSERT, counter INSERT, one counter UPDATE for the day, view_count UPDATE
+        self.assertEqual(len([q for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]), 6)
+        self.assertEqual(TutorView.objects.filter(student=self.student).count(), 3)
+        today = timezone.localdate()
+        self.assertEqual(TutorViewDaily.objects.get(tutor=self.tutors[0], date=today).views, 2)
+
+        self._view(self.tutors[0])
+        view_tracking.flush()
+        self.assertEqual(TutorViewDaily.objects.get(tutor=self.tutors[0], date=today).views, 3)
+        self.assertEqual(TutorViewDaily.objects.get(tutor=self.tutors[1], date=today).views, 1)
+        self.assertEqual(view_tracking.get_buffer().pending(), 0)
+        self.tutors[0].refresh_from_db()
+        self.assertEqual(self.tutors[0].view_count, 3)
+
+    def test_failed_flush_keeps_the_batch(self):
+        self._view(self.tutors[0])
+        with patch.object(TutorViewDaily, 'add_views', side_effect=RuntimeError('database down')):
+            with self.assertRaises(RuntimeError):
+                view_tracking.flush()
+        self.assertFalse(TutorView.objects.exists())
+        self.assertEqual(view_tracking.flush(), 1)
+
+    def test_requeue_on_a_full_buffer_drops_the_oldest(self):
+        buffer = view_tracking.MemoryViewBuffer()
+        events = [view_tracking.ViewEvent('u', 't', float(index)) for index in range(5)]
+        with patch.object(view_tracking, 'TUTOR_VIEW_MAX_PENDING', 3):
+            buffer._pending = deque(events[3:], maxlen=3)
+            buffer.requeue(events[:3])
+        self.assertEqual([event.viewed_at for event in buffer.take(10)], [2.0, 3.0, 4.0])
+
+    def test_prune_keeps_recent_and_unscored_views(self):
+        now = timezone.now()
+        def view(days):
+            view = TutorView.objects.create(student=self.student, tutor=self.tutors[0], viewed_at=now - timedelta(days=days))
+            TutorView.objects.filter(pk=view.pk).update(created_at=view.viewed_at)
+
+        for days in (200, 100, 10):
+            view(days)
+        self.assertEqual(view_tracking.prune_views(now=now, retention_days=90), 2)
+        self.assertEqual(TutorView.objects.count(), 1)
+
+        # Views the trending job has not read yet survive
+        view(100)
+        watermark = TrendingWatermark.objects.create(name=trending.WATERMARK_NAME, value=now - timedelta(days=150))
+        self.assertEqual(view_tracking.prune_views(now=now, retention_days=90), 0)
+        TrendingWatermark.objects.filter(pk=watermark.pk).update(value=None)  # first run still going
+        self.assertEqual(view_tracking.prune_views(now=now, retention_days=0), 0)
+
+        out = StringIO()
+        call_command('prune_tutor_views', days=5, stdout=out)
+        self.assertIn('Deleted 0 tutor views', out.getvalue())
+
+    def test_recently_viewed_is_most_recent_first_without_duplicates(self):
+        for tutor in (self.tutors[0], self.tutors[1], self.tutors[2], self.tutors[0]):
+            self._view(tutor)
+
+        response = self.client.get(reverse('recently-viewed-tutors'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row['uuid'] for row in response.data],
+            [str(self.tutors[0].uuid), str(self.tutors[2].uuid), str(self.tutors[1].uuid)]
+        )
+
+
+class TutorCounterTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.student = self.create_student()
+        self.tutors = [self.create_tutor(f"tutor{i}", rating_average=i) for i in range(5)]
+        self.client.force_authenticate(self.student.user)
+
+    def _counts(self, tutor):
+        tutor.refresh_from_db()
+        return tutor.like_count, tutor.save_count
+
+    def test_like_and_save_keep_counters(self):
+        tutor = self.tutors[0]
+        self.client.post(reverse('like-tutor', args=[tutor.uuid]))
+        self.client.post(reverse('like-tutor', args=[tutor.uuid]))
+        self.client.post(reverse('save-tutor', args=[tutor.uuid]))
+        self.assertEqual(self._counts(tutor), (1, 1))
+
+        self.client.delete(reverse('unlike-tutor', args=[tutor.uuid]))
+        self.client.delete(reverse('unlike-tutor', args=[tutor.uuid]))
+        self.client.delete(reverse('unsave-tutor', args=[tutor.uuid]))
+        self.assertEqual(self._counts(tutor), (0, 0))
+
+    def test_reconcile_fixes_drift(self):
+        TutorLike.objects.create(student=self.student, tutor=self.tutors[0])
+        TutorSave.objects.create(student=self.student, tutor=self.tutors[0])
+        TutorProfile.objects.filter(pk=self.tutors[1].pk).update(like_count=7)
+        TutorViewDaily.objects.create(tutor=self.tutors[2], date=timezone.localdate(), views=4)
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('reconcile_tutor_counters', stdout=out)
+        self.assertIn('Fixed 3 tutors (likes 2, saves 1, views 1)', out.getvalue())
+        # One drift count, then one UPDATE ... SET counter = (SELECT ...) per counter
+        statements = [q['sql'].split()[0] for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(statements, ['SELECT', 'UPDATE', 'UPDATE', 'UPDATE'])
+        self.assertEqual(self._counts(self.tutors[0]), (1, 1))
+        self.assertEqual(self._counts(self.tutors[1]), (0, 0))
+        self.tutors[2].refresh_from_db()
+        self.assertEqual(self.tutors[2].view_count, 4)
+
+    def test_search_orders_and_filters_by_counters(self):
+        for likes, tutor in zip([3, 0, 5, 1, 2], self.tutors):
+            TutorProfile.objects.filter(pk=tutor.pk).update(like_count=likes)
+
+        response = self.client.get(reverse('tutor-search'), {'sort': 'likes', 'min_likes': 1, 'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['like_count'] for row in response.data['results']], [5, 3])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['like_count'] for row in response.data['results']], [2, 1])
+        self.assertIsNone(response.data['next'])
+
+
+class TutorLookupTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.tutor = self.create_tutor()
+        self.client.force_authenticate(self.create_student().user)
+
+    def test_chat_room_is_created_by_tutor_uuid(self):
+        response = self.client.post(reverse('create-chat'), {'tutor_id': str(self.tutor.uuid)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('create-chat'), {'tutor_id': 'not-a-uuid'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reviews_are_listed_and_created_by_tutor_uuid(self):
+        response = self.client.post(
+            reverse('create-review', args=[self.tutor.uuid]), {'rating': 5, 'comment': 'Great'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(reverse('tutor-reviews', args=[self.tutor.uuid]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+
+class TutorInteractionToggleTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.student = self.create_student()
+        self.tutor = self.create_tutor()
+        # A fresh instance, as a real request gets: no cached student_profile
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.student.user_id))
+
+    def _queries(self, method, name):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(reverse(name, args=[self.tutor.uuid]))
+        return response, [q['sql'] for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]
+
+    def test_like_is_one_insert_and_one_counter_update(self):
+        response, queries = self._queries('post', 'like-tutor')
+        self.assertTrue(response.data['created'])
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(queries[0].startswith('INSERT'))
+
+        response, queries = self._queries('post', 'like-tutor')
+        self.assertFalse(response.data['created'])
+        self.assertEqual(len(queries), 3)  # the no-op INSERT, the student profile and the tutor existence checks
+        self.assertEqual(TutorLike.objects.filter(student=self.student, tutor=self.tutor).count(), 1)
+
+    def test_unsave_is_one_delete_and_one_counter_update(self):
+        self.client.post(reverse('save-tutor', args=[self.tutor.uuid]))
+        response, queries = self._queries('delete', 'unsave-tutor')
+        self.assertTrue(response.data['deleted'])
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(queries[0].startswith('DELETE'))
+
+        response, queries = self._queries('delete', 'unsave-tutor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(len(queries), 1)
+        self.tutor.refresh_from_db()
+        self.assertEqual(self.tutor.save_count, 0)
+
+    def test_unknown_tutor_and_non_students_are_rejected(self):
+        response = self.client.post(reverse('like-tutor', args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(TutorLike.objects.exists())
+
+        self.client.force_authenticate(self.tutor.user)
+        response = self.client.post(reverse('save-tutor', args=[self.tutor.uuid]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_student_without_profile_is_rejected(self):
+        self.client.force_authenticate(self.create_user("newstudent", 'student'))
+        for name in ('like-tutor', 'save-tutor'):
+            response = self.client.post(reverse(name, args=[self.tutor.uuid]))
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.tutor.refresh_from_db()
+        self.assertEqual((self.tutor.like_count, self.tutor.save_count), (0, 0))
+
+
+class InteractionBatchTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.student = self.create_student()
+        self.tutors = self.create_tutors(4)
+        self.client.force_authenticate(self.student.user)
+
+    def _batch(self, operations):
+        return self.client.post(reverse('interaction-batch'), {'operations': operations}, format='json')
+
+    def test_batch_applies_the_last_operation_per_tutor(self):
+        a, b, c, d = (str(tutor.uuid) for tutor in self.tutors)
+        for tutor in self.tutors[2:]:
+            TutorLike.objects.create(student=self.student, tutor=tutor)
+        TutorProfile.objects.filter(pk__in=[tutor.pk for tutor in self.tutors[2:]]).update(like_count=1)
+        missing = str(uuid.uuid4())
+
+        response = self._batch([
+            {'action': 'like', 'tutor_id': a},
+            {'action': 'save', 'tutor_id': a},
+            {'action': 'like', 'tutor_id': b},
+            {'action': 'unlike', 'tutor_id': b},
+            {'action': 'unlike', 'tutor_id': c},
+            {'action': 'save', 'tutor_id': d},
+            {'action': 'unlike', 'tutor_id': d},
+            {'action': 'like', 'tutor_id': missing},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'tutor_id': a, 'is_liked': True, 'is_saved': True},
+            {'tutor_id': b, 'is_liked': False, 'is_saved': False},
+            {'tutor_id': c, 'is_liked': False, 'is_saved': False},
+            {'tutor_id': d, 'is_liked': False, 'is_saved': True},
+        ])
+        self.assertEqual(response.data['not_found'], [missing])
+        counts = dict(TutorProfile.objects.values_list('uuid', 'like_count'))
+        self.assertEqual([counts[tutor.pk] for tutor in self.tutors], [1, 0, 0, 0])
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def queries(tutors):
+            operations = [{'action': action, 'tutor_id': str(tutor.uuid)} for tutor in tutors for action in ('like', 'save')]
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self._batch(operations).status_code, status.HTTP_200_OK)
+            return len([q for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']])
+
+        self.assertEqual(queries(self.tutors[:1]), queries(self.tutors[1:]))
+
+    def test_counters_follow_the_rows_actually_changed(self):
+        a, b = (tutor.pk for tutor in self.tutors[:2])
+        # Stale batches, e.g. the same queue replayed by two devices: only the first changes anything
+        self.assertEqual(TutorLike.set_many(self.student.uuid, {a: True, b: True}), ({a, b}, set()))
+        self.assertEqual(TutorLike.set_many(self.student.uuid, {a: True, b: True}), (set(), set()))
+        self.assertEqual(TutorLike.set_many(self.student.uuid, {a: False}), (set(), {a}))
+        self.assertEqual(TutorLike.set_many(self.student.uuid, {a: False}), (set(), set()))
+
+        counts = dict(TutorProfile.objects.values_list('uuid', 'like_count'))
+        self.assertEqual((counts[a], counts[b]), (0, 1))
+        self.assertEqual(TutorLike.objects.filter(student=self.student).count(), 1)
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self._batch([]).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self._batch([{'action': 'block', 'tutor_id': str(self.tutors[0].uuid)}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(self.tutors[0].user)
+        response = self._batch([{'action': 'like', 'tutor_id': str(self.tutors[1].uuid)}])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TrendingTutorsTests(UserFixtures, APITestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.math = Subject.objects.create(name='Toán')
+        self.tutors = {}
+        for key, location in [('fresh', 'hanoi'), ('stale', 'hanoi'), ('remote', 'danang'), ('quiet', 'hanoi')]:
+            self.tutors[key] = self.create_tutor(key, location=location)
+        TutorSubject.objects.create(tutor_profile=self.tutors['fresh'], subject=self.math, level='basic', price=1)
+        self.students = [self.create_student(f"student{i}") for i in range(3)]
+        self.client.force_authenticate(self.students[0].user)
+
+        # 'stale' had more activity, but two weeks ago; 'fresh' had a little, today
+        for student in self.students:
+            like = TutorLike.objects.create(student=student, tutor=self.tutors['stale'])
+            TutorLike.objects.filter(pk=like.pk).update(created_at=self.now - timedelta(days=14))
+            self._view(student, 'stale', self.now - timedelta(days=14))
+        like = TutorLike.objects.create(student=self.students[0], tutor=self.tutors['fresh'])
+        TutorLike.objects.filter(pk=like.pk).update(created_at=self.now - timedelta(hours=2))
+        Review.objects.create(student=self.students[1], tutor=self.tutors['fresh'], rating=5)
+        Review.objects.filter(tutor=self.tutors['fresh']).update(created_at=self.now - timedelta(hours=1))
+        self._view(self.students[2], 'remote', self.now - timedelta(hours=3))
+
+    def _view(self, student, key, viewed_at, written_at=None):
+        view = TutorView.objects.create(student=student, tutor=self.tutors[key], viewed_at=viewed_at)
+        TutorView.objects.filter(pk=view.pk).update(created_at=written_at or viewed_at)
+
+    def test_recent_activity_outranks_older_activity(self):
+        result = trending.update_trending(self.now)
+        self.assertEqual(result['events'], 9)
+
+        feed = trending.trending_feed()
+        self.assertEqual(feed.tutor_ids[:3], [self.tutors[key].pk.hex for key in ('fresh', 'remote', 'stale')])
+        self.assertNotIn(self.tutors['quiet'].pk.hex, feed.tutor_ids)
+        self.assertAlmostEqual(feed.scores[0], 8.0, delta=0.2)  # a like and a review, barely decayed
+        self.assertEqual(trending.trending_feed('danang').tutor_ids, [self.tutors['remote'].pk.hex])
+        self.assertEqual(trending.trending_feed('hanoi', self.math.pk).tutor_ids, [self.tutors['fresh'].pk.hex])
+
+    def test_incremental_runs_match_a_full_run(self):
+        trending.update_trending(self.now - timedelta(days=1))
+        self._view(self.students[0], 'stale', self.now - timedelta(minutes=30))
+        result = trending.update_trending(self.now)
+        self.assertEqual(result['events'], 4)  # only what happened after the first run's watermark
+        incremental = dict(TutorTrendingScore.objects.values_list('tutor_id', 'log_score'))
+
+        out = StringIO()
+        call_command('compute_trending', '--reset', stdout=out)
+        full = dict(TutorTrendingScore.objects.values_list('tutor_id', 'log_score'))
+        self.assertEqual(incremental.keys(), full.keys())
+        for tutor_id, log_score in full.items():
+            self.assertAlmostEqual(incremental[tutor_id], log_score, places=6)
+
+    def test_views_written_after_the_watermark_are_still_counted(self):
+        trending.update_trending(self.now)
+        # A view from yesterday that the buffer only wrote now, long after the watermark passed its viewed_at
+        self._view(self.students[0], 'quiet', self.now - timedelta(days=1), written_at=self.now + timedelta(minutes=1))
+        result = trending.update_trending(self.now + timedelta(minutes=10))
+        self.assertEqual(result['events'], 1)
+        self.assertTrue(TutorTrendingScore.objects.filter(tutor=self.tutors['quiet']).exists())
+        self.assertEqual(trending.update_trending(self.now + timedelta(minutes=20))['events'], 0)
+
+    def test_first_run_uses_a_watermark_row_created_by_a_concurrent_run(self):
+        TrendingWatermark.objects.create(name=trending.WATERMARK_NAME, value=None)
+        self.assertEqual(trending.update_trending(self.now)['events'], 9)
+        self.assertEqual(
+            TrendingWatermark.objects.get(name=trending.WATERMARK_NAME).value,
+            self.now - timedelta(seconds=trending.TRENDING_LAG),
+        )
+
+    def test_endpoint_serves_a_feed_in_few_queries(self):
+        trending.update_trending(self.now)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('trending-tutors'), {'location': 'hanoi', 'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['uuid'] for row in response.data['results']], [str(self.tutors['fresh'].uuid), str(self.tutors['stale'].uuid)])
+        self.assertGreater(response.data['results'][0]['trending_score'], response.data['results'][1]['trending_score'])
+        # Feed row, tutors, two prefetches, the student profile and the page's like/save lookup
+        self.assertLessEqual(len(ctx.captured_queries), 6)
+
+        response = self.client.get(reverse('trending-tutors'), {'subject': 'not-a-uuid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,160 @@
+# api/trending.py
+"""
+Trending tutors.
+
+update_trending() folds the TutorView, TutorLike, TutorSave and Review rows
+created since the last run into a per-tutor, exponentially decayed score. It
+then rebuilds the TrendingFeed rows that /api/tutors/trending/ reads: the top
+TRENDING_TOP_N tutors overall, per location, per subject and per
+location + subject.
+
+Scores are kept in log space against a fixed epoch:
+
+    log_score = log(sum(weight * exp(DECAY_RATE * (t - EPOCH))))
+
+Every tutor's score decays by the same factor over time, so ranking by
+log_score is ranking by current score and stored rows never need re-decaying.
+A run only touches the tutors with new events, combining them with
+np.logaddexp. The current score is exp(log_score - DECAY_RATE * (now - EPOCH)).
+
+Events are read in the window (watermark, now - TRENDING_LAG] of the time their
+row was inserted, and decayed by the time they happened. For likes, saves and
+reviews those are the same. Buffered views (api/view_tracking.py) can be
+written long after they happened, e.g. after a failed flush, so they are read
+by TutorView.created_at: a late view is still picked up by the next run. The
+lag only gives in-flight transactions time to commit before the watermark
+passes them. Scores, feeds and the watermark are written in one transaction,
+under a lock on the watermark row, so every event is counted exactly once.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import (
+    Review, TrendingFeed, TrendingWatermark, TutorLike, TutorSave, TutorSubject, TutorTrendingScore, TutorView,
+)
+
+TRENDING_TOP_N = getattr(settings, 'TRENDING_TOP_N', 20)  # tutors per feed
+TRENDING_HALF_LIFE = getattr(settings, 'TRENDING_HALF_LIFE', 3 * 24 * 3600)  # seconds for an event's weight to halve
+TRENDING_LAG = getattr(settings, 'TRENDING_LAG', 300)  # seconds; rows inserted more recently wait for the next run
+TRENDING_MIN_SCORE = 0.05  # tutors below this current score are left out of the feeds
+
+DECAY_RATE = math.log(2) / TRENDING_HALF_LIFE  # per second
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+WATERMARK_NAME = 'tutor_events'
+
+# (weight, model, timestamp field, insert time field)
+EVENT_SOURCES = {
+    'view': (1.0, TutorView, 'viewed_at', 'created_at'),
+    'like': (3.0, TutorLike, 'created_at', 'created_at'),
+    'save': (4.0, TutorSave, 'created_at', 'created_at'),
+    'review': (5.0, Review, 'created_at', 'created_at'),
+}
+
+
+def read_events(since, until):
+    """
+    Returns (tutor_ids, codes, log_contributions) for the events inserted in (since, until]:
+    codes[i] indexes tutor_ids and log_contributions[i] is log(weight) + DECAY_RATE * (t - EPOCH).
+    """
+    tutor_codes = {}
+    codes, times, weights = [], [], []
+    for weight, model, field, inserted_field in EVENT_SOURCES.values():
+        rows = model.objects.filter(**{f'{inserted_field}__lte': until})
+        if since is not None:
+            rows = rows.filter(**{f'{inserted_field}__gt': since})
+        for tutor_id, at in rows.values_list('tutor_id', field).order_by().iterator(chunk_size=5000):
+            codes.append(tutor_codes.setdefault(tutor_id, len(tutor_codes)))
+            times.append((at - EPOCH).total_seconds())
+            weights.append(weight)
+    log_contributions = np.log(np.array(weights)) + DECAY_RATE * np.array(times)
+    return list(tutor_codes), np.array(codes, dtype=np.int64), log_contributions
+
+
+def fold_log_scores(codes, log_contributions, size):
+    """log(sum(exp(contribution))) per code, shifted by each code's maximum so nothing overflows."""
+    peak = np.full(size, -np.inf)
+    np.maximum.at(peak, codes, log_contributions)
+    total = np.zeros(size)
+    np.add.at(total, codes, np.exp(log_contributions - peak[codes]))
+    return peak + np.log(total)
+
+
+def current_scores(log_scores, now):
+    return np.exp(np.asarray(log_scores) - DECAY_RATE * (now - EPOCH).total_seconds())
+
+
+def update_trending(now=None):
+    """
+    Folds new events into the scores and rebuilds the feeds.
+    Returns {'events': <events read>, 'tutors': <scores updated>, 'feeds': <feeds written>}.
+    """
+    now = now or timezone.now()
+    until = now - timedelta(seconds=TRENDING_LAG)
+
+    # Create the row before locking it, so that even two concurrent first runs wait for each other
+    TrendingWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    with transaction.atomic():
+        watermark = TrendingWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+        since = watermark.value
+        if since is not None and since >= until:
+            return {'events': 0, 'tutors': 0, 'feeds': 0}
+
+        tutor_ids, codes, log_contributions = read_events(since, until)
+        if tutor_ids:
+            batch = fold_log_scores(codes, log_contributions, len(tutor_ids))
+            existing = dict(TutorTrendingScore.objects.filter(tutor_id__in=tutor_ids).values_list('tutor_id', 'log_score'))
+            previous = np.array([existing.get(tutor_id, -np.inf) for tutor_id in tutor_ids])
+            combined = np.logaddexp(previous, batch)
+            TutorTrendingScore.objects.bulk_create(
+                [TutorTrendingScore(tutor_id=tutor_id, log_score=float(score)) for tutor_id, score in zip(tutor_ids, combined)],
+                update_conflicts=True, unique_fields=['tutor'], update_fields=['log_score', 'updated_at'], batch_size=1000,
+            )
+
+        feeds = rebuild_feeds(now)
+        watermark.value = until
+        watermark.save(update_fields=['value'])
+    return {'events': len(codes), 'tutors': len(tutor_ids), 'feeds': feeds}
+
+
+def rebuild_feeds(now):
+    """Replaces every TrendingFeed row from the current scores. Returns the number of feeds."""
+    threshold = math.log(TRENDING_MIN_SCORE) + DECAY_RATE * (now - EPOCH).total_seconds()
+    rows = list(TutorTrendingScore.objects.filter(
+        log_score__gte=threshold, tutor__user__is_active=True
+    ).order_by('-log_score').values_list('tutor_id', 'tutor__search_document__location', 'log_score'))
+    scores = current_scores([log_score for _, _, log_score in rows], now)
+
+    subjects = {}
+    for tutor_id, subject_id in TutorSubject.objects.filter(
+        tutor_profile_id__in=[tutor_id for tutor_id, _, _ in rows]
+    ).values_list('tutor_profile_id', 'subject_id').distinct():
+        subjects.setdefault(tutor_id, []).append(subject_id)
+
+    # (location, subject_id) -> ([tutor_id], [score]); '' / None mean "any"
+    feeds = {('', None): ([], [])}
+    for (tutor_id, location, _), score in zip(rows, scores):
+        keys = [('', None)] + [('', subject_id) for subject_id in subjects.get(tutor_id, [])]
+        if location:
+            keys += [(location, subject_id) for _, subject_id in keys]
+        for key in keys:
+            tutor_list, score_list = feeds.setdefault(key, ([], []))
+            if len(tutor_list) < TRENDING_TOP_N:
+                tutor_list.append(tutor_id.hex)
+                score_list.append(round(float(score), 4))
+
+    TrendingFeed.objects.all().delete()
+    TrendingFeed.objects.bulk_create([
+        TrendingFeed(location=location, subject_id=subject_id, tutor_ids=tutor_list, scores=score_list, computed_at=now)
+        for (location, subject_id), (tutor_list, score_list) in feeds.items()
+    ], batch_size=1000)
+    return len(feeds)
+
+
+def trending_feed(location='', subject_id=None):
+    """The precomputed feed for a location/subject ('' / None for any), or None before the first run."""
+    return TrendingFeed.objects.filter(location=location, subject_id=subject_id).first()
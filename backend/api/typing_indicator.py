@@ -0,0 +1,114 @@
+# api/typing_indicator.py
+"""
+Server-side coalescing of chat typing indicators.
+
+Clients send a {"type": "typing"} frame on every keystroke. Fanning each one
+out to the room would mean dozens of channel-layer messages per second per
+typist. Each ChatConsumer connection instead owns a TypingThrottle that
+forwards only the start/stop transitions:
+
+- A frame that repeats the state already sent to the room is dropped.
+- Transitions are at least TYPING_MIN_INTERVAL seconds apart. A transition
+  inside that window is deferred to the end of the window, and is dropped if
+  the state has flipped back by then.
+- A stop is sent by itself after TYPING_TIMEOUT seconds without a typing
+  frame, when a message is sent, and when the socket closes.
+
+Every throttle adds to the process-wide `totals` counters, so the number of
+suppressed frames can be monitored.
+"""
+import asyncio
+import time
+from collections import Counter
+
+from django.conf import settings
+
+TYPING_MIN_INTERVAL = getattr(settings, 'TYPING_MIN_INTERVAL', 1.0)  # seconds between transitions
+TYPING_TIMEOUT = getattr(settings, 'TYPING_TIMEOUT', 5.0)  # seconds of silence before an automatic stop
+
+# Process-wide counters: received, emitted, suppressed, auto_stopped
+totals = Counter()
+
+
+class TypingThrottle:
+    """
+    Typing state of one user in one room. `emit(is_typing)` is the coroutine
+    that fans a transition out to the room.
+    """
+
+    def __init__(self, emit, min_interval=TYPING_MIN_INTERVAL, timeout=TYPING_TIMEOUT):
+        self.emit = emit
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.stats = Counter()
+        self.is_typing = False  # latest state reported by the client
+        self.sent = False  # state last sent to the room
+        self.sent_at = None
+        self._lock = asyncio.Lock()
+        self._flush_task = None
+        self._timeout_task = None
+
+    async def update(self, is_typing):
+        """Handles one typing frame from the client."""
+        self._count('received')
+        self.is_typing = is_typing
+        self._cancel('_timeout_task')
+        if is_typing:
+            self._timeout_task = asyncio.ensure_future(self._stop_after_timeout())
+        if not await self._transition():
+            self._count('suppressed')
+
+    async def stop(self):
+        """Ends typing without waiting for a frame (e.g. the user sent their message)."""
+        self.is_typing = False
+        self._cancel('_timeout_task')
+        await self._transition()
+
+    async def close(self):
+        """Cancels pending timers and tells the room the user stopped typing, if needed."""
+        self._cancel('_timeout_task')
+        self._cancel('_flush_task')
+        self.is_typing = False
+        async with self._lock:
+            if self.sent:
+                await self._send(False)
+
+    async def _transition(self):
+        """Sends the current state if it changed and the interval allows. Returns True if sent now."""
+        async with self._lock:
+            if self.is_typing == self.sent:
+                return False
+            wait = 0 if self.sent_at is None else self.sent_at + self.min_interval - time.monotonic()
+            if wait > 0:
+                if self._flush_task is None or self._flush_task.done():
+                    self._flush_task = asyncio.ensure_future(self._flush_after(wait))
+                return False
+            await self._send(self.is_typing)
+            return True
+
+    async def _send(self, is_typing):
+        self.sent = is_typing
+        self.sent_at = time.monotonic()
+        self._count('emitted')
+        await self.emit(is_typing)
+
+    async def _flush_after(self, delay):
+        await asyncio.sleep(delay)
+        await self._transition()
+
+    async def _stop_after_timeout(self):
+        await asyncio.sleep(self.timeout)
+        self._count('auto_stopped')
+        self.is_typing = False
+        await self._transition()
+
+    def _cancel(self, name):
+        task = getattr(self, name)
+        # A timer never cancels itself (it may be the one calling)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        setattr(self, name, None)
+
+    def _count(self, name):
+        self.stats[name] += 1
+        totals[name] += 1
@@ -12,8 +12,11 @@ urlpatterns = [
     
     # Tutor endpoints
     path('search/tutors/', views.TutorSearchView.as_view(), name='tutor-search'),
+    path('search/tutors/facets/', views.TutorSearchFacetsView.as_view(), name='tutor-search-facets'),
     # path('tutors/', views.TutorListView.as_view(), name='tutor-list'),
     path('tutors/<uuid:uuid>/', views.TutorDetailView.as_view(), name='tutor-detail'),
+    path('recommendations/tutors/', views.recommended_tutors_view, name='tutor-recommendations'),
+    path('tutors/trending/', views.trending_tutors_view, name='trending-tutors'),
 
     # Tutor interactions
     path('tutors/<uuid:tutor_id>/like/', views.like_tutor_view, name='like-tutor'),
@@ -24,6 +27,8 @@ urlpatterns = [
     # User data
     path('users/saved-tutors/', views.saved_tutors_view, name='saved-tutors'),
     path('users/liked-tutors/', views.liked_tutors_view, name='liked-tutors'),
+    path('users/recently-viewed/', views.recently_viewed_tutors_view, name='recently-viewed-tutors'),
+    path('users/interactions/batch/', views.interaction_batch_view, name='interaction-batch'),
     path('users/profile/', views.update_profile_view, name='update-profile'),
 
     # Chat endpoints
@@ -31,6 +36,8 @@ urlpatterns = [
     path('chats/create/', views.create_chat_room_view, name='create-chat'),
     path('chats/<uuid:room_id>/messages/', views.chat_messages_view, name='chat-messages'),
     path('chats/<uuid:room_id>/send/', views.send_message_view, name='send-message'),
+    path('chats/<uuid:room_id>/read/', views.mark_chat_read_view, name='mark-chat-read'),
+    path('chats/<uuid:room_id>/attachments/', views.upload_chat_attachment_view, name='upload-chat-attachment'),
 
     # Review endpoints
     path('tutors/<uuid:tutor_id>/reviews/', views.tutor_reviews_view, name='tutor-reviews'),
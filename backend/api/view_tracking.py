@@ -0,0 +1,301 @@
+# api/view_tracking.py
+"""
+Tutor profile view tracking, off the request path.
+
+TutorDetailView calls record_view(), which only appends an event to a buffer
+and updates the student's recently-viewed list. Neither touches the database,
+so a detail read never waits on a write.
+
+flush() drains the buffer in batches of TUTOR_VIEW_BATCH_SIZE. Each batch is
+written in one transaction: a bulk INSERT of TutorView rows (one per view, with
+the time it happened), the per-tutor TutorViewDaily counters
+(TutorViewDaily.add_views) and TutorProfile.view_count. The counters are what
+ranking reads.
+
+The buffer lives in the cache Redis when django_redis is configured, so every
+worker shares it, and in process memory otherwise (development, tests). The
+first view a process records starts a daemon thread that flushes every
+TUTOR_VIEW_FLUSH_INTERVAL seconds, plus a final flush at exit, so processes
+that never serve a profile (management commands) run no thread.
+TUTOR_VIEW_FLUSH_INTERVAL=0 (set by the tests) disables the thread; the
+flush_tutor_views command can then run the flush instead (Redis buffer only).
+
+A failed flush puts its batch back at the head of the buffer. The buffer is
+capped at TUTOR_VIEW_MAX_PENDING events; past that the oldest are dropped,
+which only costs analytics.
+
+TutorView rows are only read incrementally by the trending job; totals live in
+TutorViewDaily and TutorProfile.view_count. prune_views() (the
+prune_tutor_views command) deletes rows older than TUTOR_VIEW_RETENTION_DAYS
+so the table does not grow without bound.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from api.models import StudentProfile, TrendingWatermark, TutorProfile, TutorView, TutorViewDaily
+from api.trending import WATERMARK_NAME
+
+logger = logging.getLogger(__name__)
+
+TUTOR_VIEW_BATCH_SIZE = getattr(settings, 'TUTOR_VIEW_BATCH_SIZE', 1000)  # events per transaction
+TUTOR_VIEW_MAX_PENDING = getattr(settings, 'TUTOR_VIEW_MAX_PENDING', 100000)  # then the oldest are dropped
+TUTOR_VIEW_RETENTION_DAYS = getattr(settings, 'TUTOR_VIEW_RETENTION_DAYS', 90)
+PRUNE_BATCH_SIZE = 5000  # rows per DELETE
+RECENT_VIEWS_LIMIT = 20  # tutors kept per student, most recent first
+RECENT_VIEWS_TTL = 30 * 24 * 3600  # seconds a student's list survives without a view (Redis)
+
+# IDs are strings, viewed_at is a Unix timestamp
+ViewEvent = namedtuple('ViewEvent', ['user_id', 'tutor_id', 'viewed_at'])
+
+
+class MemoryViewBuffer:
+    """Per-process buffer. Recently-viewed lists are lost on restart and not shared between workers."""
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = deque(maxlen=TUTOR_VIEW_MAX_PENDING)
+        self._recent = {}  # user_id -> [tutor_id, ...]
+
+    def push(self, event):
+        with self._lock:
+            self._pending.append(event)
+            recent = [event.tutor_id] + [tutor_id for tutor_id in self._recent.get(event.user_id, []) if tutor_id != event.tutor_id]
+            self._recent[event.user_id] = recent[:RECENT_VIEWS_LIMIT]
+
+    def take(self, count):
+        with self._lock:
+            return [self._pending.popleft() for _ in range(min(count, len(self._pending)))]
+
+    def requeue(self, events):
+        """Puts events back at the head. If that overflows the cap, the oldest of them are dropped."""
+        with self._lock:
+            room = TUTOR_VIEW_MAX_PENDING - len(self._pending)
+            # extendleft() on a full deque would evict the newest events from the right instead
+            events = events[len(events) - room:] if room > 0 else []
+            self._pending.extendleft(reversed(events))
+
+    def pending(self):
+        return len(self._pending)
+
+    def recent(self, user_id):
+        with self._lock:
+            return list(self._recent.get(user_id, []))
+
+
+class RedisViewBuffer:
+    """
+    Buffer shared by all workers:
+
+    tutor_views:pending          list of "user_id|tutor_id|timestamp", oldest first
+    tutor_views:recent:<user_id> list of tutor IDs, most recent first
+    """
+    shared = True
+
+    PENDING_KEY = 'tutor_views:pending'
+
+    def __init__(self, client):
+        self.redis = client
+
+    @staticmethod
+    def recent_key(user_id):
+        return f'tutor_views:recent:{user_id}'
+
+    @staticmethod
+    def encode(event):
+        return f'{event.user_id}|{event.tutor_id}|{event.viewed_at}'
+
+    @staticmethod
+    def decode(value):
+        user_id, tutor_id, viewed_at = value.decode().split('|')
+        return ViewEvent(user_id, tutor_id, float(viewed_at))
+
+    def push(self, event):
+        key = self.recent_key(event.user_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.rpush(self.PENDING_KEY, self.encode(event))
+        pipe.ltrim(self.PENDING_KEY, -TUTOR_VIEW_MAX_PENDING, -1)
+        pipe.lrem(key, 0, event.tutor_id)
+        pipe.lpush(key, event.tutor_id)
+        pipe.ltrim(key, 0, RECENT_VIEWS_LIMIT - 1)
+        pipe.expire(key, RECENT_VIEWS_TTL)
+        pipe.execute()
+
+    def take(self, count):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrange(self.PENDING_KEY, 0, count - 1)
+        pipe.ltrim(self.PENDING_KEY, count, -1)
+        values, _ = pipe.execute()
+        return [self.decode(value) for value in values]
+
+    def requeue(self, events):
+        if events:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.lpush(self.PENDING_KEY, *[self.encode(event) for event in reversed(events)])
+            pipe.ltrim(self.PENDING_KEY, -TUTOR_VIEW_MAX_PENDING, -1)  # keeps the newest
+            pipe.execute()
+
+    def pending(self):
+        return self.redis.llen(self.PENDING_KEY)
+
+    def recent(self, user_id):
+        return [value.decode() for value in self.redis.lrange(self.recent_key(user_id), 0, RECENT_VIEWS_LIMIT - 1)]
+
+
+_buffer = None
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        if settings.CACHES['default']['BACKEND'].startswith('django_redis.'):
+            # Imported here: django_redis is only needed when the cache uses it
+            from django_redis import get_redis_connection
+
+            _buffer = RedisViewBuffer(get_redis_connection('default'))
+        else:
+            _buffer = MemoryViewBuffer()
+    return _buffer
+
+
+# ===========================
+# Request path
+# ===========================
+
+def record_view(user_id, tutor_id):
+    """Buffers a student's view of a tutor profile. Never raises: a lost view is better than a failed read."""
+    try:
+        get_buffer().push(ViewEvent(str(user_id), str(tutor_id), time.time()))
+        _ensure_flusher()
+    except Exception:
+        logger.warning('Could not record a view of tutor %s', tutor_id, exc_info=True)
+
+
+def recent_tutor_ids(user_id):
+    """Tutor IDs the user viewed most recently, newest first (at most RECENT_VIEWS_LIMIT)."""
+    return get_buffer().recent(str(user_id))
+
+
+# ===========================
+# Flushing
+# ===========================
+
+def write_events(events):
+    """
+    Writes a batch of ViewEvents in one transaction: a TutorView row per event,
+    the daily counters and the tutors' view_count. Events for deleted students
+    or tutors are dropped.
+    Returns the number of views written.
+    """
+    students = {
+        str(user_id): pk for user_id, pk in
+        StudentProfile.objects.filter(user_id__in={event.user_id for event in events}).values_list('user_id', 'pk')
+    }
+    tutors = {
+        str(pk) for pk in TutorProfile.objects.filter(pk__in={event.tutor_id for event in events}).values_list('pk', flat=True)
+    }
+
+    views = []
+    counts = Counter()  # (tutor_id, date) -> views
+    per_tutor = Counter()  # tutor_id -> views
+    for event in events:
+        student_pk = students.get(event.user_id)
+        if student_pk is None or event.tutor_id not in tutors:
+            continue
+        viewed_at = datetime.fromtimestamp(event.viewed_at, tz=dt_timezone.utc)
+        views.append(TutorView(student_id=student_pk, tutor_id=event.tutor_id, viewed_at=viewed_at))
+        counts[(event.tutor_id, timezone.localdate(viewed_at))] += 1
+        per_tutor[event.tutor_id] += 1
+
+    with transaction.atomic():
+        TutorView.objects.bulk_create(views)
+        TutorViewDaily.add_views(counts)
+        if per_tutor:
+            TutorProfile.add_to_counter('view_count', per_tutor)
+    return len(views)
+
+
+def flush(batch_size=None):
+    """Writes everything buffered now. Returns the number of views written."""
+    buffer = get_buffer()
+    written = 0
+    while True:
+        batch = buffer.take(batch_size or TUTOR_VIEW_BATCH_SIZE)
+        if not batch:
+            return written
+        try:
+            written += write_events(batch)
+        except Exception:
+            buffer.requeue(batch)
+            raise
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _ensure_flusher():
+    global _flusher
+    interval = getattr(settings, 'TUTOR_VIEW_FLUSH_INTERVAL', 5.0)
+    if interval <= 0 or (_flusher is not None and _flusher.is_alive()):
+        return
+    with _flusher_lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        if _flusher is None:
+            atexit.register(_flush_at_exit)
+        _flusher = threading.Thread(target=_run_flusher, args=(interval,), name='tutor-view-flusher', daemon=True)
+        _flusher.start()
+
+
+def _run_flusher(interval):
+    while True:
+        time.sleep(interval)
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Could not flush %d buffered tutor views', get_buffer().pending())
+        finally:
+            close_old_connections()
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Could not flush buffered tutor views at exit')
+
+
+# ===========================
+# Retention
+# ===========================
+
+def prune_views(now=None, retention_days=None):
+    """
+    Deletes TutorView rows written before the retention window, in batches of
+    PRUNE_BATCH_SIZE. Rows written after the trending watermark (not read yet)
+    are kept whatever their age. Returns the number of rows deleted.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=TUTOR_VIEW_RETENTION_DAYS if retention_days is None else retention_days)
+    watermark = TrendingWatermark.objects.filter(name=WATERMARK_NAME).first()
+    if watermark is not None:
+        if watermark.value is None:
+            return 0  # the first trending run has not finished
+        cutoff = min(cutoff, watermark.value)
+
+    deleted = 0
+    while True:
+        ids = list(TutorView.objects.filter(created_at__lt=cutoff).values_list('pk', flat=True)[:PRUNE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += TutorView.objects.filter(pk__in=ids).delete()[0]
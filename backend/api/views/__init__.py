@@ -3,17 +3,21 @@
 # views/__init__.py
 from .auth import register_view, login_view, logout_view, me_view
 from .tutor import TutorDetailView
-from .search import TutorSearchView
+from .search import TutorSearchView, TutorSearchFacetsView
+from .recommendation import recommended_tutors_view
+from .trending import trending_tutors_view
 
 from .interaction import (
     like_tutor_view, unlike_tutor_view, 
     save_tutor_view, unsave_tutor_view,
-    saved_tutors_view, liked_tutors_view
+    saved_tutors_view, liked_tutors_view,
+    recently_viewed_tutors_view, interaction_batch_view
 )
 from .profile import update_profile_view, upload_profile_image_view
 from .chat import (
     chat_rooms_view, create_chat_room_view, 
-    chat_messages_view, send_message_view
+    chat_messages_view, send_message_view, mark_chat_read_view,
+    upload_chat_attachment_view
 )
 from .review import tutor_reviews_view, create_review_view
 from .metadata import subjects_list_view, platform_stats_view
@@ -28,6 +32,9 @@ __all__ = [
     # Tutor views
     'TutorDetailView',
     'TutorSearchView',
+    'TutorSearchFacetsView',
+    'recommended_tutors_view',
+    'trending_tutors_view',
 
     
     # Interaction views
@@ -37,6 +44,8 @@ __all__ = [
     'unsave_tutor_view',
     'saved_tutors_view',
     'liked_tutors_view',
+    'recently_viewed_tutors_view',
+    'interaction_batch_view',
     
     # Profile views
     'update_profile_view',
@@ -47,6 +56,8 @@ __all__ = [
     'create_chat_room_view',
     'chat_messages_view',
     'send_message_view',
+    'mark_chat_read_view',
+    'upload_chat_attachment_view',
     
     # Review views
     'tutor_reviews_view',
@@ -1,13 +1,87 @@
 # views/chat.py
+import logging
+
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 
+from api import presence
+from api.attachments import CHAT_ATTACHMENT_MAX_SIZE, HashingUploadHandler, store_attachment
 from api.models import TutorProfile, ChatRoom, Message
+from api.pagination import MessageWindowPagination
 from api.serializers import ChatRoomSerializer, MessageSerializer
 
+logger = logging.getLogger(__name__)
+
+
+def get_chat_room_for_user(user, room_id):
+    """
+    Returns the chat room if `user` is one of its two participants, or None.
+    Raises Http404 if the room does not exist.
+    """
+    chat_room = get_object_or_404(ChatRoom.objects.select_related('student', 'tutor'), id=room_id)
+    if user.id not in (chat_room.student.user_id, chat_room.tutor.user_id):
+        return None
+    return chat_room
+
+
+def read_state(chat_room, user):
+    """The caller's read watermark and unread count, after ChatRoom.mark_read()."""
+    side = chat_room.side_for(user.id)
+    message_id = getattr(chat_room, f'{side}_last_read_message_id')
+    return {
+        'last_read_message_id': str(message_id) if message_id else None,
+        'last_read_at': getattr(chat_room, f'{side}_last_read_at'),
+        'unread_count': getattr(chat_room, f'{side}_unread_count'),
+    }
+
+
+def notify_read(chat_room, user, message):
+    """
+    Tells the room's open WebSocket connections that `user` read up to `message`:
+    the other participant gets a read receipt, the user's own sockets the new unread count.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(f'chat_{chat_room.id}', {
+        'type': 'read_receipt',
+        'room_id': str(chat_room.id),
+        'user_id': str(user.id),
+        'message_id': str(message.pk),
+        'read_at': message.created_at.isoformat(),
+        'unread_count': getattr(chat_room, chat_room.unread_field_for(user)),
+    })
+
+
+def notify_message(chat_room, message):
+    """
+    Broadcasts a message created over HTTP to the room's open WebSocket connections
+    (UserConsumer turns it into an unread delta). Call it after commit; best effort.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(f'chat_{chat_room.id}', {
+            'type': 'chat_message',
+            'room_id': str(chat_room.id),
+            'message': MessageSerializer(message).data | {
+                'sender_id': str(message.sender_id),
+                'sender_name': message.sender.get_full_name(),
+            },
+        })
+    except Exception:
+        logger.warning('Could not broadcast message %s to room %s', message.pk, chat_room.id, exc_info=True)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def chat_rooms_view(request):
@@ -23,8 +97,16 @@ def chat_rooms_view(request):
         ).select_related('student__user', 'tutor__user').order_by('-last_message_at')
     else:
         chat_rooms = ChatRoom.objects.none()
+
+    # One presence lookup for every participant in the list
+    chat_rooms = list(chat_rooms)
+    online_user_ids = presence.online_user_ids(
+        {room.student.user_id for room in chat_rooms} | {room.tutor.user_id for room in chat_rooms}
+    )
     
-    serializer = ChatRoomSerializer(chat_rooms, many=True, context={'request': request})
+    serializer = ChatRoomSerializer(chat_rooms, many=True, context={
+        'request': request, 'online_user_ids': online_user_ids
+    })
     return Response(serializer.data)
 
 @api_view(['POST'])
@@ -37,7 +119,10 @@ def create_chat_room_view(request):
     if not tutor_id:
         return Response({"error": "tutor_id is required"}, status=status.HTTP_400_BAD_REQUEST)
     
-    tutor = get_object_or_404(TutorProfile, id=tutor_id)
+    try:
+        tutor = get_object_or_404(TutorProfile, pk=tutor_id)
+    except ValidationError:
+        return Response({"error": "tutor_id must be a tutor UUID"}, status=status.HTTP_400_BAD_REQUEST)
     student = request.user.student_profile
     
     chat_room, created = ChatRoom.objects.get_or_create(
@@ -52,45 +137,113 @@ def create_chat_room_view(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def chat_messages_view(request, room_id):
-    chat_room = get_object_or_404(ChatRoom, id=room_id)
-    
-    # Check access
-    user = request.user
-    if hasattr(user, 'student_profile') and chat_room.student.user != user:
-        return Response({"error": "Access denied"}, status=status.HTTP_403_FORBIDDEN)
-    elif hasattr(user, 'tutor_profile') and chat_room.tutor.user != user:
+    chat_room = get_chat_room_for_user(request.user, room_id)
+    if chat_room is None:
         return Response({"error": "Access denied"}, status=status.HTTP_403_FORBIDDEN)
     
-    messages = chat_room.messages.select_related('sender').order_by('created_at')
-    serializer = MessageSerializer(messages, many=True)
-    return Response(serializer.data)
+    # Newest window by default; ?before=<message id> / ?after=<message id> page through history
+    paginator = MessageWindowPagination()
+    messages = paginator.paginate_queryset(chat_room.messages.select_related('sender', 'attachment'), request)
+    serializer = MessageSerializer(messages, many=True, context={'chat_room': chat_room})
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def send_message_view(request, room_id):
-    chat_room = get_object_or_404(ChatRoom, id=room_id)
-    
-    # Check access
     user = request.user
-    if hasattr(user, 'student_profile') and chat_room.student.user != user:
-        return Response({"error": "Access denied"}, status=status.HTTP_403_FORBIDDEN)
-    elif hasattr(user, 'tutor_profile') and chat_room.tutor.user != user:
+    chat_room = get_chat_room_for_user(user, room_id)
+    if chat_room is None:
         return Response({"error": "Access denied"}, status=status.HTTP_403_FORBIDDEN)
     
     content = request.data.get('content')
     if not content:
         return Response({"error": "Content is required"}, status=status.HTTP_400_BAD_REQUEST)
     
-    message = Message.objects.create(
-        chat_room=chat_room,
-        sender=user,
-        content=content
-    )
-    
-    # Update chat room's last_message_at
-    chat_room.last_message_at = message.created_at
-    chat_room.save(update_fields=['last_message_at'])
+    with transaction.atomic():
+        message = Message.objects.create(
+            chat_room=chat_room,
+            sender=user,
+            content=content
+        )
+        # Update the room's last-message snapshot and the recipient's unread count
+        if not chat_room.record_message(message):
+            transaction.set_rollback(True)
+            return Response({"error": "Chat room is no longer active"}, status=status.HTTP_403_FORBIDDEN)
+        transaction.on_commit(lambda: notify_message(chat_room, message))
     
     serializer = MessageSerializer(message)
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_chat_read_view(request, room_id):
+    """
+    Moves the caller's read watermark up to `message_id` (default: the newest
+    message). A single write regardless of how many messages it covers.
+    """
+    chat_room = get_chat_room_for_user(request.user, room_id)
+    if chat_room is None:
+        return Response({"error": "Access denied"}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        message = chat_room.mark_read(request.user, request.data.get('message_id'))
+    except (Message.DoesNotExist, ValidationError):
+        return Response({"error": "Message not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if message is not None:
+        notify_read(chat_room, request.user, message)
+    return Response(read_state(chat_room, request.user))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def upload_chat_attachment_view(request, room_id):
+    """
+    Sends a file (multipart field `file`, optional `content` caption) as a chat
+    message. The upload is streamed to disk and hashed chunk by chunk; identical
+    files are stored once (see api/attachments.py).
+    """
+    chat_room = get_chat_room_for_user(request.user, room_id)
+    if chat_room is None:
+        return Response({"error": "Access denied"}, status=status.HTTP_403_FORBIDDEN)
+
+    too_large = {"error": f"File too large. Max {CHAT_ATTACHMENT_MAX_SIZE // (1024 * 1024)}MB allowed."}
+    # Refuse oversized bodies before reading them
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return Response({"error": "Invalid Content-Length header"}, status=status.HTTP_400_BAD_REQUEST)
+    if content_length > CHAT_ATTACHMENT_MAX_SIZE + 64 * 1024:
+        return Response(too_large, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    # Must be installed before the body is parsed
+    handler = HashingUploadHandler(request)
+    request._request.upload_handlers = [handler]
+    uploaded_file = request.FILES.get('file')
+    if handler.too_large:
+        return Response(too_large, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    if uploaded_file is None:
+        return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        attachment, created = store_attachment(uploaded_file)
+        message = Message.objects.create(
+            chat_room=chat_room,
+            sender=request.user,
+            content=request.data.get('content') or uploaded_file.name,
+            message_type='image' if attachment.is_image else 'file',
+            file_attachment=attachment.file.name,
+            attachment=attachment,
+        )
+        if not chat_room.record_message(message):
+            transaction.set_rollback(True)
+            if created:
+                attachment.file.delete(save=False)
+            return Response({"error": "Chat room is no longer active"}, status=status.HTTP_403_FORBIDDEN)
+        transaction.on_commit(lambda: notify_message(chat_room, message))
+
+    serializer = MessageSerializer(message, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -3,78 +3,66 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import Http404
 
-from api.models import TutorProfile, TutorLike, TutorSave
-from api.serializers import TutorListSerializer
+from api.models import StudentProfile, TutorProfile, TutorLike, TutorSave, TutorView
+from api.serializers import InteractionBatchSerializer, TutorListSerializer
+from api.view_tracking import RECENT_VIEWS_LIMIT, recent_tutor_ids
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def like_tutor_view(request, tutor_id):
-    if not hasattr(request.user, 'student_profile'):
+    if request.user.user_type != 'student':
         return Response({"error": "Only students can like tutors"}, status=status.HTTP_403_FORBIDDEN)
     
-    tutor = get_object_or_404(TutorProfile, id=tutor_id)
-    student = request.user.student_profile
-    
-    like, created = TutorLike.objects.get_or_create(student=student, tutor=tutor)
-    
-    if created:
-        return Response({"message": "Tutor liked successfully"})
-    else:
-        return Response({"message": "Tutor already liked"})
+    # One INSERT ... ON CONFLICT DO NOTHING; a miss must then tell "already liked" apart
+    # from a user without a student profile or an unknown tutor
+    if TutorLike.add(request.user.pk, tutor_id):
+        return Response({"message": "Tutor liked successfully", "created": True})
+    if not hasattr(request.user, 'student_profile'):
+        return Response({"error": "Only students can like tutors"}, status=status.HTTP_403_FORBIDDEN)
+    if not TutorProfile.objects.filter(pk=tutor_id).exists():
+        raise Http404
+    return Response({"message": "Tutor already liked", "created": False})
 
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def unlike_tutor_view(request, tutor_id):
-    if not hasattr(request.user, 'student_profile'):
+    if request.user.user_type != 'student':
         return Response({"error": "Only students can unlike tutors"}, status=status.HTTP_403_FORBIDDEN)
     
-    tutor = get_object_or_404(TutorProfile, id=tutor_id)
-    student = request.user.student_profile
-    
-    try:
-        like = TutorLike.objects.get(student=student, tutor=tutor)
-        like.delete()
-        return Response({"message": "Tutor unliked successfully"})
-    except TutorLike.DoesNotExist:
-        return Response({"error": "Like not found"}, status=status.HTTP_404_NOT_FOUND)
+    if TutorLike.remove(request.user.pk, tutor_id):
+        return Response({"message": "Tutor unliked successfully", "deleted": True})
+    return Response({"error": "Like not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def save_tutor_view(request, tutor_id):
-    if not hasattr(request.user, 'student_profile'):
+    if request.user.user_type != 'student':
         return Response({"error": "Only students can save tutors"}, status=status.HTTP_403_FORBIDDEN)
     
-    tutor = get_object_or_404(TutorProfile, id=tutor_id)
-    student = request.user.student_profile
-    
-    save, created = TutorSave.objects.get_or_create(student=student, tutor=tutor)
-    
-    if created:
-        return Response({"message": "Tutor saved successfully"})
-    else:
-        return Response({"message": "Tutor already saved"})
+    if TutorSave.add(request.user.pk, tutor_id):
+        return Response({"message": "Tutor saved successfully", "created": True})
+    if not hasattr(request.user, 'student_profile'):
+        return Response({"error": "Only students can save tutors"}, status=status.HTTP_403_FORBIDDEN)
+    if not TutorProfile.objects.filter(pk=tutor_id).exists():
+        raise Http404
+    return Response({"message": "Tutor already saved", "created": False})
 
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def unsave_tutor_view(request, tutor_id):
-    if not hasattr(request.user, 'student_profile'):
+    if request.user.user_type != 'student':
         return Response({"error": "Only students can unsave tutors"}, status=status.HTTP_403_FORBIDDEN)
     
-    tutor = get_object_or_404(TutorProfile, id=tutor_id)
-    student = request.user.student_profile
-    
-    try:
-        save = TutorSave.objects.get(student=student, tutor=tutor)
-        save.delete()
-        return Response({"message": "Tutor unsaved successfully"})
-    except TutorSave.DoesNotExist:
-        return Response({"error": "Save not found"}, status=status.HTTP_404_NOT_FOUND)
+    if TutorSave.remove(request.user.pk, tutor_id):
+        return Response({"message": "Tutor unsaved successfully", "deleted": True})
+    return Response({"error": "Save not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
 @api_view(['GET'])
@@ -83,9 +71,9 @@ def saved_tutors_view(request):
     if not hasattr(request.user, 'student_profile'):
         return Response({"error": "Only students have saved tutors"}, status=status.HTTP_403_FORBIDDEN)
     
-    saved_tutors = TutorProfile.objects.filter(
-        saves__student=request.user.student_profile
-    ).select_related('user').prefetch_related('tutor_subjects__subject')
+    saved_tutors = TutorListSerializer.setup_eager_loading(
+        TutorProfile.objects.filter(saves__student=request.user.student_profile)
+    )
     
     serializer = TutorListSerializer(saved_tutors, many=True, context={'request': request})
     return Response(serializer.data)
@@ -97,9 +85,88 @@ def liked_tutors_view(request):
     if not hasattr(request.user, 'student_profile'):
         return Response({"error": "Only students have liked tutors"}, status=status.HTTP_403_FORBIDDEN)
     
-    liked_tutors = TutorProfile.objects.filter(
-        likes__student=request.user.student_profile
-    ).select_related('user').prefetch_related('tutor_subjects__subject')
+    liked_tutors = TutorListSerializer.setup_eager_loading(
+        TutorProfile.objects.filter(likes__student=request.user.student_profile)
+    )
     
     serializer = TutorListSerializer(liked_tutors, many=True, context={'request': request})
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recently_viewed_tutors_view(request):
+    if request.user.user_type != 'student':
+        return Response({"error": "Only students have recently viewed tutors"}, status=status.HTTP_403_FORBIDDEN)
+
+    tutor_ids = recent_tutor_ids(request.user.pk)
+    if not tutor_ids:
+        # The buffer's list is gone (e.g. in-memory buffer after a restart); rebuild it from the stored views
+        for tutor_id in TutorView.objects.filter(student__user=request.user).order_by('-viewed_at').values_list(
+            'tutor_id', flat=True
+        )[:RECENT_VIEWS_LIMIT * 5]:
+            if str(tutor_id) not in tutor_ids:
+                tutor_ids.append(str(tutor_id))
+        tutor_ids = tutor_ids[:RECENT_VIEWS_LIMIT]
+
+    tutors = TutorListSerializer.setup_eager_loading(TutorProfile.objects.filter(pk__in=tutor_ids))
+    position = {tutor_id: index for index, tutor_id in enumerate(tutor_ids)}
+    tutors = sorted(tutors, key=lambda tutor: position[str(tutor.pk)])
+
+    serializer = TutorListSerializer(tutors, many=True, context={'request': request})
+    return Response(serializer.data)
+
+
+# Batch action -> (model, resulting state)
+INTERACTION_ACTIONS = {
+    'like': (TutorLike, True),
+    'unlike': (TutorLike, False),
+    'save': (TutorSave, True),
+    'unsave': (TutorSave, False),
+}
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def interaction_batch_view(request):
+    """
+    Applies an ordered list of like/unlike/save/unsave operations queued by a
+    client (e.g. while offline) in one transaction. Operations on the same tutor
+    collapse to the last one, then each model gets one bulk INSERT, one DELETE
+    and one counter UPDATE, so the query count does not grow with the batch.
+    Returns the resulting liked/saved state of every tutor in the batch.
+    """
+    if request.user.user_type != 'student':
+        return Response({"error": "Only students can like or save tutors"}, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = InteractionBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    states = {TutorLike: {}, TutorSave: {}}
+    tutor_ids = []  # in first-seen order
+    for operation in serializer.validated_data['operations']:
+        model, state = INTERACTION_ACTIONS[operation['action']]
+        states[model][operation['tutor_id']] = state
+        if operation['tutor_id'] not in tutor_ids:
+            tutor_ids.append(operation['tutor_id'])
+
+    student_uuid = StudentProfile.objects.filter(user=request.user).values_list('uuid', flat=True).first()
+    if student_uuid is None:
+        return Response({"error": "Only students can like or save tutors"}, status=status.HTTP_403_FORBIDDEN)
+    found = set(TutorProfile.objects.filter(pk__in=tutor_ids).values_list('pk', flat=True))
+
+    with transaction.atomic():
+        for model, model_states in states.items():
+            model.set_many(student_uuid, {
+                tutor_id: state for tutor_id, state in model_states.items() if tutor_id in found
+            })
+
+    liked = set(TutorLike.objects.filter(student_id=student_uuid, tutor_id__in=found).values_list('tutor_id', flat=True))
+    saved = set(TutorSave.objects.filter(student_id=student_uuid, tutor_id__in=found).values_list('tutor_id', flat=True))
+    return Response({
+        "results": [
+            {"tutor_id": str(tutor_id), "is_liked": tutor_id in liked, "is_saved": tutor_id in saved}
+            for tutor_id in tutor_ids if tutor_id in found
+        ],
+        "not_found": [str(tutor_id) for tutor_id in tutor_ids if tutor_id not in found],
+    })
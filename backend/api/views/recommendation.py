@@ -0,0 +1,37 @@
+# views/recommendation.py
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+
+from api.models import TutorProfile
+from api.recommendations import RECOMMENDATION_TOP_K, recommend_tutor_ids
+from api.serializers import TutorListSerializer
+
+DEFAULT_RECOMMENDATION_LIMIT = 20
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recommended_tutors_view(request):
+    """
+    Returns the tutors that best match the student's preferred subjects, budget,
+    location and grade (see api/recommendations.py). Pass ?limit= (max 50).
+    """
+    if not hasattr(request.user, 'student_profile'):
+        return Response({"error": "Only students can get tutor recommendations"}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', DEFAULT_RECOMMENDATION_LIMIT)), RECOMMENDATION_TOP_K))
+    except ValueError:
+        limit = DEFAULT_RECOMMENDATION_LIMIT
+
+    tutor_ids = recommend_tutor_ids(request.user.student_profile)[:limit]
+    tutors = TutorListSerializer.setup_eager_loading(
+        TutorProfile.objects.filter(uuid__in=tutor_ids, user__is_active=True)
+    )
+    by_pk = {tutor.pk.hex: tutor for tutor in tutors}
+    ordered = [by_pk[tutor_id] for tutor_id in tutor_ids if tutor_id in by_pk]
+
+    serializer = TutorListSerializer(ordered, many=True, context={'request': request})
+    return Response({'results': serializer.data})
@@ -12,7 +12,7 @@ from api.serializers import ReviewSerializer, CreateReviewSerializer
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def tutor_reviews_view(request, tutor_id):
-    tutor = get_object_or_404(TutorProfile, id=tutor_id)
+    tutor = get_object_or_404(TutorProfile, pk=tutor_id)
     reviews = tutor.reviews_received.select_related('student__user').order_by('-created_at')
     serializer = ReviewSerializer(reviews, many=True)
     return Response(serializer.data)
@@ -24,7 +24,7 @@ def create_review_view(request, tutor_id):
     if not hasattr(request.user, 'student_profile'):
         return Response({"error": "Only students can submit reviews"}, status=status.HTTP_403_FORBIDDEN)
     
-    tutor = get_object_or_404(TutorProfile, id=tutor_id)
+    tutor = get_object_or_404(TutorProfile, pk=tutor_id)
     
     # Check if student already reviewed this tutor
     if Review.objects.filter(student=request.user.student_profile, tutor=tutor).exists():
@@ -1,20 +1,34 @@
 # api/views/search.py
 
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
 from rest_framework import generics
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated
 
-from api.models import TutorProfile
+from api.models import TutorProfile, TutorSubject, TutorSearchDocument
 from api.serializers import TutorListSerializer
 from api.filters import TutorSearchFilter
+from api.pagination import KeysetPagination
+from api.search_cache import SEARCH_CACHE_TIMEOUT, SEARCH_PARAMS, make_search_key
 
 class TutorSearchView(generics.ListAPIView):
     """
     Provides an advanced search endpoint for tutors, with filters for classes,
     subjects, price, and location.
+
+    Filtering and ordering run on TutorSearchDocument, a 1:1 flattened copy of
+    each tutor's searchable data, so the result is a single joined query.
+    Pages are keyset-paginated on (rating_average, uuid), or on a popularity
+    counter with ?sort=likes|saves|views; pass ?count=true for a total.
+
+    Each page's ordered tutor UUIDs are cached per normalized filter set (see
+    api/search_cache.py); per-user fields are still computed on every request.
     """
     serializer_class = TutorListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = TutorSearchFilter
 
@@ -22,9 +36,9 @@ class TutorSearchView(generics.ListAPIView):
         """
         Builds the base queryset and applies location-specific filtering.
         """
-        queryset = TutorProfile.objects.select_related('user').prefetch_related(
-            'tutor_subjects__subject', 'class_levels'
-        ).filter(user__is_active=True).order_by('-rating_average')
+        queryset = TutorListSerializer.setup_eager_loading(
+            TutorProfile.objects.filter(user__is_active=True)
+        ).order_by('-search_document__rating_average', 'uuid')
 
         location_type = self.request.query_params.get('location_type')
 
@@ -32,8 +46,8 @@ class TutorSearchView(generics.ListAPIView):
         if location_type == 'offline':
             city = self.request.query_params.get('city', None)
             if city:
-                # Filter for tutors in the exact same city (case-insensitive).
-                queryset = queryset.filter(location__iexact=city)
+                # Filter for tutors in the exact same city (document locations are normalized).
+                queryset = queryset.filter(search_document__location=TutorSearchDocument.normalize_location(city))
             else:
                 # If searching for offline tutors but no city is provided, return no results.
                 return queryset.none()
@@ -41,3 +55,120 @@ class TutorSearchView(generics.ListAPIView):
         # meaning all tutors are considered regardless of their city.
 
         return queryset
+
+    def list(self, request, *args, **kwargs):
+        key = make_search_key('tutor_search', request.query_params)
+        state = cache.get(key)
+
+        if state is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            tutors = self.paginate_queryset(queryset)
+            cache.set(key, self.paginator.get_page_state(), SEARCH_CACHE_TIMEOUT)
+        else:
+            tutors = self.paginator.restore_page_state(request, state, self.get_cached_tutors(state['pks']))
+
+        serializer = self.get_serializer(tutors, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_cached_tutors(self, pks):
+        """
+        Loads the tutors of a cached page in its cached order.
+        """
+        tutors = TutorListSerializer.setup_eager_loading(
+            TutorProfile.objects.filter(uuid__in=pks, user__is_active=True)
+        )
+        by_pk = {tutor.pk: tutor for tutor in tutors}
+        return [by_pk[pk] for pk in pks if pk in by_pk]
+
+
+# Price buckets for facet counts, on the tutor's minimum price: (key, lower bound, upper bound)
+PRICE_BUCKETS = [
+    ('lt_200000', None, 200000),
+    ('200000_300000', 200000, 300000),
+    ('300000_500000', 300000, 500000),
+    ('gte_500000', 500000, None),
+]
+
+# Facets describe the whole result set, so pagination parameters do not affect them
+FACET_PARAMS = {
+    name: normalize for name, normalize in SEARCH_PARAMS.items()
+    if name not in ('cursor', 'page_size', 'count', 'sort')
+}
+
+
+class TutorSearchFacetsView(TutorSearchView):
+    """
+    Returns tutor counts per subject, class level, city and price bucket for the
+    current search filters, so the UI can label filter chips without running one
+    search per option.
+
+    Uses one grouped aggregate query per facet and caches the result per
+    filter signature, invalidated together with the search cache.
+    """
+    pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        key = make_search_key('tutor_facets', request.query_params, FACET_PARAMS)
+        facets = cache.get(key)
+        if facets is None:
+            facets = self.get_facets(self.filter_queryset(self.get_queryset()))
+            cache.set(key, facets, SEARCH_CACHE_TIMEOUT)
+        return Response(facets)
+
+    def get_facets(self, queryset):
+        tutor_ids = queryset.order_by().values('uuid')
+
+        subjects = TutorSubject.objects.filter(tutor_profile__in=tutor_ids).values(
+            'subject_id', 'subject__name'
+        ).annotate(
+            # A tutor may teach the same subject at several levels
+            count=Count('tutor_profile', distinct=True)
+        ).order_by('-count', 'subject__name')
+
+        through = TutorProfile.class_levels.through
+        class_levels = through.objects.filter(tutorprofile__in=tutor_ids).values(
+            'classlevel_id', 'classlevel__name'
+        ).annotate(count=Count('id')).order_by('classlevel__name')
+
+        documents = TutorSearchDocument.objects.filter(tutor__in=tutor_ids)
+        cities = documents.exclude(location='').values('location').annotate(
+            count=Count('tutor')
+        ).order_by('-count', 'location')
+
+        bucket = Case(
+            *[
+                When(self._price_range(lower, upper), then=Value(name))
+                for name, lower, upper in PRICE_BUCKETS
+            ],
+            default=Value('unknown'),
+            output_field=CharField(),
+        )
+        price_counts = {
+            row['bucket']: row['count']
+            for row in documents.annotate(bucket=bucket).values('bucket').annotate(count=Count('tutor')).order_by()
+        }
+
+        return {
+            'subjects': [
+                {'id': str(row['subject_id']), 'name': row['subject__name'], 'count': row['count']}
+                for row in subjects
+            ],
+            'class_levels': [
+                {'id': row['classlevel_id'], 'name': row['classlevel__name'], 'count': row['count']}
+                for row in class_levels
+            ],
+            'cities': [{'location': row['location'], 'count': row['count']} for row in cities],
+            'price_ranges': [
+                {'key': name, 'min': lower, 'max': upper, 'count': price_counts.get(name, 0)}
+                for name, lower, upper in PRICE_BUCKETS
+            ],
+        }
+
+    @staticmethod
+    def _price_range(lower, upper):
+        condition = Q(price_min__isnull=False)
+        if lower is not None:
+            condition &= Q(price_min__gte=lower)
+        if upper is not None:
+            condition &= Q(price_min__lt=upper)
+        return condition
@@ -0,0 +1,45 @@
+# views/trending.py
+from django.core.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+
+from api.models import TutorProfile
+from api.serializers import TutorListSerializer
+from api.trending import TRENDING_TOP_N, trending_feed
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def trending_tutors_view(request):
+    """
+    Returns the tutors with the most recent likes, saves, views and reviews,
+    optionally for one ?location= and/or ?subject= (subject UUID). Reads one
+    precomputed TrendingFeed row (see api/trending.py). Pass ?limit= (max TRENDING_TOP_N).
+    """
+    location = request.query_params.get('location', '').strip().lower()
+    subject_id = request.query_params.get('subject') or None
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', TRENDING_TOP_N)), TRENDING_TOP_N))
+    except ValueError:
+        limit = TRENDING_TOP_N
+
+    try:
+        feed = trending_feed(location, subject_id)
+    except ValidationError:
+        return Response({"error": "subject must be a subject UUID"}, status=status.HTTP_400_BAD_REQUEST)
+    if feed is None:
+        return Response({'computed_at': None, 'results': []})
+
+    tutor_ids = feed.tutor_ids[:limit]
+    tutors = TutorListSerializer.setup_eager_loading(
+        TutorProfile.objects.filter(uuid__in=tutor_ids, user__is_active=True)
+    )
+    by_pk = {tutor.pk.hex: tutor for tutor in tutors}
+    ordered = [by_pk[tutor_id] for tutor_id in tutor_ids if tutor_id in by_pk]
+    scores = dict(zip(feed.tutor_ids, feed.scores))
+
+    serializer = TutorListSerializer(ordered, many=True, context={'request': request})
+    results = [dict(row, trending_score=scores[tutor.pk.hex]) for row, tutor in zip(serializer.data, ordered)]
+    return Response({'computed_at': feed.computed_at, 'results': results})
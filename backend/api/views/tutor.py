@@ -6,8 +6,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
 # Import relevant models and serializers
-from api.models import TutorProfile, TutorView
+from api.models import TutorProfile
 from api.serializers import TutorDetailSerializer
+from api.view_tracking import record_view
 
 # View individual tutor profile
 
@@ -28,26 +29,24 @@ class TutorDetailView(generics.RetrieveAPIView):
         - user (basic user info)
         - achievements (tutor's achievements)
         - tutor_subjects__subject (subjects and subject details)
+        - class_levels (class level IDs)
         - reviews_received__student__user (recent reviews with student info)
         """
         return TutorProfile.objects.select_related('user').prefetch_related(
-            'achievements', 'tutor_subjects__subject', 'reviews_received__student__user'
+            'achievements', 'tutor_subjects__subject', 'class_levels', 'reviews_received__student__user'
         )
 
     def retrieve(self, request, *args, **kwargs):
         """
         Handles GET request to fetch tutor details.
-        If the requester is a student, records a TutorView for analytics.
+        If the requester is a student, buffers a view for analytics (written later in a batch).
         """
         # Get the TutorProfile instance by 'id'
         instance = self.get_object()
         
-        # If current user is a student, record a view (for analytics/history)
-        if hasattr(request.user, 'student_profile'):
-            TutorView.objects.get_or_create(
-                student=request.user.student_profile,
-                tutor=instance
-            )
+        # If current user is a student, record a view (for analytics/history); no database write here
+        if request.user.user_type == 'student':
+            record_view(request.user.pk, instance.pk)
 
         # Serialize the tutor profile and return as response
         serializer = self.get_serializer(instance)
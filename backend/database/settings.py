@@ -131,6 +131,20 @@ CHANNEL_LAYERS = {
     },
 }
 
+# NEW: Optional write-behind persistence for WebSocket chat messages (see api/chat_pipeline.py)
+CHAT_WRITE_BEHIND = config('CHAT_WRITE_BEHIND', default=False, cast=bool)
+CHAT_WRITE_BEHIND_BATCH_SIZE = config('CHAT_WRITE_BEHIND_BATCH_SIZE', default=100, cast=int)  # messages per INSERT
+CHAT_WRITE_BEHIND_INTERVAL = config('CHAT_WRITE_BEHIND_INTERVAL', default=0.05, cast=float)  # seconds between flushes
+CHAT_WRITE_BEHIND_MAX_PENDING = config('CHAT_WRITE_BEHIND_MAX_PENDING', default=10000, cast=int)  # then write synchronously
+CHAT_WRITE_BEHIND_MAX_ATTEMPTS = config('CHAT_WRITE_BEHIND_MAX_ATTEMPTS', default=5, cast=int)  # then a failing message is dropped
+
+# NEW: Buffered tutor profile view tracking (see api/view_tracking.py)
+TUTOR_VIEW_FLUSH_INTERVAL = config(
+    'TUTOR_VIEW_FLUSH_INTERVAL', default=5.0, cast=float
+)  # seconds; 0 = no in-process flusher (started on the first recorded view)
+TUTOR_VIEW_BATCH_SIZE = config('TUTOR_VIEW_BATCH_SIZE', default=1000, cast=int)  # views per transaction
+TUTOR_VIEW_RETENTION_DAYS = config('TUTOR_VIEW_RETENTION_DAYS', default=90, cast=int)  # raw TutorView rows kept by prune_tutor_views
+
 # NEW: Fallback channel layer for development (no Redis needed)
 if DEBUG and not config('USE_REDIS'):
     CHANNEL_LAYERS = {
@@ -220,6 +234,10 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Directory to store uploaded file
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB max file size in memory
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB max total upload size
 
+# NEW: Chat attachments are streamed to disk while uploading (see api/attachments.py)
+CHAT_ATTACHMENT_MAX_SIZE = config('CHAT_ATTACHMENT_MAX_SIZE', default=26214400, cast=int)  # 25MB per file
+CHAT_ATTACHMENT_PREVIEW_WORKERS = config('CHAT_ATTACHMENT_PREVIEW_WORKERS', default=2, cast=int)  # background threads
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
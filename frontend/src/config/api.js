@@ -297,6 +297,29 @@ class ApiService {
     }
   }
 
+  // Tutor counts per subject / class level / city / price range for the given filters
+  async getSearchFacets(params = {}) {
+    const cleanParams = {};
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== null && value !== undefined && value !== '') {
+        cleanParams[key] = value;
+      }
+    });
+    const queryString = new URLSearchParams(cleanParams).toString();
+    return await this.request(`/search/tutors/facets/${queryString ? `?${queryString}` : ''}`);
+  }
+
+  // Tutors matching the student's preferred subjects, budget, location and grade
+  async getRecommendedTutors(limit = 20) {
+    return await this.request(`/recommendations/tutors/?limit=${limit}`);
+  }
+
+  // Tutors with the most recent likes, saves, views and reviews; params: { location, subject, limit }
+  async getTrendingTutors(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return await this.request(`/tutors/trending/${queryString ? `?${queryString}` : ''}`);
+  }
+
   async getTutorDetail(tutorId) {
     return await this.request(`/tutors/${tutorId}/`);
   }
@@ -333,6 +356,19 @@ class ApiService {
     return await this.request('/users/liked-tutors/');
   }
 
+  // Applies queued actions in order, e.g. [{ action: 'like', tutor_id }, { action: 'unsave', tutor_id }]
+  async syncInteractions(operations) {
+    return await this.request('/users/interactions/batch/', {
+      method: 'POST',
+      body: JSON.stringify({ operations }),
+    });
+  }
+
+  // Last tutors the student opened, most recent first
+  async getRecentlyViewedTutors() {
+    return await this.request('/users/recently-viewed/');
+  }
+
   // Chat methods
   async getChatRooms() {
     return await this.request('/chats/');
@@ -347,8 +383,18 @@ class ApiService {
     });
   }
 
-  async getChatMessages(roomId) {
-    return await this.request(`/chats/${roomId}/messages/`);
+  // Newest messages by default; pass { before: messageId } to scroll back or { after: messageId } for newer ones
+  async getChatMessages(roomId, params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return await this.request(`/chats/${roomId}/messages/${queryString ? `?${queryString}` : ''}`);
+  }
+
+  // Marks messages as read up to messageId (default: the newest message)
+  async markChatRead(roomId, messageId = null) {
+    return await this.request(`/chats/${roomId}/read/`, {
+      method: 'POST',
+      body: JSON.stringify(messageId ? { message_id: messageId } : {}),
+    });
   }
 
   async sendMessage(roomId, content) {
@@ -410,6 +456,37 @@ class ApiService {
     return await response.json();
   }
 
+  // Sends a file as a chat message; caption defaults to the file name on the server
+  async sendChatAttachment(roomId, fileUri, fileName, mimeType, caption = '') {
+    const formData = new FormData();
+    formData.append('file', {
+      uri: fileUri,
+      type: mimeType,
+      name: fileName,
+    });
+    if (caption) {
+      formData.append('content', caption);
+    }
+
+    const token = await this.getToken();
+
+    const response = await fetch(`${this.baseURL}/chats/${roomId}/attachments/`, {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+        'Content-Type': 'multipart/form-data',
+      },
+      body: formData,
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json();
+      throw new Error(errorData.error || 'Upload failed');
+    }
+
+    return await response.json();
+  }
+
   // Metadata methods
   async getSubjects() {
     return await this.request('/subjects/');